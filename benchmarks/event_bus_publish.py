@@ -0,0 +1,48 @@
+"""
+Micro-benchmark of the publish throughput of the in-memory event buses with concurrent publishers.
+
+Usage: python benchmarks/event_bus_publish.py [--publishers 1 2 4 8] [--events 100000] [--handlers 4]
+"""
+import argparse
+import threading
+import time
+
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+
+
+def run(event_bus, publishers: int, events: int, handlers: int) -> float:
+    for _ in range(handlers):
+        event_bus.subscribe("benchmark", lambda ev: None)
+
+    event = Event.for_payload(b"\0" * 320)
+    barrier = threading.Barrier(publishers + 1)
+
+    def publish():
+        barrier.wait()
+        for _ in range(events):
+            event_bus.publish("benchmark", event)
+
+    threads = [threading.Thread(target=publish) for _ in range(publishers)]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+
+    return publishers * events / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--publishers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--events", type=int, default=100_000, help="Events per publisher")
+    parser.add_argument("--handlers", type=int, default=4, help="Subscribed handlers")
+    args = parser.parse_args()
+
+    print(f"{'publishers':>10} {'events/s':>12}")
+    for publishers in args.publishers:
+        throughput = run(SynchronousEventBus(), publishers, args.events, args.handlers)
+        print(f"{publishers:>10} {throughput:>12,.0f}")
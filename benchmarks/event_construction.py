@@ -0,0 +1,66 @@
+"""
+Benchmark construction throughput and memory per event of :class:`Event` compared to plain dataclasses.
+
+Usage: python benchmarks/event_construction.py [--events 100000]
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+
+from cltl.combot.infra.event.api import Event, MonotonicIdGenerator, set_id_generator, uuid_id
+from cltl.combot.infra.time_util import timestamp_now
+
+
+@dataclass
+class PlainEventMetadata:
+    timestamp: int = field(default_factory=timestamp_now)
+    offset: int = -1
+    topic: str = ""
+
+
+@dataclass
+class PlainEvent:
+    id: str
+    payload: object
+    metadata: PlainEventMetadata = field(default_factory=PlainEventMetadata)
+
+    @classmethod
+    def for_payload(cls, payload):
+        return cls(str(uuid.uuid4()), payload)
+
+
+def throughput(factory, events: int) -> float:
+    start = time.perf_counter()
+    for _ in range(events):
+        factory(None)
+
+    return events / (time.perf_counter() - start)
+
+
+def memory(factory, events: int) -> float:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    instances = [factory(None) for _ in range(events)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (after - before) / len(instances)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100_000)
+    args = parser.parse_args()
+
+    candidates = [
+        ("dataclass, uuid4", PlainEvent.for_payload, uuid_id),
+        ("slotted, uuid4", Event.for_payload, uuid_id),
+        ("slotted, monotonic", Event.for_payload, MonotonicIdGenerator()),
+    ]
+
+    print(f"{'implementation':<20} {'events/s':>12} {'bytes/event':>12}")
+    for name, factory, id_generator in candidates:
+        set_id_generator(id_generator)
+        print(f"{name:<20} {throughput(factory, args.events):>12,.0f} {memory(factory, args.events):>12,.0f}")
@@ -0,0 +1,70 @@
+"""
+Benchmark consumer throughput of the :class:`KombuEventBus` on kombu's in-memory transport.
+
+Compares acknowledging each message, acknowledging in batches with prefetch, and consuming
+without acknowledgements.
+
+Usage: python benchmarks/kombu_consume.py [--events 10000] [--server memory:///]
+"""
+import argparse
+import threading
+import time
+
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.kombu import KombuEventBus, register_serializers
+from cltl.combot.test.util import TestConfiguration
+
+
+class _ConfigManager:
+    def __init__(self, config):
+        self._config = config
+
+    def get_config(self, name, callback=None):
+        return TestConfiguration(self._config)
+
+
+def consume(server: str, events: int, **settings) -> float:
+    config = {"server": server, "exchange": "cltl.benchmark", "type": "direct", "compression": None,
+              **settings}
+    event_bus = KombuEventBus("cltl-json", _ConfigManager(config))
+
+    received = threading.Event()
+    count = 0
+
+    def handler(_):
+        nonlocal count
+        count += 1
+        if count == events:
+            received.set()
+
+    event_bus.subscribe("benchmark", handler)
+
+    start = time.perf_counter()
+    event_bus.publish_batch("benchmark", (Event.for_payload(i) for i in range(events)))
+    received.wait()
+    duration = time.perf_counter() - start
+
+    event_bus.unsubscribe("benchmark")
+    event_bus.stop()
+
+    return events / duration
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--server", default="memory:///")
+    args = parser.parse_args()
+
+    register_serializers()
+
+    runs = (
+        ("ack", {}),
+        ("prefetch", {"prefetch_count": 100}),
+        ("batch ack", {"prefetch_count": 100, "ack_batch_size": 50}),
+        ("no ack", {"no_ack_topics": ["benchmark"]}),
+    )
+
+    print(f"{'consume':<10} {'events/s':>10}")
+    for name, settings in runs:
+        print(f"{name:<10} {consume(args.server, args.events, **settings):>10.0f}")
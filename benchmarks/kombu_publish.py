@@ -0,0 +1,73 @@
+"""
+Benchmark publish latency of the :class:`KombuEventBus` on kombu's in-memory transport.
+
+Compares the bus with publishing through the kombu connection and producer pools, declaring
+the exchange on every publish.
+
+Usage: python benchmarks/kombu_publish.py [--events 10000] [--server memory:///]
+"""
+import argparse
+import json
+import time
+
+from kombu import Connection, Exchange
+from kombu.pools import connections, producers
+from kombu.serialization import register
+
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.kombu import KombuEventBus
+from cltl.combot.infra.event.serialization import object_vars
+from cltl.combot.infra.metrics import LatencyRecorder
+from cltl.combot.test.util import TestConfiguration
+
+
+class _ConfigManager:
+    def __init__(self, config):
+        self._config = config
+
+    def get_config(self, name, callback=None):
+        return TestConfiguration(self._config)
+
+
+def pooled_publish(server: str, exchange_name: str, events: int) -> LatencyRecorder:
+    connection = Connection(server)
+    exchange = Exchange(exchange_name, type="direct")
+    recorder = LatencyRecorder(events)
+
+    event = Event.for_payload("benchmark")
+    for _ in range(events):
+        start = time.perf_counter()
+        with connections[connection].acquire(block=True) as conn:
+            with producers[conn].acquire(block=True) as producer:
+                producer.publish(event, serializer="cltl-json", exchange=exchange, declare=[exchange],
+                                 routing_key="benchmark")
+        recorder.record((time.perf_counter() - start) * 1000)
+
+    return recorder
+
+
+def bus_publish(server: str, exchange_name: str, events: int) -> LatencyRecorder:
+    config = {"server": server, "exchange": exchange_name, "type": "direct", "compression": None}
+    event_bus = KombuEventBus("cltl-json", _ConfigManager(config))
+
+    event = Event.for_payload("benchmark")
+    for _ in range(events):
+        event_bus.publish("benchmark", event)
+    event_bus.stop()
+
+    return event_bus.publish_latency
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--server", default="memory:///")
+    args = parser.parse_args()
+
+    register('cltl-json', lambda x: json.dumps(x, default=object_vars), json.loads,
+             content_type='application/json', content_encoding='utf-8')
+
+    print(f"{'publish':<10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for name, run in (("pooled", pooled_publish), ("bus", bus_publish)):
+        percentiles = run(args.server, "cltl.benchmark", args.events).percentiles((50, 90, 99))
+        print(f"{name:<10} " + " ".join(f"{percentiles[p]:>8.3f}" for p in (50, 90, 99)))
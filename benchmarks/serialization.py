@@ -0,0 +1,51 @@
+"""
+Benchmark the registered event serializers on representative payloads.
+
+Reports encode and decode throughput and the size of the serialized events.
+
+Usage: python benchmarks/serialization.py [--repeat 1000]
+"""
+import argparse
+import time
+
+import numpy as np
+from emissor.representation.scenario import TextSignal, AudioSignal
+
+from cltl.combot.event.emissor import TextSignalEvent, AudioSignalStarted
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.serialization import serializers
+
+
+def payloads():
+    text_signal = TextSignal.for_scenario("scenario_id", 1, 2, "file", "Hello, how are you doing today?")
+    audio_signal = AudioSignal.for_scenario("scenario_id", 1, 2, "cltl-storage:audio/signal_id", 16000, 1)
+
+    return {
+        "TextSignalEvent": Event.for_payload(TextSignalEvent.for_speaker(text_signal)),
+        "AudioSignalStarted": Event.for_payload(AudioSignalStarted.create(audio_signal)),
+        "audio frame": Event.for_payload(np.zeros((480, 1), dtype=np.int16)),
+        "image frame": Event.for_payload(np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)),
+    }
+
+
+def measure(function, argument, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(argument)
+
+    return repeat / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'payload':<20} {'serializer':<14} {'encode/s':>12} {'decode/s':>12} {'bytes':>10}")
+    for name, event in payloads().items():
+        repeat = args.repeat if "image" not in name else max(1, args.repeat // 10)
+        for serializer in serializers():
+            data = serializer.dumps(event)
+            encode = measure(serializer.dumps, event, repeat)
+            decode = measure(serializer.loads, data, repeat)
+            print(f"{name:<20} {serializer.name:<14} {encode:>12,.0f} {decode:>12,.0f} {len(data):>10,}")
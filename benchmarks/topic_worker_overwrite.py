@@ -0,0 +1,72 @@
+"""
+Benchmark publishing to a :class:`TopicWorker` buffer with `RejectionStrategy.OVERWRITE` at high rates.
+
+Compares the ring buffer of the TopicWorker with the previous implementation on a `queue.Queue`,
+which overwrote events by retrying `put` after catching `Full` and removing the oldest event.
+A consumer thread takes events from the buffer while the publisher overwrites them.
+
+Usage: python benchmarks/topic_worker_overwrite.py [--events 200000] [--sizes 1 16]
+"""
+import argparse
+import threading
+import time
+from queue import Queue, Full, Empty
+
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.topic_worker import RejectionStrategy, _EventBuffer
+
+
+class _QueueBuffer:
+    def __init__(self, size: int):
+        self._queue = Queue(maxsize=size)
+
+    def put(self, event):
+        while True:
+            try:
+                self._queue.put(event, block=False)
+                return
+            except Full:
+                try:
+                    self._queue.get(block=False)
+                except Empty:
+                    pass
+
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+
+def run(buffer, events: int) -> float:
+    event = Event.for_payload(b"\0" * 320)
+    done = threading.Event()
+
+    def consume():
+        while not done.is_set():
+            buffer.get(0.01)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+
+    start = time.perf_counter()
+    for _ in range(events):
+        buffer.put(event)
+    duration = time.perf_counter() - start
+
+    done.set()
+    consumer.join()
+
+    return events / duration
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 16])
+    args = parser.parse_args()
+
+    print(f"{'buffer':<8} {'size':>5} {'events/s':>12}")
+    for size in args.sizes:
+        print(f"{'queue':<8} {size:>5} {run(_QueueBuffer(size), args.events):>12.0f}")
+        print(f"{'ring':<8} {size:>5} {run(_EventBuffer(size, RejectionStrategy.OVERWRITE, 'benchmark'), args.events):>12.0f}")
@@ -26,5 +26,17 @@ setup(
         "external": [
             "kombu"
         ],
+        "msgpack": [
+            "msgpack"
+        ],
+        "orjson": [
+            "orjson"
+        ],
+        "lz4": [
+            "lz4"
+        ],
+        "zstd": [
+            "zstandard"
+        ],
     }
 )
\ No newline at end of file
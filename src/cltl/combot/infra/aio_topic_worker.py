@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from typing import Iterable, Optional, Union, Callable, Awaitable, List
+
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.aio import AsyncioEventBus
+from cltl.combot.infra.time_util import timestamp_now
+from cltl.combot.infra.topic_worker import RejectionStrategy
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTopicWorker:
+    """
+    Process events on a topic from an :class:`AsyncioEventBus` with coroutines.
+
+    The asyncio variant of :class:`TopicWorker`. Events are put on an internal buffer and processed by up to
+    `max_concurrency` tasks on the event loop, such that I/O bound processing of multiple events can overlap.
+    With a concurrency larger than one, events are not necessarily processed in the order they were received.
+
+    For the case when events are received faster than they can be processed, a rejection strategy
+    can be provided. With `RejectionStrategy.BLOCK` publishing to the worker awaits until the buffer
+    has space available.
+    """
+
+    def __init__(self, topics: Union[str, Iterable[str]], event_bus: AsyncioEventBus, name: str = None,
+                 buffer_size: int = 1, rejection_strategy: RejectionStrategy = RejectionStrategy.OVERWRITE,
+                 max_concurrency: int = 1, processor: Callable[[Event], Awaitable[None]] = None):
+        """
+        Parameters
+        ----------
+        topics : Union[str, Iterable[str]]
+            One or more topics the worker is listening to.
+        event_bus : AsyncioEventBus
+            The asyncio Event bus of the application.
+        name : str
+            Name of the topic worker.
+        buffer_size : int
+            Size of the internal buffer of the worker.
+        rejection_strategy : RejectionStrategy
+            Strategy to use when the internal buffer is full.
+        max_concurrency : int
+            Maximum number of events processed concurrently.
+        processor : Callable[[Event], Awaitable[None]]
+            Coroutine function to call for each event. Alternatively override the `process` method.
+        """
+        self.name = name if name else self.__class__.__name__
+        self._event_bus = event_bus
+        self._topics = set(topics) if not isinstance(topics, str) else {topics}
+        self._buffer_size = max(1, buffer_size)
+        self._strategy = rejection_strategy
+        self._max_concurrency = max_concurrency
+        self._processor = processor
+
+        self._buffer: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """
+        Subscribe to the topics and start processing events on the running event loop.
+        """
+        logger.info("Starting topic worker %s for topics %s", self.name, self._topics)
+
+        self._buffer = asyncio.Queue(maxsize=self._buffer_size)
+        self._tasks = [asyncio.ensure_future(self._run()) for _ in range(self._max_concurrency)]
+        for topic in self._topics:
+            self._event_bus.subscribe(topic, self._accept_event)
+
+        logger.info("Started topic worker %s", self.name)
+
+    async def stop(self) -> None:
+        """
+        Unsubscribe from the topics and cancel processing, events that are currently processed are cancelled.
+        """
+        for topic in self._topics:
+            try:
+                self._event_bus.unsubscribe(topic, self._accept_event)
+            except:
+                logger.exception("Failed to unsubscribe " + self.name + " from " + topic)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        logger.info("Stopped topic worker %s", self.name)
+
+    async def join(self) -> None:
+        """
+        Wait until all buffered events are processed.
+        """
+        await self._buffer.join()
+
+    async def _run(self):
+        while True:
+            event = await self._buffer.get()
+            try:
+                logger.debug("Processing event %s for %s", event.id, self.name)
+                start = timestamp_now()
+                await self.process(event)
+                logger.debug("Processed event %s in %s ms for %s", event.id, timestamp_now() - start, self.name)
+            except asyncio.CancelledError:
+                raise
+            except:
+                logger.exception("Error during event processing (%s)", self.name)
+            finally:
+                self._buffer.task_done()
+
+    async def _accept_event(self, event: Event):
+        if self._strategy == RejectionStrategy.BLOCK:
+            await self._buffer.put(event)
+            return
+
+        try:
+            self._buffer.put_nowait(event)
+        except asyncio.QueueFull:
+            if self._strategy == RejectionStrategy.EXCEPTION:
+                raise
+            elif self._strategy == RejectionStrategy.OVERWRITE:
+                dropped = self._buffer.get_nowait()
+                self._buffer.task_done()
+                self._buffer.put_nowait(event)
+                logger.debug("Overwrote event %s with %s for %s", dropped.id, event.id, self.name)
+            elif self._strategy == RejectionStrategy.DROP:
+                logger.debug("Dropped event %s for %s", event.id, self.name)
+            else:
+                raise ValueError("Unknown strategy: " + str(self._strategy))
+
+    async def process(self, event: Event) -> None:
+        """
+        Process incoming events.
+
+        Override this method or provide a processing coroutine function to the constructor.
+
+        Parameters
+        ----------
+        event : Event
+            The next event.
+        """
+        if self._processor:
+            await self._processor(event)
+
+    @property
+    def event_bus(self) -> AsyncioEventBus:
+        return self._event_bus
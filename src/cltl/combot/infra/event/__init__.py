@@ -1 +1 @@
-from .api import EventBusContainer, EventBus, Event, EventMetadata, TopicError
\ No newline at end of file
+from .api import EventBusContainer, EventBus, Event, EventMetadata, TopicError, batch_handler
\ No newline at end of file
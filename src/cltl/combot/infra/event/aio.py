@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Tuple, Iterable, Union, Awaitable, Optional
+
+from cltl.combot.infra.event.api import EventBus, Event
+
+logger = logging.getLogger(__name__)
+
+
+Handler = Callable[[Event], Union[None, Awaitable[None]]]
+
+
+class AsyncioEventBus:
+    """
+    EventBus for components running on an asyncio event loop.
+
+    The API corresponds to :class:`EventBus`, except that publishing events is a coroutine. Handlers can be
+    plain functions or coroutine functions. Publishing invokes the handlers of the topic in the order of
+    subscription and awaits coroutine handlers before it returns, such that handlers can apply backpressure.
+
+    The bus must only be used from the thread running its event loop, use :class:`EventBusBridge` to exchange
+    events with a threaded :class:`EventBus`.
+    """
+    def __init__(self):
+        self._handlers: Dict[str, Tuple[Handler, ...]] = {}
+
+    async def publish(self, topic: str, event: Event) -> None:
+        handlers = self._handlers.setdefault(topic, ())
+        if handlers:
+            topic_event = Event.with_topic(event, topic)
+            for handler in handlers:
+                await self._invoke(handler, topic_event)
+
+    async def publish_batch(self, topic: str, events: Iterable[Event]) -> None:
+        for event in events:
+            await self.publish(topic, event)
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic] = self._handlers.get(topic, ()) + (handler,)
+        logger.info("Subscribed %s to topic %s", _format_name(handler), topic)
+
+    def unsubscribe(self, topic: str, handler: Handler = None) -> None:
+        if handler:
+            handlers = self._handlers.get(topic, ())
+            try:
+                idx = handlers.index(handler)
+            except ValueError as e:
+                raise ValueError("Failed to unregister " + _format_name(handler), e)
+            self._handlers[topic] = handlers[:idx] + handlers[idx + 1:]
+            logger.info("Unsubscribed %s from topic %s", _format_name(handler), topic)
+        else:
+            self._handlers[topic] = ()
+            logger.info("Unsubscribed handlers from topic %s", topic)
+
+    @property
+    def topics(self):
+        return list(self._handlers.keys())
+
+    async def _invoke(self, handler: Handler, event: Event):
+        result = handler(event)
+        if asyncio.iscoroutine(result):
+            await result
+
+
+class EventBusBridge:
+    """
+    Forward events between a threaded :class:`EventBus` and an :class:`AsyncioEventBus`.
+
+    Events from the threaded bus are published on the event loop of the asyncio bus, events from the asyncio bus
+    are published on the threaded bus from the default executor of the event loop. A topic can only be forwarded
+    in one direction, to prevent events from being forwarded back and forth.
+
+    Publishing a forwarded event on the threaded bus waits until it is published on the asyncio bus, such that
+    handlers on the event loop apply backpressure to the publisher, events of a publisher are forwarded in order
+    and exceptions of the handlers are raised to the publisher. Only when the event is published from the thread
+    of the event loop it is scheduled without waiting.
+    """
+    def __init__(self, event_bus: EventBus, asyncio_event_bus: AsyncioEventBus, loop: asyncio.AbstractEventLoop):
+        """
+        Parameters
+        ----------
+        event_bus : EventBus
+            The threaded event bus.
+        asyncio_event_bus : AsyncioEventBus
+            The asyncio event bus.
+        loop : asyncio.AbstractEventLoop
+            The event loop of the asyncio event bus.
+        """
+        self._event_bus = event_bus
+        self._asyncio_event_bus = asyncio_event_bus
+        self._loop = loop
+        self._to_asyncio: Dict[str, Callable[[Event], None]] = {}
+        self._from_asyncio: Dict[str, Handler] = {}
+
+    def forward_to_asyncio(self, topic: str) -> None:
+        """
+        Forward events on `topic` from the threaded bus to the asyncio bus.
+        """
+        self._check_topic(topic)
+
+        def forward(event: Event):
+            future = asyncio.run_coroutine_threadsafe(self._asyncio_event_bus.publish(topic, event), self._loop)
+            if _running_loop() is self._loop:
+                future.add_done_callback(lambda f: _log_failure(f, topic, event))
+                return
+
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning("Failed to forward event %s on topic %s: %s", event.id, topic, e)
+                raise
+
+        self._to_asyncio[topic] = forward
+        self._event_bus.subscribe(topic, forward)
+
+    def forward_from_asyncio(self, topic: str) -> None:
+        """
+        Forward events on `topic` from the asyncio bus to the threaded bus.
+        """
+        self._check_topic(topic)
+
+        async def forward(event: Event):
+            await self._loop.run_in_executor(None, self._event_bus.publish, topic, event)
+
+        self._from_asyncio[topic] = forward
+        self._asyncio_event_bus.subscribe(topic, forward)
+
+    def close(self) -> None:
+        """
+        Stop forwarding events.
+        """
+        for topic, handler in self._to_asyncio.items():
+            self._event_bus.unsubscribe(topic, handler)
+        for topic, handler in self._from_asyncio.items():
+            self._asyncio_event_bus.unsubscribe(topic, handler)
+        self._to_asyncio = {}
+        self._from_asyncio = {}
+
+    def _check_topic(self, topic: str):
+        if topic in self._to_asyncio or topic in self._from_asyncio:
+            raise ValueError("Topic " + topic + " is already forwarded")
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _log_failure(future, topic: str, event: Event):
+    if not future.cancelled() and future.exception():
+        logger.error("Failed to forward event %s on topic %s", event.id, topic, exc_info=future.exception())
+
+
+def _format_name(handler: Handler) -> str:
+    return getattr(handler, "__qualname__", None) or repr(handler)
@@ -1,6 +1,9 @@
+import itertools
+import os
+import threading
 import uuid
-from dataclasses import dataclass
-from typing import TypeVar, Generic, Optional, Iterable, Callable
+from dataclasses import dataclass, field, fields, MISSING
+from typing import TypeVar, Generic, Optional, Iterable, Callable, List
 
 from cltl.combot.infra.di_container import DIContainer
 from cltl.combot.infra.time_util import timestamp_now
@@ -10,9 +13,117 @@ class TopicError(ValueError):
     pass
 
 
-@dataclass
+def uuid_id() -> str:
+    """
+    Generate a random UUID (version 4) as event id.
+    """
+    return str(uuid.uuid4())
+
+
+class MonotonicIdGenerator:
+    """
+    Generate ULID-style event ids without a system call per id.
+
+    Ids consist of a 48 bit millisecond timestamp followed by an 80 bit counter that is
+    randomly initialized once per process and incremented for each id. Ids generated
+    by the same process are therefore unique and sort in the order of their creation.
+    """
+    _COUNTER_BITS = 80
+    _COUNTER_MASK = (1 << _COUNTER_BITS) - 1
+
+    def __init__(self):
+        self._reseed()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reseed)
+
+    def _reseed(self):
+        # Ids of forked processes must not overlap with their parent
+        self._counter = itertools.count(int.from_bytes(os.urandom(10), "big"))
+
+    def __call__(self) -> str:
+        return f"{timestamp_now():012x}{next(self._counter) & self._COUNTER_MASK:020x}"
+
+
+_id_generator: Callable[[], str] = uuid_id
+_id_generator_lock = threading.Lock()
+
+
+def set_id_generator(generator: Callable[[], str]) -> None:
+    """
+    Set the function used by :meth:`Event.for_payload` to generate event ids.
+
+    Parameters
+    ----------
+    generator : Callable[[], str]
+        Function returning a new unique id on each call, e.g. :func:`uuid_id` (default)
+        or an instance of :class:`MonotonicIdGenerator`.
+    """
+    global _id_generator
+    with _id_generator_lock:
+        _id_generator = generator
+
+
+def _frozen_getstate(self):
+    return tuple(getattr(self, f.name) for f in fields(self))
+
+
+def _frozen_setstate(self, state):
+    for f, value in zip(fields(self), state):
+        object.__setattr__(self, f.name, value)
+
+
+_HAS_DEFAULT_FACTORY = object()
+
+
+def _slotted(cls):
+    """
+    Replace a frozen dataclass by an equivalent class with `__slots__` for its fields.
+
+    Similar to `@dataclass(slots=True)`, which is only available from Python 3.10. In
+    addition the generated `__init__` assigns the fields through their slot descriptors,
+    which is considerably faster than the `object.__setattr__` calls of frozen dataclasses.
+    """
+    cls_fields = fields(cls)
+    field_names = tuple(f.name for f in cls_fields)
+    cls_dict = dict(cls.__dict__)
+    for name in field_names + ("__dict__", "__weakref__"):
+        cls_dict.pop(name, None)
+    cls_dict["__slots__"] = field_names
+    cls_dict["__getstate__"] = _frozen_getstate
+    cls_dict["__setstate__"] = _frozen_setstate
+
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+    init_globals = {"_HAS_DEFAULT_FACTORY": _HAS_DEFAULT_FACTORY}
+    params = []
+    body = []
+    for f in cls_fields:
+        init_globals["_set_" + f.name] = getattr(slotted_cls, f.name).__set__
+        if f.default is not MISSING:
+            init_globals["_default_" + f.name] = f.default
+            params.append(f"{f.name}=_default_{f.name}")
+            body.append(f"_set_{f.name}(self, {f.name})")
+        elif f.default_factory is not MISSING:
+            init_globals["_factory_" + f.name] = f.default_factory
+            params.append(f"{f.name}=_HAS_DEFAULT_FACTORY")
+            body.append(f"_set_{f.name}(self, _factory_{f.name}() "
+                        f"if {f.name} is _HAS_DEFAULT_FACTORY else {f.name})")
+        else:
+            params.append(f.name)
+            body.append(f"_set_{f.name}(self, {f.name})")
+    init_source = f"def __init__(self, {', '.join(params)}):\n    " + "\n    ".join(body)
+    exec(init_source, init_globals)
+    init = init_globals["__init__"]
+    init.__qualname__ = f"{cls.__qualname__}.__init__"
+    slotted_cls.__init__ = init
+
+    return slotted_cls
+
+
+@_slotted
+@dataclass(frozen=True)
 class EventMetadata:
-    timestamp: int = timestamp_now()
+    timestamp: int = field(default_factory=timestamp_now)
     offset: int = -1
     topic: str = ""
 
@@ -26,18 +137,27 @@ class EventMetadata:
 
 
 T = TypeVar("T")
-@dataclass
+@_slotted
+@dataclass(frozen=True)
 class Event(Generic[T]):
+    """
+    Event published on the :class:`EventBus`.
+
+    Events are immutable and can therefore be shared between all subscribers of a topic.
+    """
     id: str
     payload: T
-    metadata: EventMetadata = EventMetadata()
+    metadata: EventMetadata = field(default_factory=EventMetadata)
 
     @classmethod
     def for_payload(cls, payload: T) -> Optional["Event"]:
-        return cls(str(uuid.uuid4()), payload)
+        return cls(_id_generator(), payload)
 
     @classmethod
     def with_topic(cls, event, topic: str) -> Optional["Event"]:
+        if isinstance(event, Event) and event.metadata.topic == topic:
+            return event
+
         return cls(event.id, event.payload, EventMetadata.with_(event.metadata, topic=topic))
 
     def __eq__(self, other):
@@ -47,6 +167,22 @@ class Event(Generic[T]):
         return hash(self.id) if self.id else hash("")
 
 
+def batch_handler(handler: Callable[[List[Event]], None]) -> Callable[[List[Event]], None]:
+    """
+    Mark a handler to receive events as lists instead of individually.
+
+    Event buses invoke batch handlers with all events of a :meth:`EventBus.publish_batch`
+    call at once, and with a list of a single event for :meth:`EventBus.publish`.
+    """
+    handler.__batch_handler__ = True
+
+    return handler
+
+
+def is_batch_handler(handler: Callable) -> bool:
+    return getattr(handler, "__batch_handler__", False)
+
+
 class EventBus:
     """
     Supports publishing of and subscribing to events based on topics.
@@ -55,11 +191,30 @@ class EventBus:
     of their arrival. Publishing and invocation of the subscribed handler
     can be asynchronous. Subscribers receive only events that arrive after they
     subscribed to a topic.
+
+    Handlers marked with :func:`batch_handler` receive lists of events.
     """
 
     def publish(self, topic: str, event: Event) -> None:
         raise NotImplementedError()
 
+    def publish_batch(self, topic: str, events: Iterable[Event]) -> None:
+        """
+        Publish multiple events to a topic.
+
+        The events are delivered in the given order. Implementations may deliver the
+        events to batch handlers in a single call.
+
+        Parameters
+        ----------
+        topic : str
+            The topic.
+        events : Iterable[Event]
+            The events to publish.
+        """
+        for event in events:
+            self.publish(topic, event)
+
     def subscribe(self, topic, handler: Callable[[Event], None]) -> None:
         raise NotImplementedError()
 
@@ -0,0 +1,136 @@
+"""
+Strategies for bounded event queues and a per-topic event queue that is drained on an executor.
+
+:class:`RejectionStrategy` is also used by the topic workers, which re-export it from
+:mod:`cltl.combot.infra.topic_worker`.
+"""
+import logging
+from collections import deque
+from concurrent.futures import Executor
+from enum import Enum
+from queue import Full
+from threading import Lock, Condition
+from typing import Callable, List
+
+from cltl.combot.infra.event.api import Event
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_QUEUE_SIZE = 1024
+_MAX_DRAIN = 64
+
+
+class RejectionStrategy(Enum):
+    OVERWRITE = 0
+    DROP = 1
+    BLOCK = 2
+    EXCEPTION = 3
+
+
+class TopicDispatcher:
+    """
+    Bounded queue of events for a single topic that is drained by at most one worker at a time.
+
+    Once closed, or when the executor was shut down, new events are dropped. Events that are
+    already queued are delivered by the running worker without scheduling further tasks.
+    """
+
+    def __init__(self, topic: str, executor: Executor, deliver: Callable[[str, List[Event]], None],
+                 queue_size: int, rejection_strategy: RejectionStrategy):
+        self._topic = topic
+        self._executor = executor
+        self._deliver = deliver
+        self._queue_size = queue_size
+        self._strategy = rejection_strategy
+
+        self._queue = deque()
+        self._lock = Lock()
+        self._not_full = Condition(self._lock)
+        self._scheduled = False
+        self._closed = False
+
+    def put(self, event: Event, block: bool = True) -> bool:
+        """
+        Queue an event for delivery.
+
+        Parameters
+        ----------
+        event : Event
+            The event.
+        block : bool
+            Wait for space in the queue if it is full and the rejection strategy is BLOCK.
+
+        Returns
+        -------
+        bool
+            False if the queue is full and `block` is not set, True otherwise.
+        """
+        with self._lock:
+            while not self._closed and self._queue_size and len(self._queue) >= self._queue_size:
+                if self._strategy == RejectionStrategy.BLOCK:
+                    if not block:
+                        return False
+                    self._not_full.wait()
+                elif self._strategy == RejectionStrategy.OVERWRITE:
+                    dropped = self._queue.popleft()
+                    logger.debug("Overwrote event %s with %s on topic %s", dropped.id, event.id, self._topic)
+                elif self._strategy == RejectionStrategy.DROP:
+                    logger.debug("Dropped event %s on topic %s", event.id, self._topic)
+                    return True
+                elif self._strategy == RejectionStrategy.EXCEPTION:
+                    raise Full("Queue for topic " + self._topic + " is full")
+                else:
+                    raise ValueError("Unknown strategy: " + str(self._strategy))
+
+            if self._closed:
+                logger.debug("Dropped event %s on closed topic %s", event.id, self._topic)
+                return True
+
+            self._queue.append(event)
+
+            if not self._scheduled:
+                self._schedule()
+
+        return True
+
+    def close(self):
+        """
+        Drop events published from now on and release blocked publishers.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_full.notify_all()
+
+    def _schedule(self):
+        try:
+            self._executor.submit(self._drain)
+            self._scheduled = True
+        except RuntimeError:
+            # The executor was shut down
+            logger.debug("Dropped %s events on topic %s after shutdown", len(self._queue), self._topic)
+            self._scheduled = False
+            self._closed = True
+            self._queue.clear()
+            self._not_full.notify_all()
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                # Limit the number of events delivered per task to not starve other topics
+                events = [self._queue.popleft() for _ in range(min(len(self._queue), _MAX_DRAIN))]
+                self._not_full.notify_all()
+
+            try:
+                self._deliver(self._topic, events)
+            except:
+                logger.exception("Failed to deliver %s events on topic %s", len(events), self._topic)
+
+            with self._lock:
+                if not self._queue:
+                    self._scheduled = False
+                    return
+                if not self._closed:
+                    self._schedule()
+                    return
+                # Once closed, deliver the remaining events without submitting new tasks
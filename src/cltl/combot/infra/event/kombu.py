@@ -1,134 +1,954 @@
-import json
 import logging
-from types import SimpleNamespace
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from kombu import Connection, Exchange, Queue
+from kombu import Connection, Exchange, Queue, Producer, Consumer
+from kombu.message import Message
 from kombu.mixins import ConsumerMixin
-from kombu.pools import producers, connections
-from threading import RLock, Thread
-from typing import Callable, Dict, Tuple, Set
-from kombu.serialization import register
+from kombu.transport.virtual import Channel as VirtualChannel
+from queue import Full
+from threading import RLock, Thread, Lock, Condition
+from typing import Callable, Dict, Tuple, Set, Iterable, List, Optional, NamedTuple
+from kombu.compression import compress, get_encoder, register as register_compression
+from kombu.serialization import dumps, register, registry
 
 from cltl.combot.infra.di_container import singleton
 from cltl.combot.infra.config import ConfigurationManager, ConfigurationContainer
 from cltl.combot.infra.event import EventBusContainer, EventBus, Event
+from cltl.combot.infra.event.api import is_batch_handler, TopicError
+from cltl.combot.infra.event.dispatch import RejectionStrategy, TopicDispatcher, DEFAULT_QUEUE_SIZE
+from cltl.combot.infra.event.serialization import serializers
+from cltl.combot.infra.event.shared_memory import SharedArrayStore, share_arrays
+from cltl.combot.infra.event.topics import TopicMatcher, is_pattern
+from cltl.combot.infra.metrics import LatencyRecorder, CompressionRecorder
 
 logger = logging.getLogger(__name__)
 
 
+try:
+    import lz4.frame
+except ImportError:
+    pass
+else:
+    register_compression(lz4.frame.compress, lz4.frame.decompress, 'application/x-lz4', aliases=['lz4'])
+
+
+_SERIALIZER_PREFIX = "cltl-"
+
+
+def register_serializers():
+    """
+    Register the serializers from the :mod:`cltl.combot.infra.event.serialization` registry with kombu,
+    prefixed with `cltl-`, e.g. `cltl-json` or `cltl-msgpack`.
+    """
+    for serializer in serializers():
+        register(_SERIALIZER_PREFIX + serializer.name, serializer.dumps, serializer.loads,
+                 content_type=serializer.content_type,
+                 content_encoding=serializer.content_encoding)
+
+
+def _trusted_serializers():
+    return [_SERIALIZER_PREFIX + serializer.name for serializer in serializers()
+            if serializer.trusted and _SERIALIZER_PREFIX + serializer.name in registry.name_to_type]
+
+
 class KombuEventBusContainer(EventBusContainer, ConfigurationContainer):
+    """
+    Provides a :class:`KombuEventBus` configured from the `cltl.event.kombu` configuration section.
+
+    The serializer used to publish events can be selected with the optional `serializer` key,
+    defaults to `cltl-json` (see :func:`register_serializers`). Events published with any of the
+    trusted serializers are accepted.
+    """
     logger.info("Initialized KombuEventBusContainer")
 
     @property
     @singleton
     def event_bus(self):
-        register('cltl-json',
-                 lambda x: json.dumps(x, default=vars),
-                 lambda x: json.loads(x, object_hook=lambda d: SimpleNamespace(**d)),
-                 content_type='application/json',
-                 content_encoding='utf-8')
+        register_serializers()
+
+        config = self.config_manager.get_config("cltl.event.kombu")
+        serializer = config.get('serializer') if 'serializer' in config else 'cltl-json'
+        if serializer not in registry.name_to_type:
+            raise ValueError("Serializer " + serializer + " is not available")
+
+        return KombuEventBus(serializer, self.config_manager)
 
-        return KombuEventBus('cltl-json', self.config_manager)
+
+_MAX_RETRIES = 3
+_OUTBOX_STOP_TIMEOUT = 5.0
+_DEFAULT_ACK_INTERVAL = 0.1
+_SAFETY_INTERVAL = 1.0
+# Maximum time until messages held because the handler queue of their topic was full are retried
+_HELD_RETRY_INTERVAL = 0.1
 
 
 class KombuEventBus(EventBus):
+    """
+    EventBus based on `kombu <https://docs.celeryq.dev/projects/kombu>`_.
+
+    Each publishing thread uses its own long-lived connection and producer. The exchange is
+    declared once per connection and again only after the connection was re-established.
+
+    By default a separate consumer thread with its own connection is started for each subscribed
+    topic. If `shared_consumer` is enabled in the `cltl.event.kombu` configuration, a single consumer
+    thread consumes all subscribed topics on one connection.
+
+    If the exchange is of `type` `topic`, handlers can be subscribed to topic patterns as described in
+    :mod:`cltl.combot.infra.event.topics`. The pattern is used as binding key of a single queue for all
+    matching topics, which is consumed like the queue of a single topic.
+
+    Message delivery is configured with the following optional keys in the `cltl.event.kombu`
+    configuration:
+
+    * `prefetch_count`: Maximum number of unacknowledged messages per consumer.
+    * `ack_batch_size`: Acknowledge messages in batches of the given size, defaults to 1.
+    * `ack_interval`: Maximum time in seconds an acknowledgement is deferred when acknowledging
+      in batches, defaults to 0.1.
+    * `no_ack_topics`: Topics that are consumed without acknowledgements (at-most-once delivery),
+      e.g. for high-rate topics where loss of events is acceptable.
+    * `handler_workers`: If set, handlers are not invoked on the consumer thread, but on a bounded pool
+      of worker threads. Events of a topic are still delivered in order. The consumer thread only
+      enqueues received events and acknowledges them once enqueued.
+    * `handler_queue_size`: Maximum number of pending events per topic when `handler_workers` is set,
+      defaults to 1024. When the queue of a topic is full, consuming that topic is paused until the queue
+      has space again, while the consumer thread continues to consume other topics.
+
+    Compression of published events is configured with the `compression` key, which is either a
+    codec supported by kombu or `auto`, and the optional `compression_threshold` key with the minimum
+    size in bytes of events to compress. Topics listed in `compression_topics` can be configured
+    individually in a section `cltl.event.kombu:<topic>` with the same keys. With `auto`, the first codec
+    available to the publisher from the optional `compression_codecs` list is used, e.g. `lz4, zstd, zlib`,
+    and zlib if none is configured or available. Messages are not negotiated with consumers, every consumer
+    must be able to decompress all codecs used by publishers. For lz4 and zstd this requires the `lz4`
+    respectively `zstd` extra of this package on all consumers, and lz4 is only registered with kombu
+    by importing this module.
+
+    If `outbox_size` is configured, :meth:`publish` does not block on the broker. Events are serialized
+    and put in a bounded outbox, from which they are sent by a background thread that reconnects with
+    exponential backoff if the broker is unavailable. When the outbox is full, the
+    `outbox_rejection_strategy` is applied, which defaults to `DROP`. If `outbox_spill_dir` is
+    configured, events are instead written to a spill file in that directory when the outbox is full.
+    Spilled events are not retained when the application is restarted.
+
+    If `shared_memory_size` is configured, numpy arrays of at least `shared_memory_threshold` bytes
+    (default 1 MiB) in published events are placed in a shared memory ring buffer of that size, and only
+    a handle is sent over the broker. Arrays are kept for at least `shared_memory_retention` seconds
+    (default 1.0). This requires all consumers to run on the same host as the publisher, see
+    :mod:`cltl.combot.infra.event.shared_memory`.
+    """
     def __init__(self, serializer: str, config_manager: ConfigurationManager):
         config = config_manager.get_config("cltl.event.kombu")
         server = config.get('server')
         exchange = config.get('exchange')
         exchange_type = config.get('type')
-        self._compression = config.get('compression')
+        codecs = config.get('compression_codecs', multi=True) if 'compression_codecs' in config else []
+        self._compression = _compression_policy(config, codecs=codecs)
+        self._topic_compression = {
+            topic: _compression_policy(config_manager.get_config("cltl.event.kombu:" + topic),
+                                       self._compression, codecs)
+            for topic in (config.get('compression_topics', multi=True) if 'compression_topics' in config else [])}
+        self._compression_stats = CompressionRecorder()
+        self._array_store = None
+        if 'shared_memory_size' in config:
+            self._array_store = SharedArrayStore(
+                config.get_int('shared_memory_size'),
+                config.get_int('shared_memory_threshold') if 'shared_memory_threshold' in config else 1024 * 1024,
+                config.get_float('shared_memory_retention') if 'shared_memory_retention' in config else 1.0)
         self._serializer = serializer
+        # Accept events from publishers configured with a different serializer
+        self._accept = [serializer] + [name for name in _trusted_serializers() if name != serializer]
 
         self._topic_lock = RLock()
         self.connection = Connection(server)
         self.exchange = Exchange(exchange, type=exchange_type)
 
+        self._shared_consumer_enabled = config.get_boolean('shared_consumer') if 'shared_consumer' in config else False
+        self._prefetch_count = config.get_int('prefetch_count') if 'prefetch_count' in config else None
+        self._ack_batch_size = config.get_int('ack_batch_size') if 'ack_batch_size' in config else 1
+        self._ack_interval = config.get_float('ack_interval') if 'ack_interval' in config else _DEFAULT_ACK_INTERVAL
+        self._no_ack_topics = set(config.get('no_ack_topics', multi=True)) if 'no_ack_topics' in config else set()
+        if self._prefetch_count and self._ack_batch_size > self._prefetch_count:
+            raise ValueError(f"ack_batch_size ({self._ack_batch_size}) must not exceed "
+                             f"prefetch_count ({self._prefetch_count})")
+
+        self._handler_executor = None
+        self._handler_queue_size = None
+        if 'handler_workers' in config:
+            self._handler_executor = ThreadPoolExecutor(max_workers=config.get_int('handler_workers'),
+                                                        thread_name_prefix="KombuEventBus-handler")
+            self._handler_queue_size = config.get_int('handler_queue_size') \
+                if 'handler_queue_size' in config else DEFAULT_QUEUE_SIZE
+        self._dispatchers: Dict[str, TopicDispatcher] = {}
+        self._safety_interval = _HELD_RETRY_INTERVAL if self._handler_executor else _SAFETY_INTERVAL
+        if self._ack_batch_size > 1:
+            # Consumers check deferred acknowledgements only when they stop waiting for messages
+            self._safety_interval = min(self._safety_interval, self._ack_interval)
+
         self._producer_topics: Set[str] = set()
         self._consumers: Dict[str, _EventBusConsumer] = {}
+        self._shared_consumer: Optional[_SharedEventBusConsumer] = None
         self._handlers: Dict[str, Tuple[Callable, ...]] = {}
 
+        self._local = threading.local()
+        self._publishers: List[_Publisher] = []
+        self._publish_latency = LatencyRecorder()
+
+        self._outbox = None
+        self._outbox_sender = None
+        if 'outbox_size' in config:
+            strategy = config.get_enum('outbox_rejection_strategy', RejectionStrategy) \
+                if 'outbox_rejection_strategy' in config else RejectionStrategy.DROP
+            spill_dir = config.get('outbox_spill_dir') if 'outbox_spill_dir' in config else None
+            self._outbox = _Outbox(config.get_int('outbox_size'), strategy, spill_dir)
+            self._outbox_sender = _OutboxSender(self._outbox, self._create_publisher())
+            self._outbox_sender.start()
+
+    @property
+    def publish_latency(self) -> LatencyRecorder:
+        """
+        Returns
+        -------
+        LatencyRecorder
+            Latencies of :meth:`publish` calls in milliseconds.
+        """
+        return self._publish_latency
+
+    @property
+    def compression_stats(self) -> CompressionRecorder:
+        """
+        Returns
+        -------
+        CompressionRecorder
+            Sizes of published events before and after compression and the time spent compressing, per topic.
+        """
+        return self._compression_stats
+
+    @property
+    def outbox_dropped(self) -> int:
+        """
+        Returns
+        -------
+        int
+            The number of events rejected because the outbox was full.
+        """
+        return self._outbox.dropped if self._outbox is not None else 0
+
     def publish(self, topic: str, event: Event) -> None:
+        start = time.perf_counter()
+
         self._producer_topics.add(topic)
+        if self._outbox is not None:
+            self._outbox.put(self._get_publisher().encode(event, topic))
+        else:
+            self._get_publisher().publish(event, topic)
+
+        self._publish_latency.record((time.perf_counter() - start) * 1000)
+
+    def publish_batch(self, topic: str, events: Iterable[Event]) -> None:
+        self._producer_topics.add(topic)
+
+        publisher = self._get_publisher()
+        for event in events:
+            if self._outbox is not None:
+                self._outbox.put(publisher.encode(event, topic))
+            else:
+                publisher.publish(event, topic)
+
+    def stop(self, timeout: float = _OUTBOX_STOP_TIMEOUT) -> None:
+        """
+        Close the connections used for publishing and stop the handler workers.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum time in seconds to wait for events in the outbox to be sent, if configured.
+        """
+        if self._outbox_sender:
+            self._outbox_sender.stop(timeout)
+            self._outbox.close()
+
+        with self._topic_lock:
+            publishers, self._publishers = self._publishers, []
+            self._local = threading.local()
+
+        for publisher in publishers:
+            publisher.close()
+
+        if self._handler_executor:
+            with self._topic_lock:
+                for dispatcher in self._dispatchers.values():
+                    dispatcher.close()
+            self._handler_executor.shutdown(wait=True)
+
+        if self._array_store:
+            self._array_store.close()
+            self._array_store = None
 
-        with connections[self.connection].acquire(block=True) as connection:
-            with producers[connection].acquire(block=True) as producer:
-                producer.publish(event,
-                                 serializer=self._serializer,
-                                 compression=self._compression,
-                                 exchange=self.exchange,
-                                 declare=[self.exchange],
-                                 routing_key=topic)
+    def _get_publisher(self) -> "_Publisher":
+        try:
+            return self._local.publisher_ref.publisher
+        except AttributeError:
+            publisher = self._create_publisher()
+            publisher_ref = _PublisherRef(publisher)
+            # Thread local data is cleared when the thread ends, release the connection of the publisher then
+            weakref.finalize(publisher_ref, _release_publisher, weakref.ref(self), publisher)
+            self._local.publisher_ref = publisher_ref
+
+            return publisher
+
+    def _release_publisher(self, publisher: "_Publisher") -> None:
+        with self._topic_lock:
+            try:
+                self._publishers.remove(publisher)
+            except ValueError:
+                # Already closed on stop
+                return
+
+        publisher.close()
+
+    def _create_publisher(self) -> "_Publisher":
+        publisher = _Publisher(self.connection, self.exchange, self._serializer,
+                               self._compression, self._topic_compression, self._compression_stats,
+                               self._array_store)
+        with self._topic_lock:
+            self._publishers.append(publisher)
+
+        return publisher
 
     def subscribe(self, topic, handler: Callable[[Event], None]) -> None:
+        if is_pattern(topic) and self.exchange.type != "topic":
+            raise TopicError(f"Subscription to topic pattern {topic} requires an exchange of type 'topic', "
+                             f"not '{self.exchange.type}'")
+
         with self._topic_lock:
-            start_consumer = False
-            if topic not in self._consumers:
+            if topic not in self._handlers:
                 self._handlers[topic] = ()
-                consumer = _EventBusConsumer(self.connection, self.exchange, self._serializer,
-                                             topic, self._topic_handler(topic))
-                self._consumers[topic] = consumer
-                start_consumer = True
+                queue = Queue(topic, self.exchange, routing_key=topic)
+                # Declare the queue before returning, such that events published after subscription are received
+                with self.connection.clone() as connection:
+                    queue(connection.default_channel).declare()
+                self._start_consumer(topic, queue)
 
             self._handlers[topic] += (handler,)
 
-            if start_consumer:
-                self._consumers[topic].start()
-
         logger.info("Subscribed %s to topic %s", _format_name(handler), topic)
 
     def _topic_handler(self, topic: str):
-        def handler(event):
-            if topic in self._handlers:
-                for handl in self._handlers[topic]:
-                    handl(Event.with_topic(event, topic))
+        if self._handler_executor:
+            dispatcher = TopicDispatcher(topic, self._handler_executor, self._deliver,
+                                          self._handler_queue_size, RejectionStrategy.BLOCK)
+            self._dispatchers[topic] = dispatcher
 
-        return handler
+            def handler(event, routing_key):
+                # The consumer thread must not block, messages that are not accepted are retried
+                return dispatcher.put(Event.with_topic(event, routing_key), block=False)
+        else:
+            def handler(event, routing_key):
+                self._deliver(topic, [Event.with_topic(event, routing_key)])
+
+                return True
+
+        if not is_pattern(topic):
+            return handler
+
+        # The virtual transports of kombu also match '*' to multiple words
+        matcher = TopicMatcher([(topic, True)])
+
+        def pattern_handler(event, routing_key):
+            return not matcher.match(routing_key) or handler(event, routing_key)
+
+        return pattern_handler
+
+    def _deliver(self, topic: str, topic_events: List[Event]):
+        # For pattern subscriptions, the topic is the pattern and events are from the topics matching it
+        handlers = self._handlers.get(topic)
+        if handlers:
+            for handl in handlers:
+                if is_batch_handler(handl):
+                    handl(topic_events)
+                else:
+                    for topic_event in topic_events:
+                        handl(topic_event)
 
     def unsubscribe(self, topic: str, handler: Callable[[Event], None] = None) -> None:
         with self._topic_lock:
             if topic not in self._handlers:
                 return
             elif handler:
-                try:
-                    self._handlers[topic] = tuple(h for h in self._handlers if h is not handler)
-                    if len(self._handlers[topic]) == 0:
-                        self._stop_consumer(topic)
-                        logger.debug("Stopped EventBusConsumer for topic %s", topic)
-                except ValueError as e:
-                    raise ValueError("Failed to unregister " + _format_name(handler), e)
+                self._handlers[topic] = tuple(h for h in self._handlers[topic] if h != handler)
+                if len(self._handlers[topic]) == 0:
+                    self._stop_consumer(topic)
+                    logger.debug("Stopped EventBusConsumer for topic %s", topic)
                 logger.debug("Unsubscribed %s from topic %s", _format_name(handler), topic)
             else:
                 self._stop_consumer(topic)
                 logger.debug("Unsubscribed all handlers and stopped consumer for topic %s", topic)
 
+    def _start_consumer(self, topic: str, queue: Queue):
+        no_ack = topic in self._no_ack_topics
+
+        if not self._shared_consumer_enabled:
+            self._consumers[topic] = _EventBusConsumer(self.connection, self._accept, queue,
+                                                       self._topic_handler(topic), no_ack,
+                                                       self._prefetch_count, self._create_acknowledger(),
+                                                       self._safety_interval)
+            self._consumers[topic].start()
+            return
+
+        if self._shared_consumer is None:
+            self._shared_consumer = _SharedEventBusConsumer(self.connection, self._accept,
+                                                            self._prefetch_count, self._create_acknowledger(),
+                                                            self._safety_interval)
+            self._shared_consumer.add_queue(topic, queue, self._topic_handler(topic), no_ack)
+            self._shared_consumer.start()
+        else:
+            self._shared_consumer.add_queue(topic, queue, self._topic_handler(topic), no_ack)
+
+    def _create_acknowledger(self):
+        return _Acknowledger(self._ack_batch_size, self._ack_interval)
+
     def _stop_consumer(self, topic):
-        self._consumers[topic].should_stop = True
-        self._consumers[topic].join()
-        del self._consumers[topic]
         del self._handlers[topic]
+        self._dispatchers.pop(topic, None)
+
+        if not self._shared_consumer_enabled:
+            self._consumers[topic].should_stop = True
+            self._consumers[topic].join()
+            del self._consumers[topic]
+        elif not self._shared_consumer.remove_queue(topic):
+            self._shared_consumer.should_stop = True
+            self._shared_consumer.join()
+            self._shared_consumer = None
 
     @property
     def topics(self):
-        return tuple(self._consumers.keys() | self._producer_topics)
+        return tuple({topic for topic in self._handlers if not is_pattern(topic)} | self._producer_topics)
+
+
+class _CompressionPolicy(NamedTuple):
+    codec: Optional[str]
+    threshold: int = 0
+
+
+def _available_codec(codecs: Iterable[str] = ()) -> str:
+    """
+    Returns the first of the given codecs that is available, zlib if none is available.
+
+    Only codecs that all consumers can decompress must be given, availability is only checked for the publisher.
+    """
+    for codec in codecs:
+        try:
+            get_encoder(codec)
+            return codec
+        except KeyError:
+            logger.debug("Compression codec %s is not available", codec)
+
+    return "zlib"
+
+
+def _compression_policy(config, default: _CompressionPolicy = _CompressionPolicy(None),
+                        codecs: Iterable[str] = ()) -> _CompressionPolicy:
+    codec = config.get('compression') if 'compression' in config else default.codec
+    if codec and codec.lower() in ("none", "false"):
+        codec = None
+    elif codec == "auto":
+        codec = _available_codec(codecs)
+    threshold = config.get_int('compression_threshold') if 'compression_threshold' in config else default.threshold
+
+    return _CompressionPolicy(codec, threshold)
+
+
+class _Publisher:
+    """
+    Producer with its own connection, to be used by a single thread.
+
+    Events are serialized by the publisher and compressed according to the compression policy of their topic.
+    """
+    def __init__(self, connection: Connection, exchange: Exchange, serializer: str,
+                 compression: _CompressionPolicy, topic_compression: Dict[str, _CompressionPolicy],
+                 compression_stats: CompressionRecorder, array_store: SharedArrayStore = None):
+        self._connection = connection.clone()
+        self._producer = Producer(self._connection, exchange=exchange, auto_declare=False)
+        self._serializer = serializer
+        self._compression = compression
+        self._topic_compression = topic_compression
+        self._compression_stats = compression_stats
+        self._array_store = array_store
+        self._declared = False
+        self._publish = self._connection.ensure(self._producer, self._publish_declared,
+                                                max_retries=_MAX_RETRIES,
+                                                errback=self._on_connection_error,
+                                                on_revive=self._on_revive)
+
+    def publish(self, event: Event, topic: str):
+        self.send(self.encode(event, topic))
+
+    def encode(self, event: Event, topic: str) -> "_OutboundMessage":
+        if self._array_store:
+            with share_arrays(self._array_store):
+                content_type, content_encoding, body = dumps(event, serializer=self._serializer)
+        else:
+            content_type, content_encoding, body = dumps(event, serializer=self._serializer)
+        if isinstance(body, str):
+            body = body.encode(content_encoding)
+
+        headers = {}
+        codec, threshold = self._topic_compression.get(topic, self._compression)
+        if codec and len(body) >= threshold:
+            start = time.perf_counter()
+            compressed, headers["compression"] = compress(body, codec)
+            duration = (time.perf_counter() - start) * 1000
+            self._compression_stats.record(topic, len(body), len(compressed), duration)
+            body = compressed
+        else:
+            self._compression_stats.record(topic, len(body))
+
+        return _OutboundMessage(topic, body, content_type, content_encoding, headers)
+
+    def send(self, message: "_OutboundMessage"):
+        self._publish(message.body, message.topic, message.content_type, message.content_encoding, message.headers)
+
+    def close(self):
+        self._connection.release()
+
+    def _publish_declared(self, body: bytes, topic: str, content_type: str, content_encoding: str, headers: dict):
+        if not self._declared:
+            self._producer.declare()
+            self._declared = True
+
+        self._producer.publish(body, routing_key=topic, content_type=content_type,
+                               content_encoding=content_encoding, headers=headers)
+
+    def _on_revive(self, channel):
+        self._declared = False
+        logger.info("Reconnected publisher to %s", self._connection.as_uri())
+
+    def _on_connection_error(self, exc, interval):
+        logger.warning("Failed to publish to %s, retry in %s s: %s", self._connection.as_uri(), interval, exc)
+
+
+class _PublisherRef:
+    """
+    Thread local reference to the publisher of a thread.
+    """
+    __slots__ = ("publisher", "__weakref__")
+
+    def __init__(self, publisher: _Publisher):
+        self.publisher = publisher
+
+
+def _release_publisher(event_bus_ref: "weakref.ref[KombuEventBus]", publisher: _Publisher) -> None:
+    event_bus = event_bus_ref()
+    if event_bus is not None:
+        event_bus._release_publisher(publisher)
+
+
+class _OutboundMessage(NamedTuple):
+    topic: str
+    body: bytes
+    content_type: str
+    content_encoding: str
+    headers: dict
+
+
+class _Outbox:
+    """
+    Bounded queue of encoded messages waiting to be sent.
+
+    If a spill directory is provided, messages are appended to a spill file when the queue is full,
+    and are read back in order once the queue is drained.
+    """
+    def __init__(self, size: int, rejection_strategy: RejectionStrategy, spill_dir: str = None):
+        self._size = size
+        self._strategy = rejection_strategy
+        self._queue = deque()
+        self._lock = Lock()
+        self._not_empty = Condition(self._lock)
+        self._not_full = Condition(self._lock)
+        self.dropped = 0
+
+        self._spill = None
+        self._spilled = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._spill = tempfile.TemporaryFile(dir=spill_dir, prefix="outbox-", suffix=".spill")
+            self._spill_read = 0
+
+    def put(self, message: _OutboundMessage):
+        with self._lock:
+            if self._spilled or len(self._queue) >= self._size:
+                if self._spill:
+                    self._write_spill(message)
+                    self._not_empty.notify()
+                    return
+                if not self._reject(message):
+                    return
+
+            self._queue.append(message)
+            self._not_empty.notify()
+
+    def _reject(self, message: _OutboundMessage) -> bool:
+        while len(self._queue) >= self._size:
+            if self._strategy == RejectionStrategy.BLOCK:
+                self._not_full.wait()
+            elif self._strategy == RejectionStrategy.OVERWRITE:
+                self._queue.popleft()
+                self.dropped += 1
+            elif self._strategy == RejectionStrategy.DROP:
+                self.dropped += 1
+                logger.debug("Dropped message on topic %s, outbox is full", message.topic)
+                return False
+            elif self._strategy == RejectionStrategy.EXCEPTION:
+                raise Full("Outbox is full")
+            else:
+                raise ValueError("Unknown strategy: " + str(self._strategy))
+
+        return True
+
+    def get(self, timeout: float = None) -> Optional[_OutboundMessage]:
+        with self._lock:
+            if not self._queue and not self._spilled:
+                self._not_empty.wait(timeout)
+
+            if self._queue:
+                message = self._queue.popleft()
+                self._not_full.notify()
+                return message
+            if self._spilled:
+                return self._read_spill()
+
+            return None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._queue) + self._spilled
+
+    def close(self):
+        if self._spill:
+            self._spill.close()
+
+    def _write_spill(self, message: _OutboundMessage):
+        data = pickle.dumps(tuple(message), protocol=pickle.HIGHEST_PROTOCOL)
+        self._spill.seek(0, os.SEEK_END)
+        self._spill.write(_SPILL_FRAME.pack(len(data)))
+        self._spill.write(data)
+        self._spilled += 1
+
+    def _read_spill(self) -> _OutboundMessage:
+        self._spill.seek(self._spill_read)
+        length, = _SPILL_FRAME.unpack(self._spill.read(_SPILL_FRAME.size))
+        message = _OutboundMessage(*pickle.loads(self._spill.read(length)))
+        self._spill_read += _SPILL_FRAME.size + length
+        self._spilled -= 1
+
+        if not self._spilled:
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._spill_read = 0
+
+        return message
+
+
+_SPILL_FRAME = struct.Struct("!I")
+_OUTBOX_BACKOFF = 0.1
+_OUTBOX_MAX_BACKOFF = 5.0
+
+
+class _OutboxSender(Thread):
+    """
+    Send messages from an :class:`_Outbox`, retrying with exponential backoff while the broker is unavailable.
+    """
+    def __init__(self, outbox: _Outbox, publisher: "_Publisher"):
+        super().__init__(name="KombuEventBus-outbox", daemon=True)
+        self._outbox = outbox
+        self._publisher = publisher
+        self._stopped = threading.Event()
+        self._deadline = None
+
+    def run(self):
+        message = None
+        backoff = _OUTBOX_BACKOFF
+        while not self._should_stop(message):
+            if message is None:
+                message = self._outbox.get(timeout=0.1)
+                if message is None:
+                    continue
+
+            try:
+                self._publisher.send(message)
+                message = None
+                backoff = _OUTBOX_BACKOFF
+            except Exception as e:
+                logger.warning("Failed to send message on topic %s, retry in %s s: %s", message.topic, backoff, e)
+                time.sleep(backoff)
+                backoff = min(2 * backoff, _OUTBOX_MAX_BACKOFF)
+
+        if message is not None or len(self._outbox):
+            logger.warning("Stopped sending with %s pending messages",
+                           len(self._outbox) + (message is not None))
+
+    def _should_stop(self, message) -> bool:
+        if not self._stopped.is_set():
+            return False
+
+        pending = message is not None or len(self._outbox)
+
+        return not pending or time.monotonic() >= self._deadline
+
+    def stop(self, timeout: float):
+        """
+        Stop sending after the outbox was drained, or after at most `timeout` seconds.
+        """
+        self._deadline = time.monotonic() + timeout
+        self._stopped.set()
+        self.join()
+
+
+class _Acknowledger:
+    """
+    Acknowledge messages in batches of `batch_size` messages, or after at most `interval` seconds.
+
+    Batches are acknowledged with a single `multiple` acknowledgement, except for virtual transports,
+    which don't support it, and while `held` messages are not acknowledged yet, which a `multiple`
+    acknowledgement would include. The Acknowledger must only be used from the consumer thread.
+    """
+    def __init__(self, batch_size: int = 1, interval: float = _DEFAULT_ACK_INTERVAL):
+        self._batch_size = max(1, batch_size)
+        self._interval = interval
+        self._pending: List[Message] = []
+        self._deadline = None
+        # Number of received messages that are held unacknowledged by the consumer
+        self.held = 0
+
+    def ack(self, message: Message):
+        if self._batch_size == 1:
+            message.ack()
+            return
+
+        if not self._pending:
+            self._deadline = time.monotonic() + self._interval
+        self._pending.append(message)
+
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def on_iteration(self):
+        if self._pending and time.monotonic() >= self._deadline:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        if self.held or isinstance(pending[-1].channel, VirtualChannel):
+            for message in pending:
+                message.ack()
+        else:
+            pending[-1].ack(multiple=True)
+
+    def reset(self):
+        """
+        Discard pending acknowledgements, e.g. after the channel was closed.
+        """
+        self._pending = []
+        self.held = 0
+
+
+class _MessageHandler:
+    """
+    Invoke the callback of a queue for the messages received by a kombu Consumer and acknowledge them.
+
+    If the callback does not accept a message because the handler queue of its topic is full, the message and
+    all subsequent messages of the queue are held unacknowledged and the Consumer is paused. Held messages are
+    retried in order on each iteration of the consumer thread, such that the consumer thread never blocks on
+    a single topic. Must only be used from the consumer thread.
+    """
+    def __init__(self, consumer: Consumer, callback: Callable, no_ack: bool, acknowledger: _Acknowledger):
+        self.consumer = consumer
+        self._callback = callback
+        self._no_ack = no_ack
+        self._acknowledger = acknowledger
+        self._held = deque()
+        self._paused = False
+
+        consumer.register_callback(self.on_message)
+
+    def on_message(self, body, message: Message):
+        logger.debug("Received message: %s", body)
+        if not self._held and self._callback(body, message.delivery_info.get("routing_key")):
+            self._ack(message)
+            return
+
+        self._held.append((body, message))
+        if not self._no_ack:
+            self._acknowledger.held += 1
+
+    def on_iteration(self):
+        while self._held:
+            body, message = self._held[0]
+            if not self._callback(body, message.delivery_info.get("routing_key")):
+                break
+            self._held.popleft()
+            if not self._no_ack:
+                self._acknowledger.held -= 1
+            self._ack(message)
+
+        if self._held and not self._paused:
+            self.consumer.cancel()
+            self._paused = True
+        elif not self._held and self._paused:
+            self.consumer.consume()
+            self._paused = False
+
+    def close(self):
+        """
+        Stop consuming and return held messages to the queue.
+        """
+        self.consumer.cancel()
+        for _, message in self._held:
+            if not self._no_ack:
+                message.requeue()
+                self._acknowledger.held -= 1
+        self._held.clear()
+
+    def _ack(self, message: Message):
+        if not self._no_ack:
+            self._acknowledger.ack(message)
 
 
 class _EventBusConsumer(ConsumerMixin, Thread):
-    def __init__(self, connection, exchange, serializer, topic, callback):
-        super().__init__(name=f"EventBusConsumer-{topic}-{_format_name(callback)}" + topic)
+    """
+    Consume the queue of a single topic.
+
+    The consumer thread waits at most `safety_interval` seconds for messages before it retries held
+    messages and flushes pending acknowledgements.
+    """
+    def __init__(self, connection, accept, queue, callback, no_ack=False, prefetch_count=None,
+                 acknowledger=None, safety_interval=_SAFETY_INTERVAL):
+        super().__init__(name=f"EventBusConsumer-{queue.name}-{_format_name(callback)}")
         self.connection = connection
-        self.serializer = serializer
-        self.topic = topic
+        self.accept = accept
         self.callback = callback
-        self.queue = Queue(topic, exchange, routing_key=topic)
+        self.queue = queue
+        self.no_ack = no_ack
+        self.prefetch_count = prefetch_count
+        self.acknowledger = acknowledger if acknowledger else _Acknowledger()
+        self.safety_interval = safety_interval
+        self._handler = None
+
+    def run(self, _tokens=1, **kwargs):
+        super().run(_tokens, safety_interval=self.safety_interval, **kwargs)
 
     def get_consumers(self, Consumer, channel):
-        return [Consumer([self.queue], accept=[self.serializer], callbacks=[self.on_message])]
+        # Called whenever the connection is (re-)established, held messages of the previous channel are redelivered
+        consumer = Consumer([self.queue], accept=self.accept, no_ack=self.no_ack, prefetch_count=self.prefetch_count)
+        self._handler = _MessageHandler(consumer, self.callback, self.no_ack, self.acknowledger)
 
-    def on_message(self, body, message):
-        logger.debug("Received message: %s", body)
-        self.callback(body)
-        message.ack()
+        return [consumer]
+
+    def on_iteration(self):
+        if self._handler:
+            self._handler.on_iteration()
+        self.acknowledger.on_iteration()
+
+    def on_connection_revived(self):
+        self.acknowledger.reset()
+
+    def on_consume_end(self, connection, channel):
+        self.acknowledger.flush()
+
+
+class _SharedEventBusConsumer(ConsumerMixin, Thread):
+    """
+    Consume the queues of multiple topics on a single connection and channel.
+
+    Each queue is consumed by a separate kombu Consumer on the shared channel with its own callback, such
+    that messages are dispatched by the queue they were received from. Queues can be added and removed
+    while the consumer is running, changes are applied on the consumer thread within `safety_interval` seconds.
+    """
+    def __init__(self, connection, accept, prefetch_count=None, acknowledger=None, safety_interval=_SAFETY_INTERVAL):
+        super().__init__(name="EventBusConsumer-shared")
+        self.connection = connection
+        self.accept = accept
+        self.prefetch_count = prefetch_count
+        self.acknowledger = acknowledger if acknowledger else _Acknowledger()
+        self.safety_interval = safety_interval
+
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Tuple[Queue, Callable, bool]] = {}
+        self._pending: List[Tuple[bool, str]] = []
+        self._consumer_factory = None
+        self._handlers: Dict[str, _MessageHandler] = {}
+
+    def add_queue(self, topic: str, queue: Queue, callback: Callable, no_ack: bool = False):
+        with self._lock:
+            self._queues[topic] = (queue, callback, no_ack)
+            self._pending.append((True, topic))
+
+    def remove_queue(self, topic: str) -> bool:
+        """
+        Returns
+        -------
+        bool
+            True if there are remaining queues.
+        """
+        with self._lock:
+            del self._queues[topic]
+            self._pending.append((False, topic))
+
+            return bool(self._queues)
+
+    def run(self, _tokens=1, **kwargs):
+        super().run(_tokens, safety_interval=self.safety_interval, **kwargs)
+
+    def get_consumers(self, Consumer, channel):
+        # Called on the consumer thread whenever the connection is (re-)established
+        with self._lock:
+            self._pending = []
+            queues = dict(self._queues)
+
+        self._consumer_factory = Consumer
+        self._handlers = {topic: self._create_handler(*queue) for topic, queue in queues.items()}
+
+        return [handler.consumer for handler in self._handlers.values()]
+
+    def on_iteration(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            queues = dict(self._queues)
+
+        for add, topic in pending:
+            handler = self._handlers.pop(topic, None)
+            if handler is not None:
+                handler.close()
+            if add and topic in queues:
+                self._handlers[topic] = self._create_handler(*queues[topic])
+                self._handlers[topic].consumer.consume()
+
+        for handler in self._handlers.values():
+            handler.on_iteration()
+        self.acknowledger.on_iteration()
+
+    def on_connection_revived(self):
+        self.acknowledger.reset()
+
+    def on_consume_end(self, connection, channel):
+        self.acknowledger.flush()
+
+    def _create_handler(self, queue: Queue, callback: Callable, no_ack: bool) -> _MessageHandler:
+        consumer = self._consumer_factory([queue], accept=self.accept, no_ack=no_ack,
+                                          prefetch_count=self.prefetch_count)
+
+        return _MessageHandler(consumer, callback, no_ack, self.acknowledger)
 
 
 def _format_name(handler: Callable[[Event], None]) -> str:
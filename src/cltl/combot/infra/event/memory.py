@@ -1,8 +1,13 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from threading import RLock
+from typing import Callable, Dict, Tuple, List
 
+from cltl.combot.infra.config import ConfigurationContainer
 from cltl.combot.infra.di_container import singleton
-from cltl.combot.infra.event.api import EventBusContainer, EventBus, Event
+from cltl.combot.infra.event.api import EventBusContainer, EventBus, Event, is_batch_handler
+from cltl.combot.infra.event.dispatch import RejectionStrategy, TopicDispatcher, DEFAULT_QUEUE_SIZE
+from cltl.combot.infra.event.topics import TopicMatcher, is_pattern
 from cltl.combot.infra.time_util import timestamp_now
 
 logger = logging.getLogger(__name__)
@@ -18,34 +23,90 @@ class SynchronousEventBusContainer(EventBusContainer):
 
 
 class SynchronousEventBus(EventBus):
+    """
+    EventBus that invokes the subscribed handlers on the thread of the publisher.
+
+    Handlers are stored as immutable tuples per topic that are replaced on subscription changes, such
+    that publishing does not require any locking.
+
+    Handlers can also be subscribed to topic patterns, see :mod:`cltl.combot.infra.event.topics`. Pattern
+    subscriptions are compiled into an immutable :class:`TopicMatcher` that is replaced on subscription changes.
+    Handlers subscribed to a pattern are invoked after the handlers subscribed to the topic itself.
+    """
     def __init__(self):
-        self._handlers = {}
+        self._handlers: Dict[str, Tuple[Callable[[Event], None], ...]] = {}
+        self._batch_handlers: Dict[str, Tuple[Callable[[List[Event]], None], ...]] = {}
+        self._pattern_handlers: Dict[str, Tuple[Callable, ...]] = {}
+        self._matcher: TopicMatcher[Tuple[Callable, bool]] = TopicMatcher()
         self._topic_lock = RLock()
 
     def publish(self, topic, event):
         start = timestamp_now()
 
-        for handler in self.__get_handlers(topic):
-            handler(Event.with_topic(event, topic))
+        handlers, batch_handlers, pattern_handlers = self._topic_handlers(topic)
+        if handlers or batch_handlers or pattern_handlers:
+            topic_event = Event.with_topic(event, topic)
+            for handler in handlers:
+                handler(topic_event)
+            for handler in batch_handlers:
+                handler([topic_event])
+            for handler, batch in pattern_handlers:
+                handler([topic_event] if batch else topic_event)
 
-        logger.debug("Published event %s in %s ms", event.id, timestamp_now() - start)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Published event %s in %s ms", event.id, timestamp_now() - start)
+
+    def publish_batch(self, topic, events):
+        start = timestamp_now()
+
+        handlers, batch_handlers, pattern_handlers = self._topic_handlers(topic)
+        if handlers or batch_handlers or pattern_handlers:
+            topic_events = [Event.with_topic(event, topic) for event in events]
+            for topic_event in topic_events:
+                for handler in handlers:
+                    handler(topic_event)
+            for handler in batch_handlers:
+                handler(topic_events)
+            for handler, batch in pattern_handlers:
+                if batch:
+                    handler(topic_events)
+                else:
+                    for topic_event in topic_events:
+                        handler(topic_event)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Published batch of events to %s in %s ms", topic, timestamp_now() - start)
 
     def subscribe(self, topic, handler):
+        if is_pattern(topic):
+            self.__subscribe_pattern(topic, handler)
+            return
+
         with self._topic_lock:
-            self.__get_handlers(topic).append(handler)
+            self.__register_topic(topic)
+            registry = self.__get_registry(handler)
+            registry[topic] = registry.get(topic, ()) + (handler,)
 
         logger.info("Subscribed %s to topic %s", self.__format_name(handler), topic)
 
-    def unsubscribe(self, topic, handler):
+    def unsubscribe(self, topic, handler=None):
+        if is_pattern(topic):
+            self.__unsubscribe_pattern(topic, handler)
+            return
+
         with self._topic_lock:
             if handler:
+                registry = self.__get_registry(handler)
+                handlers = registry.get(topic, ())
                 try:
-                    self.__get_handlers(topic).remove(handler)
+                    idx = handlers.index(handler)
                 except ValueError as e:
                     raise ValueError("Failed to unregister " + self.__format_name(handler), e)
+                registry[topic] = handlers[:idx] + handlers[idx + 1:]
                 logger.info("Unsubscribed %s from topic %s", self.__format_name(handler), topic)
             else:
-                self.__get_handlers(topic).clear()
+                self._handlers[topic] = ()
+                self._batch_handlers.pop(topic, None)
                 logger.info("Unsubscribed handlers from topic %s", topic)
 
     @property
@@ -53,13 +114,214 @@ class SynchronousEventBus(EventBus):
         with self._topic_lock:
             return list(self._handlers.keys())
 
-    def __get_handlers(self, topic):
+    def _topic_handlers(self, topic):
+        """
+        Returns the handlers and batch handlers subscribed to the topic, and the `(handler, batch)` pairs
+        subscribed to patterns matching the topic.
+        """
+        handlers = self._handlers.get(topic)
+        if handlers is None:
+            self.__register_topic(topic)
+            handlers = ()
+
+        return handlers, self._batch_handlers.get(topic, ()), self._matcher.match(topic)
+
+    def _format_name(self, handler):
+        return self.__format_name(handler)
+
+    def __subscribe_pattern(self, pattern, handler):
+        with self._topic_lock:
+            self._pattern_handlers[pattern] = self._pattern_handlers.get(pattern, ()) + (handler,)
+            self.__compile_patterns()
+
+        logger.info("Subscribed %s to topic pattern %s", self.__format_name(handler), pattern)
+
+    def __unsubscribe_pattern(self, pattern, handler):
         with self._topic_lock:
-            if topic not in self._handlers:
-                self._handlers[topic] = []
+            if handler:
+                handlers = self._pattern_handlers.get(pattern, ())
+                try:
+                    idx = handlers.index(handler)
+                except ValueError as e:
+                    raise ValueError("Failed to unregister " + self.__format_name(handler), e)
+                self._pattern_handlers[pattern] = handlers[:idx] + handlers[idx + 1:]
+                if not self._pattern_handlers[pattern]:
+                    del self._pattern_handlers[pattern]
+                logger.info("Unsubscribed %s from topic pattern %s", self.__format_name(handler), pattern)
+            else:
+                self._pattern_handlers.pop(pattern, None)
+                logger.info("Unsubscribed handlers from topic pattern %s", pattern)
+
+            self.__compile_patterns()
+
+    def __compile_patterns(self):
+        self._matcher = TopicMatcher((pattern, (handler, is_batch_handler(handler)))
+                                     for pattern, handlers in self._pattern_handlers.items()
+                                     for handler in handlers)
 
-            return self._handlers[topic]
+    def __register_topic(self, topic):
+        with self._topic_lock:
+            self._handlers.setdefault(topic, ())
+
+    def __get_registry(self, handler):
+        return self._batch_handlers if is_batch_handler(handler) else self._handlers
 
     def __format_name(self, handler):
         return (handler.__self__.__class__.__name__ + "." if hasattr(handler, "im_class") else "") + handler.__name__
 
+
+class AsyncEventBusContainer(EventBusContainer, ConfigurationContainer):
+    """
+    Provides an :class:`AsyncEventBus` configured from the optional `cltl.event.async` configuration section.
+
+    Supported keys are `workers`, `queue_size` and `rejection_strategy` as defaults for all topics. Topics listed
+    in `topics` can be configured individually in a section `cltl.event.async:<topic>` with the same
+    `queue_size` and `rejection_strategy` keys.
+    """
+    logger.info("Initialized AsyncEventBusContainer")
+
+    @property
+    @singleton
+    def event_bus(self):
+        if not self.config_manager.has_config("cltl.event.async"):
+            return AsyncEventBus()
+
+        config = self.config_manager.get_config("cltl.event.async")
+        workers = config.get_int("workers") if "workers" in config else None
+        queue_size = config.get_int("queue_size") if "queue_size" in config else DEFAULT_QUEUE_SIZE
+        strategy = config.get_enum("rejection_strategy", RejectionStrategy) \
+            if "rejection_strategy" in config else RejectionStrategy.BLOCK
+
+        topic_config = {}
+        for topic in (config.get("topics", multi=True) if "topics" in config else []):
+            topic_section = self.config_manager.get_config("cltl.event.async:" + topic)
+            topic_config[topic] = (
+                topic_section.get_int("queue_size") if "queue_size" in topic_section else queue_size,
+                topic_section.get_enum("rejection_strategy", RejectionStrategy)
+                    if "rejection_strategy" in topic_section else strategy)
+
+        return AsyncEventBus(max_workers=workers, queue_size=queue_size, rejection_strategy=strategy,
+                             topic_config=topic_config)
+
+
+class AsyncEventBus(SynchronousEventBus):
+    """
+    EventBus that delivers events to subscribers on a bounded pool of worker threads.
+
+    Publishing only enqueues the event in a bounded per-topic queue and returns. Events of a topic are delivered
+    to its subscribers in the order they were published, different topics are processed in parallel by the
+    worker pool. When the queue of a topic is full, the configured :class:`RejectionStrategy` is applied.
+
+    Pending events of a topic are delivered in batches, which are passed to handlers marked with
+    :func:`batch_handler` in a single call.
+
+    Exceptions raised by handlers are logged, they don't affect the delivery of events to other handlers
+    or of other events in the batch.
+
+    Note that with `RejectionStrategy.BLOCK` a handler that publishes to a full topic blocks a worker thread
+    until events of that topic are delivered.
+    """
+
+    def __init__(self, max_workers: int = None, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 rejection_strategy: RejectionStrategy = RejectionStrategy.BLOCK,
+                 topic_config: Dict[str, Tuple[int, RejectionStrategy]] = None):
+        """
+        Parameters
+        ----------
+        max_workers : int
+            Maximum number of threads used to deliver events, defaults to the
+            default of :class:`ThreadPoolExecutor`.
+        queue_size : int
+            Maximum number of pending events per topic, 0 for an unbounded queue.
+        rejection_strategy : RejectionStrategy
+            Strategy to apply when the queue of a topic is full.
+        topic_config : Dict[str, Tuple[int, RejectionStrategy]]
+            Queue size and rejection strategy for individual topics.
+        """
+        super().__init__()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="AsyncEventBus")
+        self._queue_size = queue_size
+        self._strategy = rejection_strategy
+        self._topic_config = dict(topic_config) if topic_config else {}
+        self._dispatchers: Dict[str, TopicDispatcher] = {}
+
+    def configure_topic(self, topic: str, queue_size: int, rejection_strategy: RejectionStrategy) -> None:
+        """
+        Set queue size and rejection strategy for a topic.
+
+        Parameters
+        ----------
+        topic : str
+            The topic.
+        queue_size : int
+            Maximum number of pending events for the topic, 0 for an unbounded queue.
+        rejection_strategy : RejectionStrategy
+            Strategy to apply when the queue of the topic is full.
+        """
+        with self._topic_lock:
+            if topic in self._dispatchers:
+                raise ValueError("Topic " + topic + " is already in use")
+            self._topic_config[topic] = (queue_size, rejection_strategy)
+
+    def publish(self, topic, event):
+        self._get_dispatcher(topic).put(event)
+
+    def publish_batch(self, topic, events):
+        dispatcher = self._get_dispatcher(topic)
+        for event in events:
+            dispatcher.put(event)
+
+    def stop(self, wait: bool = True) -> None:
+        """
+        Stop delivery of events.
+
+        Events that are already queued are still delivered, events published after stopping are dropped.
+        Publishers blocked on a full queue are released and drop their events.
+
+        Parameters
+        ----------
+        wait : bool
+            Wait until all pending deliveries are finished.
+        """
+        with self._topic_lock:
+            for dispatcher in self._dispatchers.values():
+                dispatcher.close()
+        self._executor.shutdown(wait=wait)
+
+    def _deliver(self, topic: str, events: List[Event]) -> None:
+        handlers, batch_handlers, pattern_handlers = self._topic_handlers(topic)
+        if not (handlers or batch_handlers or pattern_handlers):
+            return
+
+        topic_events = [Event.with_topic(event, topic) for event in events]
+        for topic_event in topic_events:
+            for handler in handlers:
+                self._invoke(handler, topic, topic_event)
+        for handler in batch_handlers:
+            self._invoke(handler, topic, topic_events)
+        for handler, batch in pattern_handlers:
+            if batch:
+                self._invoke(handler, topic, topic_events)
+            else:
+                for topic_event in topic_events:
+                    self._invoke(handler, topic, topic_event)
+
+    def _invoke(self, handler, topic, arg):
+        try:
+            handler(arg)
+        except:
+            logger.exception("Failed to deliver %s on topic %s to %s",
+                             f"{len(arg)} events" if isinstance(arg, list) else f"event {arg.id}",
+                             topic, self._format_name(handler))
+
+    def _get_dispatcher(self, topic):
+        try:
+            return self._dispatchers[topic]
+        except KeyError:
+            with self._topic_lock:
+                if topic not in self._dispatchers:
+                    queue_size, strategy = self._topic_config.get(topic, (self._queue_size, self._strategy))
+                    self._dispatchers[topic] = TopicDispatcher(topic, self._executor, self._deliver,
+                                                                queue_size, strategy)
+
+                return self._dispatchers[topic]
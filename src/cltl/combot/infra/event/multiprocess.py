@@ -0,0 +1,611 @@
+import logging
+import multiprocessing
+import pickle
+import threading
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from threading import RLock, Thread
+from queue import Full
+from typing import Callable, Deque, Dict, Iterable, Any, FrozenSet, List, Optional, Tuple
+
+from cltl.combot.infra.event.api import EventBus, Event
+from cltl.combot.infra.event.dispatch import DEFAULT_QUEUE_SIZE, RejectionStrategy
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl.combot.infra.event.serialization import pickle_dumps, pickle_loads
+from cltl.combot.infra.event.shared_memory import SharedArrayStore, share_arrays
+from cltl.combot.infra.event.topics import TopicMatcher, is_pattern
+
+logger = logging.getLogger(__name__)
+
+
+_SUBSCRIBE = 0
+_UNSUBSCRIBE = 1
+_PUBLISH = 2
+_ACK = 3
+_READY = 4
+_STOP = 5
+
+_HOST_TIMEOUT = 60
+_DEFAULT_SHARED_MEMORY_THRESHOLD = 1024 * 1024
+
+
+class _ProcessEventBus(EventBus):
+    """
+    Base class for the EventBus of a single process in a :class:`MultiprocessEventBus`.
+
+    Events are delivered to handlers in the same process by a :class:`SynchronousEventBus`.
+    """
+    def __init__(self, shared_memory_size: Optional[int], shared_memory_threshold: int):
+        self._local = SynchronousEventBus()
+        self._subscription_lock = RLock()
+        self._subscription_counts: Dict[str, int] = {}
+        self._local_patterns: TopicMatcher[str] = TopicMatcher()
+        self._store = SharedArrayStore(shared_memory_size, shared_memory_threshold) if shared_memory_size else None
+
+    def publish(self, topic: str, event: Event) -> None:
+        self._local.publish(topic, event)
+        self._forward(topic, (event,))
+
+    def publish_batch(self, topic: str, events: Iterable[Event]) -> None:
+        events = list(events)
+        self._local.publish_batch(topic, events)
+        self._forward(topic, events)
+
+    def subscribe(self, topic: str, handler: Callable[[Event], None]) -> None:
+        with self._subscription_lock:
+            self._local.subscribe(topic, handler)
+            count = self._subscription_counts.get(topic, 0)
+            self._subscription_counts[topic] = count + 1
+            if not count:
+                self._compile_local_patterns(topic)
+                self._on_subscribe(topic)
+
+    def unsubscribe(self, topic: str, handler: Callable[[Event], None] = None) -> None:
+        with self._subscription_lock:
+            self._local.unsubscribe(topic, handler)
+            count = self._subscription_counts.get(topic, 0)
+            remaining = max(0, count - 1) if handler else 0
+            self._subscription_counts[topic] = remaining
+            if count and not remaining:
+                self._compile_local_patterns(topic)
+                self._on_unsubscribe(topic)
+
+    @property
+    def topics(self):
+        return self._local.topics
+
+    def _has_local_subscribers(self, topic: str) -> bool:
+        return bool(self._subscription_counts.get(topic)) or bool(self._local_patterns.match(topic))
+
+    def _compile_local_patterns(self, topic: str):
+        if is_pattern(topic):
+            self._local_patterns = TopicMatcher((pattern, pattern)
+                                                for pattern, count in self._subscription_counts.items()
+                                                if count and is_pattern(pattern))
+
+    def _encode(self, topic: str, event: Event) -> bytes:
+        if self._store:
+            with share_arrays(self._store):
+                body = pickle_dumps(event)
+        else:
+            body = pickle_dumps(event)
+
+        return pickle.dumps((_PUBLISH, topic, body), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _deliver(self, topic: str, body: bytes) -> None:
+        if self._has_local_subscribers(topic):
+            self._local.publish(topic, pickle_loads(body))
+
+    def _close_store(self):
+        if self._store:
+            self._store.close()
+            self._store = None
+
+    def _forward(self, topic: str, events: Iterable[Event]) -> None:
+        raise NotImplementedError()
+
+    def _on_subscribe(self, topic: str) -> None:
+        raise NotImplementedError()
+
+    def _on_unsubscribe(self, topic: str) -> None:
+        raise NotImplementedError()
+
+
+class _Peer:
+    """
+    Connection of the :class:`MultiprocessEventBus` to a worker process.
+
+    Messages to the worker process are queued and sent on a separate thread, such that sending to a
+    worker process that does not read its connection does not block the router. Control messages are
+    queued regardless of the queue size and are never overwritten.
+    """
+    def __init__(self, peer_id: int, connection: Connection, process: multiprocessing.process.BaseProcess,
+                 queue_size: int, rejection_strategy: RejectionStrategy, on_space: Callable[[], None]):
+        self.id = peer_id
+        self.connection = connection
+        self.process = process
+        self.ready = threading.Event()
+        self.failed = False
+
+        self._queue_size = queue_size
+        self._strategy = rejection_strategy
+        self._on_space = on_space
+        # Entries are (data, control)
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+        self._sender = Thread(target=self._send_queued, name=f"MultiprocessEventBus-sender-{peer_id}", daemon=True)
+        self._sender.start()
+
+    def send(self, data: bytes, block: bool = True, control: bool = False) -> bool:
+        """
+        Queue a message for the worker process.
+
+        Parameters
+        ----------
+        data : bytes
+            The message.
+        block : bool
+            Wait for space in the queue if it is full and the rejection strategy is BLOCK.
+        control : bool
+            Queue the message regardless of the queue size.
+
+        Returns
+        -------
+        bool
+            False if the queue is full and `block` is not set, True otherwise.
+
+        Raises
+        ------
+        Full
+            If the queue is full and the rejection strategy is EXCEPTION.
+        """
+        with self._lock:
+            while not control and not self._closed and self._queue_size and len(self._queue) >= self._queue_size:
+                if self._strategy == RejectionStrategy.BLOCK:
+                    if not block:
+                        return False
+                    self._not_full.wait()
+                elif self._strategy == RejectionStrategy.OVERWRITE:
+                    index = next((idx for idx, (_, is_control) in enumerate(self._queue) if not is_control), None)
+                    if index is None:
+                        break
+                    del self._queue[index]
+                    logger.debug("Overwrote event to worker process %s", self.process.name)
+                elif self._strategy == RejectionStrategy.DROP:
+                    logger.debug("Dropped event to worker process %s", self.process.name)
+                    return True
+                elif self._strategy == RejectionStrategy.EXCEPTION:
+                    raise Full("Queue for worker process " + str(self.process.name) + " is full")
+                else:
+                    raise ValueError("Unknown strategy: " + str(self._strategy))
+
+            if self._closed:
+                logger.debug("Dropped message to closed worker process %s", self.process.name)
+                return True
+
+            self._queue.append((data, control))
+            self._not_empty.notify()
+
+        return True
+
+    def close(self):
+        """
+        Drop messages queued from now on and release blocked publishers.
+
+        Messages that are already queued are still sent.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify()
+            self._not_full.notify_all()
+
+    def _send_queued(self):
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return
+                full = self._queue_size and len(self._queue) >= self._queue_size
+                data, _ = self._queue.popleft()
+                self._not_full.notify()
+
+            if full:
+                self._on_space()
+
+            try:
+                self.connection.send_bytes(data)
+            except OSError:
+                logger.info("Stopped sending to worker process %s", self.process.name)
+                with self._lock:
+                    self._closed = True
+                    self._queue.clear()
+                    self._not_full.notify_all()
+                return
+
+
+class MultiprocessEventBus(_ProcessEventBus):
+    """
+    EventBus that connects components hosted in separate worker processes on the same host.
+
+    Components in worker processes are created with :meth:`host`, which provides them with an EventBus
+    connected to this bus. This bus routes events between the processes over pipes, such that the same topic
+    semantics apply as for a :class:`SynchronousEventBus` in a single process, including subscriptions to topic
+    patterns. Events of a publisher are delivered in the order they were published.
+
+    Within a process, events are delivered synchronously on the thread of the publisher. Events from other
+    processes are delivered on a single thread per process, i.e. handlers should hand off long running work,
+    as for example :class:`TopicWorker` does. Subscribing in a worker process waits until the subscription is
+    registered in the main process, except for handlers invoked for events from other processes, which cannot
+    wait for it.
+
+    Events to a worker process are sent from a bounded queue per process. If the queue is full, the
+    `rejection_strategy` applies to publishers in this process. Events routed between worker processes never
+    block the router: with the BLOCK strategy, the router holds back further events of the publishing process
+    until the queue has space again, which in turn blocks the publishing process.
+
+    Events are serialized with pickle. If `shared_memory_size` is set, large numpy arrays are passed through
+    shared memory instead of the pipes, see :mod:`cltl.combot.infra.event.shared_memory`.
+    """
+    def __init__(self, shared_memory_size: int = None,
+                 shared_memory_threshold: int = _DEFAULT_SHARED_MEMORY_THRESHOLD,
+                 mp_context: str = "spawn",
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 rejection_strategy: RejectionStrategy = RejectionStrategy.BLOCK):
+        """
+        Parameters
+        ----------
+        shared_memory_size : int
+            Size in bytes of the shared memory segment used by each process, if not set arrays are
+            sent through the pipes.
+        shared_memory_threshold : int
+            Minimum size in bytes of arrays that are passed through shared memory.
+        mp_context : str
+            The multiprocessing start method used for worker processes, defaults to `spawn`, as forking
+            a process with running threads is unsafe.
+        queue_size : int
+            Maximum number of events queued per worker process, unbounded if set to zero.
+        rejection_strategy : RejectionStrategy
+            Strategy applied if the queue of a worker process is full.
+        """
+        super().__init__(shared_memory_size, shared_memory_threshold)
+        self._shared_memory_config = (shared_memory_size, shared_memory_threshold)
+        self._context = multiprocessing.get_context(mp_context)
+        self._queue_size = queue_size
+        self._rejection_strategy = rejection_strategy
+
+        self._peers: Dict[int, _Peer] = {}
+        # Immutable sets of peer ids per topic, replaced on subscription changes
+        self._subscriptions: Dict[str, FrozenSet[int]] = {}
+        self._pattern_subscriptions: TopicMatcher[FrozenSet[int]] = TopicMatcher()
+        self._peer_lock = RLock()
+        self._next_id = 1
+        # Events held back by the router per publishing peer id, as (peers with a full queue, data)
+        self._pending: Dict[int, Tuple[List[_Peer], bytes]] = {}
+
+        self._running = True
+        self._wakeup_reader, self._wakeup_writer = multiprocessing.Pipe(duplex=False)
+        self._wakeup_lock = threading.Lock()
+        self._router = Thread(target=self._route, name="MultiprocessEventBus-router", daemon=True)
+        self._router.start()
+
+    def host(self, factory: Callable[..., Iterable[Any]], *args, name: str = None,
+             timeout: float = _HOST_TIMEOUT) -> multiprocessing.process.BaseProcess:
+        """
+        Host components in a new worker process.
+
+        The `factory` is called in the worker process with an EventBus connected to this bus, followed by `args`.
+        It returns the components to run in the worker process, which are started with their `start` method.
+        If `start` returns an object with a `wait` method, as :meth:`TopicWorker.start` does, it is awaited.
+        On :meth:`stop` the components are stopped with their `stop` and, if available, `await_stop` methods.
+
+        Unless the `fork` start method is used, `factory` and `args` must be picklable.
+
+        Parameters
+        ----------
+        factory : Callable[..., Iterable[Any]]
+            Function that creates the components in the worker process.
+        args
+            Additional arguments passed to `factory`.
+        name : str
+            Name of the worker process.
+        timeout : float
+            Maximum time in seconds to wait until the components are started.
+
+        Returns
+        -------
+        BaseProcess
+            The worker process.
+
+        Raises
+        ------
+        RuntimeError
+            If the components fail to start within the timeout.
+        """
+        connection, worker_connection = self._context.Pipe()
+        process = self._context.Process(target=_host, name=name, daemon=True,
+                                        args=(worker_connection, factory, args, self._shared_memory_config))
+        with self._peer_lock:
+            peer = _Peer(self._next_id, connection, process,
+                         self._queue_size, self._rejection_strategy, self._on_peer_space)
+            self._next_id += 1
+            self._peers[peer.id] = peer
+
+        process.start()
+        worker_connection.close()
+        self._wakeup()
+
+        if not peer.ready.wait(timeout) or peer.failed:
+            self._remove_peer(peer)
+            process.terminate()
+            raise RuntimeError(f"Failed to start components in process {process.name}")
+
+        logger.info("Started worker process %s (%s)", process.name, process.pid)
+
+        return process
+
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Stop the components in all worker processes and wait for the processes to exit.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum time in seconds to wait for each worker process, before it is terminated.
+        """
+        with self._peer_lock:
+            peers = list(self._peers.values())
+
+        for peer in peers:
+            peer.send(pickle.dumps((_STOP, None, None)), control=True)
+            peer.close()
+        for peer in peers:
+            peer.process.join(timeout)
+            if peer.process.is_alive():
+                logger.warning("Terminate worker process %s", peer.process.name)
+                peer.process.terminate()
+            self._remove_peer(peer)
+
+        self._running = False
+        self._wakeup()
+        self._router.join()
+        self._close_store()
+
+    @property
+    def topics(self):
+        return tuple(set(super().topics) | {topic for topic in self._subscriptions if not is_pattern(topic)})
+
+    def _forward(self, topic: str, events: Iterable[Event]) -> None:
+        peer_ids = self._subscribers(topic)
+        if not peer_ids:
+            return
+
+        # Handlers in this process that publish on the router thread must not block it,
+        # their events are queued regardless of the queue size instead
+        on_router = threading.current_thread() is self._router
+        for event in events:
+            data = self._encode(topic, event)
+            for peer in self._send(peer_ids, data, block=not on_router):
+                peer.send(data, control=True)
+
+    def _subscribers(self, topic: str) -> FrozenSet[int]:
+        peer_ids = self._subscriptions.get(topic, frozenset())
+        for pattern_peer_ids in self._pattern_subscriptions.match(topic):
+            peer_ids = peer_ids | pattern_peer_ids
+
+        return peer_ids
+
+    def _compile_patterns(self):
+        self._pattern_subscriptions = TopicMatcher((pattern, peer_ids)
+                                                   for pattern, peer_ids in self._subscriptions.items()
+                                                   if peer_ids and is_pattern(pattern))
+
+    def _send(self, peer_ids: Iterable[int], data: bytes, origin: int = None, block: bool = True) -> List[_Peer]:
+        """
+        Queue the data for the given peers and return the peers with a full queue if `block` is not set.
+        """
+        full_peers = []
+        for peer_id in peer_ids:
+            peer = self._peers.get(peer_id)
+            if peer is None or peer_id == origin:
+                continue
+            try:
+                if not peer.send(data, block=block):
+                    full_peers.append(peer)
+            except Full:
+                if block:
+                    raise
+                logger.warning("Dropped event to worker process %s, the queue is full", peer.process.name)
+
+        return full_peers
+
+    def _on_subscribe(self, topic: str) -> None:
+        pass
+
+    def _on_unsubscribe(self, topic: str) -> None:
+        pass
+
+    def _wakeup(self):
+        with self._wakeup_lock:
+            self._wakeup_writer.send_bytes(b"")
+
+    def _on_peer_space(self):
+        if self._pending:
+            self._wakeup()
+
+    def _send_pending(self):
+        for origin, (peers, data) in list(self._pending.items()):
+            full_peers = [peer for peer in peers if not peer.send(data, block=False)]
+            if full_peers:
+                self._pending[origin] = (full_peers, data)
+            else:
+                del self._pending[origin]
+
+    def _route(self):
+        while self._running:
+            self._send_pending()
+            with self._peer_lock:
+                # Don't read from peers with held back events until these are queued
+                peers = {peer.connection: peer for peer in self._peers.values() if peer.id not in self._pending}
+
+            for connection in wait([self._wakeup_reader] + list(peers.keys())):
+                if connection is self._wakeup_reader:
+                    connection.recv_bytes()
+                    continue
+
+                peer = peers[connection]
+                try:
+                    data = connection.recv_bytes()
+                except (EOFError, OSError):
+                    logger.info("Worker process %s disconnected", peer.process.name)
+                    self._remove_peer(peer)
+                    continue
+
+                try:
+                    self._handle(peer, data)
+                except:
+                    logger.exception("Failed to handle message from worker process %s", peer.process.name)
+
+    def _handle(self, peer: _Peer, data: bytes):
+        kind, topic, body = pickle.loads(data)
+        if kind == _PUBLISH:
+            full_peers = self._send(self._subscribers(topic), data, origin=peer.id, block=False)
+            if full_peers:
+                self._pending[peer.id] = (full_peers, data)
+            self._deliver(topic, body)
+        elif kind == _SUBSCRIBE:
+            with self._peer_lock:
+                self._subscriptions[topic] = self._subscriptions.get(topic, frozenset()) | {peer.id}
+                self._compile_patterns()
+            peer.send(pickle.dumps((_ACK, topic, None)), control=True)
+        elif kind == _UNSUBSCRIBE:
+            with self._peer_lock:
+                self._subscriptions[topic] = self._subscriptions.get(topic, frozenset()) - {peer.id}
+                self._compile_patterns()
+            peer.send(pickle.dumps((_ACK, topic, None)), control=True)
+        elif kind == _READY:
+            peer.ready.set()
+        else:
+            raise ValueError("Unknown message type: " + str(kind))
+
+    def _remove_peer(self, peer: _Peer):
+        with self._peer_lock:
+            if self._peers.pop(peer.id, None) is None:
+                return
+            self._subscriptions = {topic: peer_ids - {peer.id} for topic, peer_ids in self._subscriptions.items()}
+            self._compile_patterns()
+
+        peer.close()
+        peer.connection.close()
+        if not peer.ready.is_set():
+            peer.failed = True
+            peer.ready.set()
+
+
+class _WorkerEventBus(_ProcessEventBus):
+    """
+    EventBus of a worker process, connected to the :class:`MultiprocessEventBus` in the main process.
+
+    Requests are acknowledged in the order they were sent. Acknowledgements are received on the receiver thread,
+    requests from that thread, i.e. from handlers of events from other processes, don't wait for them.
+    """
+    def __init__(self, connection: Connection, shared_memory_config: Tuple[Optional[int], int]):
+        super().__init__(*shared_memory_config)
+        self._connection = connection
+        self._send_lock = threading.Lock()
+        # Per pending request in the order they were sent, the event to set on acknowledgement, if awaited
+        self._acks: Deque[Optional[threading.Event]] = deque()
+        self._stopped = threading.Event()
+
+        self._receiver = Thread(target=self._receive, name="MultiprocessEventBus-receiver", daemon=True)
+        self._receiver.start()
+
+    def await_stop(self):
+        self._stopped.wait()
+
+    def close(self):
+        self._connection.close()
+        self._close_store()
+
+    def ready(self):
+        self._send(pickle.dumps((_READY, None, None)))
+
+    def _forward(self, topic: str, events: Iterable[Event]) -> None:
+        for event in events:
+            self._send(self._encode(topic, event))
+
+    def _on_subscribe(self, topic: str) -> None:
+        self._request(_SUBSCRIBE, topic)
+
+    def _on_unsubscribe(self, topic: str) -> None:
+        if not self._stopped.is_set():
+            self._request(_UNSUBSCRIBE, topic)
+
+    def _request(self, kind: int, topic: str):
+        ack = None if threading.current_thread() is self._receiver else threading.Event()
+        with self._send_lock:
+            self._acks.append(ack)
+            self._connection.send_bytes(pickle.dumps((kind, topic, None)))
+
+        if ack and not self._stopped.is_set():
+            ack.wait()
+
+    def _send(self, data: bytes):
+        with self._send_lock:
+            self._connection.send_bytes(data)
+
+    def _receive(self):
+        while not self._stopped.is_set():
+            try:
+                kind, topic, body = pickle.loads(self._connection.recv_bytes())
+            except (EOFError, OSError):
+                logger.info("Disconnected from main process")
+                break
+
+            try:
+                if kind == _PUBLISH:
+                    self._deliver(topic, body)
+                elif kind == _ACK:
+                    ack = self._acks.popleft()
+                    if ack:
+                        ack.set()
+                elif kind == _STOP:
+                    break
+                else:
+                    raise ValueError("Unknown message type: " + str(kind))
+            except:
+                logger.exception("Failed to handle message on topic %s", topic)
+
+        self._stopped.set()
+        # Release pending requests
+        while self._acks:
+            ack = self._acks.popleft()
+            if ack:
+                ack.set()
+
+
+def _host(connection: Connection, factory: Callable[..., Iterable[Any]], args: tuple,
+          shared_memory_config: Tuple[Optional[int], int]):
+    event_bus = _WorkerEventBus(connection, shared_memory_config)
+
+    components = list(factory(event_bus, *args) or ())
+    try:
+        for component in components:
+            started = component.start()
+            if hasattr(started, "wait"):
+                started.wait()
+        event_bus.ready()
+
+        event_bus.await_stop()
+    finally:
+        for component in components:
+            try:
+                component.stop()
+                if hasattr(component, "await_stop"):
+                    component.await_stop()
+            except:
+                logger.exception("Failed to stop %s", component)
+        event_bus.close()
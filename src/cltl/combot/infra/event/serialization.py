@@ -1,8 +1,51 @@
+"""
+Serialization of events.
+
+Serializers are provided through a registry by name, see :func:`get_serializer`. The following
+serializers are registered by default:
+
+* `json`: JSON text, numpy arrays are encoded as base64 strings.
+* `orjson`: JSON compatible with `json` using the faster `orjson` package, if installed.
+* `msgpack`: MessagePack with numpy arrays as raw binary data, if the `msgpack` package is installed.
+* `pickle`: Pickle protocol 5 with numpy arrays as out-of-band buffers. This serializer is not
+  trusted, as unpickling data from untrusted sources can execute arbitrary code.
+
+* `json-typed`, `msgpack-typed`: Variants of `json` and `msgpack` that tag dataclasses and enums
+  with their type and restore them on deserialization, see :func:`register_type_module`.
+
+The `json`, `orjson` and `msgpack` serializers encode objects by their attributes and decode them as
+:class:`SimpleNamespace`, numpy arrays are restored as arrays.
+
+The serializers place large numpy arrays in shared memory when used within
+:func:`cltl.combot.infra.event.shared_memory.share_arrays`.
+"""
 import base64
+import dataclasses
+import importlib
+import io
+import json
+import pickle
+import struct
+from dataclasses import dataclass
+from enum import Enum
 from json import JSONEncoder
+from types import SimpleNamespace
+from typing import Callable, Any, Union, Dict, Iterable, Type
 
 import numpy as np
 
+from cltl.combot.infra.event import shared_memory
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class NumpyJSONEncoder(JSONEncoder):
     def __init__(self, *, delegate: JSONEncoder = None, **kwargs):
@@ -11,17 +54,14 @@ class NumpyJSONEncoder(JSONEncoder):
 
     def default(self, obj):
         if isinstance(obj, np.ndarray):
-            return {
-                "__type": "np.ndarray",
-                "data": base64.b64encode(obj.tobytes()).decode('ascii'),
-                "shape": obj.shape,
-                "dtype": str(obj.dtype)
-            }
+            return _ndarray_to_base64(obj)
 
         return self._delegate.default(obj) if self._delegate else super().default(obj)
 
 
 def numpy_object_hook(obj):
+    if isinstance(obj, dict) and obj.get("__type") == shared_memory.SHARED_ARRAY_TYPE:
+        return shared_memory.resolve(obj)
     if not isinstance(obj, dict) or "__type" not in obj or obj["__type"] != "np.ndarray":
         return obj
 
@@ -30,3 +70,431 @@ def numpy_object_hook(obj):
     dtype = obj["dtype"]
 
     return np.frombuffer(base64.b64decode(data_string), dtype=dtype).reshape(shape)
+
+
+def _ndarray_to_base64(obj):
+    handle = shared_memory.offload(obj)
+    if handle is not None:
+        return handle
+
+    return {
+        "__type": "np.ndarray",
+        "data": base64.b64encode(obj.tobytes()).decode('ascii'),
+        "shape": obj.shape,
+        "dtype": str(obj.dtype)
+    }
+
+
+def object_vars(obj):
+    """
+    Like :func:`vars`, but also supports objects that define `__slots__`, e.g. :class:`Event`.
+
+    Can be used as `default` function for :func:`json.dumps`.
+    """
+    try:
+        return vars(obj)
+    except TypeError:
+        slots = [slot for cls in type(obj).__mro__ for slot in getattr(cls, "__slots__", ())]
+        if not slots:
+            raise
+
+        return {slot: getattr(obj, slot) for slot in slots if hasattr(obj, slot)}
+
+
+def _object_default(obj):
+    if isinstance(obj, Enum):
+        # Consistent with orjson, which serializes enums natively
+        return obj.value
+
+    return object_vars(obj)
+
+
+def _namespace(obj: dict):
+    if all(isinstance(key, str) for key in obj):
+        return SimpleNamespace(**obj)
+
+    return obj
+
+
+@dataclass(frozen=True)
+class Serializer:
+    """
+    Serializer for events.
+
+    Attributes
+    ----------
+    name : str
+        Name of the serializer in the registry.
+    dumps : Callable[[Any], Union[bytes, str]]
+        Function to serialize an object.
+    loads : Callable[[Union[bytes, str]], Any]
+        Function to deserialize data created by `dumps`.
+    content_type : str
+        MIME type of the serialized data.
+    content_encoding : str
+        Character encoding of the serialized data, `binary` if `dumps` returns bytes that
+        are not text.
+    trusted : bool
+        False if deserializing data from untrusted sources is not safe.
+    """
+    name: str
+    dumps: Callable[[Any], Union[bytes, str]]
+    loads: Callable[[Union[bytes, str]], Any]
+    content_type: str
+    content_encoding: str
+    trusted: bool = True
+
+    @property
+    def binary(self) -> bool:
+        return self.content_encoding == "binary"
+
+
+_SERIALIZERS: Dict[str, Serializer] = {}
+
+
+def register_serializer(serializer: Serializer) -> None:
+    """
+    Register a serializer, replacing a previously registered serializer with the same name.
+    """
+    _SERIALIZERS[serializer.name] = serializer
+
+
+def get_serializer(name: str) -> Serializer:
+    """
+    Get a registered serializer.
+
+    Parameters
+    ----------
+    name : str
+        The name of the serializer.
+
+    Returns
+    -------
+    Serializer
+        The serializer.
+
+    Raises
+    ------
+    ValueError
+        If no serializer with the name is registered.
+    """
+    try:
+        return _SERIALIZERS[name]
+    except KeyError:
+        raise ValueError("Serializer " + name + " is not available, registered: " + ", ".join(_SERIALIZERS))
+
+
+def serializers() -> Iterable[Serializer]:
+    """
+    Returns
+    -------
+    Iterable[Serializer]
+        All registered serializers.
+    """
+    return tuple(_SERIALIZERS.values())
+
+
+_ARRAY_TYPES = ("np.ndarray", shared_memory.SHARED_ARRAY_TYPE)
+
+
+def _json_default(obj):
+    if isinstance(obj, np.ndarray):
+        return _ndarray_to_base64(obj)
+
+    return _object_default(obj)
+
+
+def _json_object_hook(obj):
+    if obj.get("__type") in _ARRAY_TYPES:
+        return numpy_object_hook(obj)
+
+    return _namespace(obj)
+
+
+def json_dumps(obj) -> str:
+    """
+    Serialize an object to JSON.
+    """
+    return json.dumps(obj, default=_json_default)
+
+
+def json_loads(data: Union[bytes, str]):
+    """
+    Deserialize data created by :func:`json_dumps` or :func:`orjson_dumps`.
+    """
+    return json.loads(data, object_hook=_json_object_hook)
+
+
+def _to_namespace(obj):
+    if isinstance(obj, dict):
+        obj = {key: _to_namespace(value) for key, value in obj.items()}
+        return _json_object_hook(obj)
+    if isinstance(obj, list):
+        return [_to_namespace(value) for value in obj]
+
+    return obj
+
+
+def orjson_dumps(obj) -> bytes:
+    """
+    Serialize an object to JSON using the optional `orjson` package.
+    """
+    if orjson is None:
+        raise ImportError("orjson is not installed")
+
+    return orjson.dumps(obj, default=_json_default)
+
+
+def orjson_loads(data: Union[bytes, str]):
+    """
+    Deserialize data created by :func:`json_dumps` or :func:`orjson_dumps` using the optional `orjson` package.
+    """
+    if orjson is None:
+        raise ImportError("orjson is not installed")
+
+    return _to_namespace(orjson.loads(data))
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, np.ndarray):
+        handle = shared_memory.offload(obj)
+        if handle is not None:
+            return handle
+
+        data = np.ascontiguousarray(obj)
+        return {
+            "__type": "np.ndarray",
+            "data": memoryview(data).cast("B"),
+            "shape": data.shape,
+            "dtype": data.dtype.str
+        }
+
+    return _object_default(obj)
+
+
+def _msgpack_object_hook(obj):
+    if obj.get("__type") == shared_memory.SHARED_ARRAY_TYPE:
+        return shared_memory.resolve(obj)
+    if obj.get("__type") == "np.ndarray":
+        # The array is a read-only view on the message buffer
+        return np.frombuffer(obj["data"], dtype=obj["dtype"]).reshape(obj["shape"])
+
+    return _namespace(obj)
+
+
+def msgpack_dumps(obj) -> bytes:
+    """
+    Serialize an object to `MessagePack <https://msgpack.org>`_.
+
+    Objects are serialized by their attributes, numpy arrays are carried as raw binary
+    data with their dtype and shape.
+
+    Requires the optional `msgpack` package.
+    """
+    if msgpack is None:
+        raise ImportError("msgpack is not installed")
+
+    return msgpack.packb(obj, default=_msgpack_default, use_bin_type=True)
+
+
+def msgpack_loads(data: bytes):
+    """
+    Deserialize data created by :func:`msgpack_dumps`.
+
+    Objects are deserialized as :class:`SimpleNamespace`, numpy arrays are restored without
+    copying their data.
+
+    Requires the optional `msgpack` package.
+    """
+    if msgpack is None:
+        raise ImportError("msgpack is not installed")
+
+    return msgpack.unpackb(data, object_hook=_msgpack_object_hook, raw=False, strict_map_key=False)
+
+
+_TYPED_MODULES = ["cltl.", "cltl_service.", "emissor."]
+_TYPES: Dict[str, Type] = {}
+
+
+def register_type_module(prefix: str) -> None:
+    """
+    Allow typed serializers to restore dataclasses and enums from modules with the given prefix.
+
+    By default types from the `cltl`, `cltl_service` and `emissor` packages are restored, types from
+    other modules are rejected on deserialization.
+
+    Parameters
+    ----------
+    prefix : str
+        Prefix of the module names, e.g. `mypackage.`.
+    """
+    _TYPED_MODULES.append(prefix)
+
+
+def _type_name(cls) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _resolve_type(name: str) -> Type:
+    try:
+        return _TYPES[name]
+    except KeyError:
+        pass
+
+    module_name, _, qualname = name.partition(":")
+    if not any(module_name.startswith(prefix) for prefix in _TYPED_MODULES):
+        raise ValueError("Type " + name + " is not allowed for deserialization")
+
+    cls = importlib.import_module(module_name)
+    for attribute in qualname.split("."):
+        cls = getattr(cls, attribute)
+    if not isinstance(cls, type) or not (dataclasses.is_dataclass(cls) or issubclass(cls, Enum)):
+        raise ValueError("Type " + name + " is neither a dataclass nor an enum")
+
+    _TYPES[name] = cls
+
+    return cls
+
+
+def _typed_default(obj):
+    if isinstance(obj, Enum):
+        return {"__type": _type_name(type(obj)), "value": obj.value}
+    if dataclasses.is_dataclass(obj):
+        typed = {"__type": _type_name(type(obj))}
+        typed.update((field.name, getattr(obj, field.name)) for field in dataclasses.fields(obj))
+
+        return typed
+
+    return object_vars(obj)
+
+
+def _typed_object_hook(obj):
+    type_name = obj.get("__type")
+    if type_name is None:
+        return obj
+    if type_name == shared_memory.SHARED_ARRAY_TYPE:
+        return shared_memory.resolve(obj)
+    if type_name == "np.ndarray":
+        return numpy_object_hook(obj) if isinstance(obj["data"], str) else _msgpack_object_hook(obj)
+
+    cls = _resolve_type(type_name)
+    if issubclass(cls, Enum):
+        return cls(obj["value"])
+
+    del obj["__type"]
+
+    return cls(**obj)
+
+
+def typed_json_dumps(obj) -> str:
+    """
+    Serialize an object to JSON, tagging dataclasses and enums with their type.
+    """
+    return json.dumps(obj, default=lambda o: _ndarray_to_base64(o) if isinstance(o, np.ndarray) else _typed_default(o))
+
+
+def typed_json_loads(data: Union[bytes, str]):
+    """
+    Deserialize data created by :func:`typed_json_dumps`.
+
+    Dataclasses and enums are restored to their types, other objects are deserialized as dict.
+    """
+    return json.loads(data, object_hook=_typed_object_hook)
+
+
+def typed_msgpack_dumps(obj) -> bytes:
+    """
+    Serialize an object to MessagePack, tagging dataclasses and enums with their type.
+
+    Requires the optional `msgpack` package.
+    """
+    if msgpack is None:
+        raise ImportError("msgpack is not installed")
+
+    return msgpack.packb(obj, default=lambda o: _msgpack_default(o) if isinstance(o, np.ndarray) else _typed_default(o),
+                         use_bin_type=True)
+
+
+def typed_msgpack_loads(data: bytes):
+    """
+    Deserialize data created by :func:`typed_msgpack_dumps`.
+
+    Dataclasses and enums are restored to their types, other objects are deserialized as dict.
+    Numpy arrays are restored without copying their data.
+
+    Requires the optional `msgpack` package.
+    """
+    if msgpack is None:
+        raise ImportError("msgpack is not installed")
+
+    return msgpack.unpackb(data, object_hook=_typed_object_hook, raw=False, strict_map_key=False)
+
+
+_PICKLE_HEADER = struct.Struct("!I")
+
+
+class _SharedArrayPickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        if isinstance(obj, np.ndarray):
+            handle = shared_memory.offload(obj)
+            if handle is not None:
+                return shared_memory.resolve, (handle,)
+
+        return NotImplemented
+
+
+def pickle_dumps(obj) -> bytes:
+    """
+    Serialize an object with pickle protocol 5, numpy arrays are appended as out-of-band buffers.
+
+    The result consists of the number of buffers, the length of the pickle data and each buffer,
+    followed by the pickle data and the buffers.
+    """
+    buffers = []
+    if shared_memory.sharing():
+        stream = io.BytesIO()
+        _SharedArrayPickler(stream, protocol=5, buffer_callback=buffers.append).dump(obj)
+        data = stream.getvalue()
+    else:
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raw_buffers = [buffer.raw() for buffer in buffers]
+
+    header = [len(raw_buffers), len(data)] + [buffer.nbytes for buffer in raw_buffers]
+
+    return b"".join([b"".join(_PICKLE_HEADER.pack(value) for value in header), data] + raw_buffers)
+
+
+def pickle_loads(data: bytes):
+    """
+    Deserialize data created by :func:`pickle_dumps`, numpy arrays are restored without copying their data.
+
+    Never use this function for data from untrusted sources.
+    """
+    view = memoryview(data)
+    size = _PICKLE_HEADER.size
+
+    buffer_count = _PICKLE_HEADER.unpack_from(view, 0)[0]
+    lengths = [_PICKLE_HEADER.unpack_from(view, size * (i + 1))[0] for i in range(buffer_count + 1)]
+
+    offset = size * (buffer_count + 2)
+    chunks = []
+    for length in lengths:
+        chunks.append(view[offset:offset + length])
+        offset += length
+
+    return pickle.loads(chunks[0], buffers=chunks[1:])
+
+
+register_serializer(Serializer("json", json_dumps, json_loads, "application/json", "utf-8"))
+if orjson is not None:
+    register_serializer(Serializer("orjson", orjson_dumps, orjson_loads, "application/json", "utf-8"))
+if msgpack is not None:
+    register_serializer(Serializer("msgpack", msgpack_dumps, msgpack_loads, "application/x-cltl-msgpack", "binary"))
+register_serializer(Serializer("json-typed", typed_json_dumps, typed_json_loads,
+                               "application/x-cltl-typed+json", "utf-8"))
+if msgpack is not None:
+    register_serializer(Serializer("msgpack-typed", typed_msgpack_dumps, typed_msgpack_loads,
+                                   "application/x-cltl-typed+msgpack", "binary"))
+if pickle.HIGHEST_PROTOCOL >= 5:
+    register_serializer(Serializer("pickle", pickle_dumps, pickle_loads, "application/x-cltl-pickle", "binary",
+                                   trusted=False))
@@ -0,0 +1,284 @@
+"""
+Sharing of large numpy arrays in events between processes on the same host.
+
+Within :func:`share_arrays`, the serializers from :mod:`cltl.combot.infra.event.serialization` place
+numpy arrays above the threshold of a :class:`SharedArrayStore` in shared memory and only serialize a
+small handle. On deserialization, the array is copied from shared memory by any process on the same host.
+
+The store is a ring buffer, arrays are overwritten by newer arrays once they are older than the retention
+time of the store. Reading an array that was already overwritten raises a :class:`SharedArrayExpiredError`.
+
+Shared memory requires Python 3.8 or later. On earlier versions a :class:`SharedArrayStore` cannot be
+created and arrays are always serialized with the event.
+"""
+import logging
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    # Python < 3.8
+    SharedMemory = None
+
+logger = logging.getLogger(__name__)
+
+
+SHARED_ARRAY_TYPE = "np.shared"
+
+_HEADER = struct.Struct("!Q")
+_ALIGNMENT = 64
+
+_STORE: ContextVar[Optional["SharedArrayStore"]] = ContextVar("cltl_shared_array_store", default=None)
+
+
+class SharedArrayExpiredError(Exception):
+    """
+    Raised when an array was already overwritten in shared memory.
+    """
+    pass
+
+
+class SharedArrayStore:
+    """
+    Ring buffer for numpy arrays in a shared memory segment.
+
+    Each array is preceded by a header with a generation number, that is also part of the handle of the array.
+    Readers validate the generation before and after copying the array, such that arrays that are overwritten
+    while being read are detected.
+    """
+
+    def __init__(self, size: int = 64 * 1024 * 1024, threshold: int = 1024 * 1024, retention: float = 1.0,
+                 name: str = None):
+        """
+        Parameters
+        ----------
+        size : int
+            Size of the shared memory segment in bytes.
+        threshold : int
+            Minimum size in bytes of arrays placed in shared memory.
+        retention : float
+            Minimum time in seconds an array is kept before it can be overwritten. If the ring buffer has no space
+            for an array without overwriting more recent arrays, the array is not placed in shared memory.
+        name : str
+            Name of the shared memory segment, a unique name is generated if not provided.
+
+        Raises
+        ------
+        RuntimeError
+            If shared memory is not available.
+        """
+        if SharedMemory is None:
+            raise RuntimeError("Shared memory requires Python 3.8 or later")
+
+        self._shm = SharedMemory(name=name, create=True, size=size)
+        self._size = size
+        self.threshold = threshold
+        self._retention = retention
+
+        self._lock = threading.Lock()
+        self._head = 0
+        self._generation = 0
+        # (start, end, timestamp) of arrays in the buffer, oldest first
+        self._allocations = deque()
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def put(self, array: np.ndarray) -> Optional[dict]:
+        """
+        Place an array in shared memory.
+
+        Parameters
+        ----------
+        array : np.ndarray
+            The array.
+
+        Returns
+        -------
+        Optional[dict]
+            The handle of the array, or None if the array cannot be shared or there is no space available.
+        """
+        if array.dtype.hasobject:
+            return None
+
+        data = np.ascontiguousarray(array)
+        total = _ALIGNMENT + -(-data.nbytes // _ALIGNMENT) * _ALIGNMENT
+        if total > self._size:
+            return None
+
+        with self._lock:
+            start = self._head if self._head + total <= self._size else 0
+            end = start + total
+            if not self._release(start, end):
+                return None
+
+            self._generation += 1
+            generation = self._generation
+
+            self._shm.buf[start + _ALIGNMENT:start + _ALIGNMENT + data.nbytes] = memoryview(data).cast("B")
+            _HEADER.pack_into(self._shm.buf, start, generation)
+
+            self._allocations.append((start, end, time.monotonic()))
+            self._head = end
+
+        return {
+            "__type": SHARED_ARRAY_TYPE,
+            "name": self.name,
+            "offset": start,
+            "generation": generation,
+            "shape": list(data.shape),
+            "dtype": data.dtype.str,
+        }
+
+    def _release(self, start: int, end: int) -> bool:
+        wrapped = start < self._head
+
+        count = 0
+        for alloc_start, _, timestamp in self._allocations:
+            # Arrays skipped at the end of the buffer when wrapping around are released as well
+            if not (start <= alloc_start < end or (wrapped and alloc_start >= self._head)):
+                break
+            if time.monotonic() - timestamp < self._retention:
+                logger.debug("No space in shared memory %s within retention time", self.name)
+                return False
+            count += 1
+
+        for _ in range(count):
+            alloc_start, _, _ = self._allocations.popleft()
+            # Invalidate the array before it is overwritten
+            _HEADER.pack_into(self._shm.buf, alloc_start, 0)
+
+        return True
+
+    def close(self):
+        """
+        Close and remove the shared memory segment.
+        """
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_ATTACHED: Dict[str, "SharedMemory"] = {}
+_ATTACH_LOCK = threading.Lock()
+
+
+def _attach(name: str) -> "SharedMemory":
+    try:
+        return _ATTACHED[name]
+    except KeyError:
+        with _ATTACH_LOCK:
+            if name not in _ATTACHED:
+                _ATTACHED[name] = _attach_untracked(name)
+
+            return _ATTACHED[name]
+
+
+def _attach_untracked(name: str) -> "SharedMemory":
+    # The segment is owned by the SharedArrayStore, the resource tracker must not remove it when this
+    # process exits. Unregistering after attaching would also drop the registration of the owner, if
+    # it shares the resource tracker with this process.
+    if SharedMemory is None:
+        raise RuntimeError("Shared memory requires Python 3.8 or later")
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+    try:
+        return SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+@contextmanager
+def share_arrays(store: SharedArrayStore):
+    """
+    Place numpy arrays above the threshold of the store in shared memory when serializing within the context.
+    """
+    token = _STORE.set(store)
+    try:
+        yield store
+    finally:
+        _STORE.reset(token)
+
+
+def sharing() -> bool:
+    """
+    Returns
+    -------
+    bool
+        True if called within a :func:`share_arrays` context.
+    """
+    return _STORE.get() is not None
+
+
+def offload(array: np.ndarray) -> Optional[dict]:
+    """
+    Place the array in the store of the current :func:`share_arrays` context.
+
+    Returns
+    -------
+    Optional[dict]
+        The handle of the array, or None if it is not placed in shared memory.
+    """
+    store = _STORE.get()
+    if store is None or array.nbytes < store.threshold:
+        return None
+
+    return store.put(array)
+
+
+def resolve(handle: dict) -> np.ndarray:
+    """
+    Copy an array from shared memory.
+
+    Parameters
+    ----------
+    handle : dict
+        The handle of the array as returned by :meth:`SharedArrayStore.put`.
+
+    Returns
+    -------
+    np.ndarray
+        A copy of the array.
+
+    Raises
+    ------
+    SharedArrayExpiredError
+        If the array was already overwritten.
+    RuntimeError
+        If shared memory is not available.
+    """
+    shm = _attach(handle["name"])
+    offset = handle["offset"]
+    generation = handle["generation"]
+    dtype = np.dtype(handle["dtype"])
+    shape = tuple(handle["shape"])
+
+    if _HEADER.unpack_from(shm.buf, offset)[0] != generation:
+        raise SharedArrayExpiredError(f"Array {generation} in {handle['name']} expired")
+
+    count = int(np.prod(shape, dtype=np.int64))
+    array = np.frombuffer(shm.buf, dtype=dtype, count=count, offset=offset + _ALIGNMENT).reshape(shape).copy()
+
+    if _HEADER.unpack_from(shm.buf, offset)[0] != generation:
+        raise SharedArrayExpiredError(f"Array {generation} in {handle['name']} expired")
+
+    return array
@@ -0,0 +1,115 @@
+"""
+Topic patterns for subscriptions to multiple topics.
+
+Topics are split into words at dots. In a pattern, the word `*` matches exactly one word and the word `#`
+matches zero or more words, corresponding to the binding keys of AMQP topic exchanges. For example
+`cltl.topic.*` matches `cltl.topic.text` but not `cltl.topic.text.in`, while `cltl.#` matches both, and
+`#` matches all topics.
+"""
+from typing import Dict, Tuple, Iterable, TypeVar, Generic, List
+
+SEPARATOR = "."
+WILDCARD_ONE = "*"
+WILDCARD_MANY = "#"
+
+_MAX_CACHE_SIZE = 4096
+
+V = TypeVar("V")
+
+
+def is_pattern(topic: str) -> bool:
+    """
+    Returns
+    -------
+    bool
+        True if the topic contains a wildcard word.
+    """
+    return any(word == WILDCARD_ONE or word == WILDCARD_MANY for word in topic.split(SEPARATOR))
+
+
+class _Node:
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # (index of the pattern, value)
+        self.values: List[Tuple[int, object]] = []
+
+
+class TopicMatcher(Generic[V]):
+    """
+    Immutable trie of topic patterns with associated values.
+
+    Matching a topic walks the trie once per word and caches the result per topic, such that repeated
+    matches of the same topic are a single dictionary lookup. To change the patterns, create a new matcher.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, V]] = ()):
+        """
+        Parameters
+        ----------
+        patterns : Iterable[Tuple[str, V]]
+            Pairs of pattern and value, the same pattern may occur multiple times.
+        """
+        self._root = _Node()
+        self._size = 0
+        for pattern, value in patterns:
+            node = self._root
+            for word in pattern.split(SEPARATOR):
+                node = node.children.setdefault(word, _Node())
+            node.values.append((self._size, value))
+            self._size += 1
+
+        self._cache: Dict[str, Tuple[V, ...]] = {}
+
+    def match(self, topic: str) -> Tuple[V, ...]:
+        """
+        Parameters
+        ----------
+        topic : str
+            The topic.
+
+        Returns
+        -------
+        Tuple[V, ...]
+            The values of all patterns matching the topic, in the order the patterns were provided.
+        """
+        if not self._size:
+            return ()
+
+        try:
+            return self._cache[topic]
+        except KeyError:
+            pass
+
+        matches = {}
+        self._collect(self._root, topic.split(SEPARATOR), 0, matches)
+        result = tuple(matches[idx] for idx in sorted(matches))
+
+        if len(self._cache) >= _MAX_CACHE_SIZE:
+            self._cache = {}
+        self._cache[topic] = result
+
+        return result
+
+    def _collect(self, node: _Node, words: List[str], pos: int, matches: dict):
+        many = node.children.get(WILDCARD_MANY)
+        if many is not None:
+            # '#' consumes any number of the remaining words
+            for skip in range(pos, len(words) + 1):
+                self._collect(many, words, skip, matches)
+
+        if pos == len(words):
+            matches.update(node.values)
+            return
+
+        child = node.children.get(words[pos])
+        if child is not None:
+            self._collect(child, words, pos + 1, matches)
+
+        child = node.children.get(WILDCARD_ONE)
+        if child is not None:
+            self._collect(child, words, pos + 1, matches)
+
+    def __len__(self):
+        return self._size
@@ -2,16 +2,39 @@ import json
 import logging
 import os
 import queue
+import struct
 from datetime import datetime
 from multiprocessing import Process, Queue
+from typing import Union, Callable, Any
+
+from cltl.combot.infra.event.serialization import get_serializer, Serializer
 
 logger = logging.getLogger(__name__)
 
 
+_FRAME_HEADER = struct.Struct("!I")
+
+
 class LogWriter:
-    def __init__(self, log_dir: str, serializer):
+    """
+    Write events to a log file in a separate process.
+    """
+    def __init__(self, log_dir: str, serializer: Union[str, Callable[[Any], Any]] = "json"):
+        """
+        Parameters
+        ----------
+        log_dir : str
+            Directory of the log files.
+        serializer : Union[str, Callable[[Any], Any]]
+            Name of a serializer from the :mod:`cltl.combot.infra.event.serialization` registry,
+            or a function used as `default` function of :func:`json.dumps`. JSON serializers write
+            the events as JSON list, binary serializers write each event prefixed by its length.
+        """
         self._log_dir = log_dir
         self._serializer = serializer
+        if not callable(serializer):
+            # Fail early for unknown serializers
+            get_serializer(serializer)
 
         self._queue = Queue(maxsize=1024)
         self._writer_process = None
@@ -35,27 +58,59 @@ class LogWriter:
             logger.exception("Event log overloaded: dropped event %s", event)
 
     def _process(self):
-        log_file_path = self._get_event_log_path()
+        if callable(self._serializer):
+            self._write_json(lambda event: json.dumps(event, default=self._serializer, indent=2))
+        else:
+            serializer = get_serializer(self._serializer)
+            if serializer.binary:
+                self._write_binary(serializer)
+            else:
+                self._write_json(lambda event: _as_text(serializer.dumps(event), serializer))
+
+    def _write_json(self, dumps):
+        log_file_path = self._get_event_log_path("json")
         with open(log_file_path, 'w') as log_file:
             logger.info("Writing event log at %s", log_file_path)
 
             log_file. write("[\n")
 
-            event = ""
-            while event is not None:
-                try:
-                    event = self._queue.get(block=True)
-                except KeyboardInterrupt:
-                    break
-                log_file.write(json.dumps(event, default=self._serializer, indent=2) + ',\n')
+            for event in self._events():
+                log_file.write(dumps(event) + ',\n')
 
             log_file.write("]\n")
 
         logger.info("Closed event log at %s", log_file_path)
 
-    def _get_event_log_path(self):
+    def _write_binary(self, serializer: Serializer):
+        log_file_path = self._get_event_log_path(serializer.name)
+        with open(log_file_path, 'wb') as log_file:
+            logger.info("Writing event log at %s", log_file_path)
+
+            for event in self._events():
+                data = serializer.dumps(event)
+                log_file.write(_FRAME_HEADER.pack(len(data)))
+                log_file.write(data)
+
+        logger.info("Closed event log at %s", log_file_path)
+
+    def _events(self):
+        while True:
+            try:
+                event = self._queue.get(block=True)
+            except KeyboardInterrupt:
+                break
+            if event is None:
+                break
+
+            yield event
+
+    def _get_event_log_path(self, extension: str):
         date_now = datetime.now()
 
         os.makedirs(self._log_dir, exist_ok=True)
 
-        return f"{self._log_dir}/{date_now :%y_%m_%d-%H_%M_%S}.json"
+        return f"{self._log_dir}/{date_now :%y_%m_%d-%H_%M_%S}.{extension}"
+
+
+def _as_text(data: Union[bytes, str], serializer: Serializer) -> str:
+    return data.decode(serializer.content_encoding) if isinstance(data, bytes) else data
@@ -0,0 +1,439 @@
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Iterable, Optional, Tuple, NamedTuple, Union, Callable, List, Any
+
+import math
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyRecorder:
+    """
+    Record latency samples and compute percentiles over the most recent samples.
+
+    Recording a sample is cheap and thread-safe, percentiles are computed on demand.
+    """
+
+    def __init__(self, size: int = 4096):
+        """
+        Parameters
+        ----------
+        size : int
+            The number of most recent samples used to compute percentiles.
+        """
+        self._samples = deque(maxlen=size)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        """
+        Record a latency sample.
+
+        Parameters
+        ----------
+        value : float
+            The latency, by convention in milliseconds.
+        """
+        with self._lock:
+            self._samples.append(value)
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        """
+        Returns
+        -------
+        int
+            The total number of recorded samples.
+        """
+        return self._count
+
+    def percentiles(self, percentiles: Iterable[float] = (50, 90, 99)) -> Dict[float, float]:
+        """
+        Compute percentiles over the most recent samples using the nearest-rank method.
+
+        Parameters
+        ----------
+        percentiles : Iterable[float]
+            The percentiles to compute, in the range (0, 100].
+
+        Returns
+        -------
+        Dict[float, float]
+            The value for each of the requested percentiles, empty if no samples were recorded.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+
+        if not samples:
+            return {}
+
+        return {p: samples[max(0, math.ceil(p / 100 * len(samples)) - 1)] for p in percentiles}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._count = 0
+
+
+@dataclass(frozen=True)
+class CompressionStats:
+    """
+    Totals of the messages recorded by a :class:`CompressionRecorder` for a single key.
+    """
+    messages: int = 0
+    compressed: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    cpu_ms: float = 0.0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+class CompressionRecorder:
+    """
+    Record message sizes before and after compression and the time spent compressing, per key.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, CompressionStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, size: int, compressed_size: Optional[int] = None, duration: float = 0.0) -> None:
+        """
+        Record a message.
+
+        Parameters
+        ----------
+        key : str
+            The key to aggregate the message under, e.g. the topic.
+        size : int
+            The size of the message in bytes before compression.
+        compressed_size : Optional[int]
+            The size of the message in bytes after compression, None if it was not compressed.
+        duration : float
+            The time spent on compression in milliseconds.
+        """
+        compressed = compressed_size is not None
+        with self._lock:
+            stats = self._stats.get(key, _EMPTY_COMPRESSION_STATS)
+            self._stats[key] = CompressionStats(stats.messages + 1,
+                                                stats.compressed + compressed,
+                                                stats.bytes_in + size,
+                                                stats.bytes_out + (compressed_size if compressed else size),
+                                                stats.cpu_ms + duration)
+
+    def stats(self) -> Dict[str, CompressionStats]:
+        """
+        Returns
+        -------
+        Dict[str, CompressionStats]
+            The recorded totals per key.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+_EMPTY_COMPRESSION_STATS = CompressionStats()
+
+
+DEFAULT_BUCKETS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Counter:
+    """
+    Monotonically increasing count, e.g. of processed events.
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+@dataclass(frozen=True)
+class HistogramSnapshot:
+    """
+    Counts of the observations of a :class:`Histogram` per bucket, not cumulative.
+
+    The last count is for observations above the largest bucket bound.
+    """
+    bounds: Tuple[float, ...]
+    counts: Tuple[int, ...]
+    sum: float
+    count: int
+
+
+class Histogram:
+    """
+    Distribution of observed values over fixed buckets, by convention of latencies in milliseconds.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """
+        Parameters
+        ----------
+        buckets : Iterable[float]
+            The upper bounds of the buckets.
+        """
+        self._bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> HistogramSnapshot:
+        with self._lock:
+            return HistogramSnapshot(self._bounds, tuple(self._counts), self._sum, self._count)
+
+
+class Metric(NamedTuple):
+    """
+    Value of a metric at the time of collection.
+    """
+    name: str
+    type: str
+    description: str
+    labels: Dict[str, str]
+    value: Union[float, HistogramSnapshot]
+
+
+class MetricsSink:
+    """
+    Factory for the metrics of a component.
+
+    Components create their metrics once and update them directly, such that recording is independent
+    of the sink. Values that are readily available, e.g. the size of a queue, are registered as gauges
+    that are only evaluated when the metrics are collected.
+    """
+
+    def counter(self, name: str, description: str, labels: Dict[str, str] = None) -> Counter:
+        raise NotImplementedError()
+
+    def histogram(self, name: str, description: str, labels: Dict[str, str] = None,
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        raise NotImplementedError()
+
+    def gauge(self, name: str, description: str, labels: Dict[str, str], value: Callable[[], float]) -> None:
+        raise NotImplementedError()
+
+    def counter_function(self, name: str, description: str, labels: Dict[str, str],
+                         value: Callable[[], float]) -> None:
+        """
+        Register a counter whose value is maintained by the component and only read on collection.
+        """
+        raise NotImplementedError()
+
+    def remove(self, labels: Dict[str, str]) -> None:
+        """
+        Remove all metrics with the given labels, e.g. when a component is stopped.
+        """
+        raise NotImplementedError()
+
+
+class InMemoryMetrics(MetricsSink):
+    """
+    Keep metrics in memory to be collected on demand.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Tuple[str, str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labels: Dict[str, str] = None) -> Counter:
+        return self._register(name, "counter", description, labels, Counter)
+
+    def histogram(self, name: str, description: str, labels: Dict[str, str] = None,
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(name, "histogram", description, labels, lambda: Histogram(buckets))
+
+    def gauge(self, name: str, description: str, labels: Dict[str, str], value: Callable[[], float]) -> None:
+        with self._lock:
+            self._metrics[(name, _label_key(labels))] = ("gauge", description, value)
+
+    def counter_function(self, name: str, description: str, labels: Dict[str, str],
+                         value: Callable[[], float]) -> None:
+        with self._lock:
+            self._metrics[(name, _label_key(labels))] = ("counter", description, value)
+
+    def remove(self, labels: Dict[str, str]) -> None:
+        items = set(labels.items())
+        with self._lock:
+            self._metrics = {key: metric for key, metric in self._metrics.items() if not items <= set(key[1])}
+
+    def collect(self) -> List[Metric]:
+        """
+        Returns
+        -------
+        List[Metric]
+            The current values of all metrics, ordered by name.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items(), key=lambda item: item[0])
+
+        collected = []
+        for (name, labels), (metric_type, description, metric) in metrics:
+            if isinstance(metric, Counter):
+                value = metric.value
+            elif isinstance(metric, Histogram):
+                value = metric.snapshot()
+            else:
+                value = metric()
+            collected.append(Metric(name, metric_type, description, dict(labels), value))
+
+        return collected
+
+    def get(self, name: str, **labels) -> Optional[Union[float, HistogramSnapshot]]:
+        """
+        Returns
+        -------
+        Optional[Union[float, HistogramSnapshot]]
+            The current value of the metric with the given name and labels, None if there is no such metric.
+        """
+        for metric in self.collect():
+            if metric.name == name and metric.labels == labels:
+                return metric.value
+
+        return None
+
+    def _register(self, name, metric_type, description, labels, factory):
+        key = (name, _label_key(labels))
+        with self._lock:
+            if key not in self._metrics:
+                self._metrics[key] = (metric_type, description, factory())
+            elif self._metrics[key][0] != metric_type:
+                raise ValueError(f"Metric {name} is already registered as {self._metrics[key][0]}")
+
+            return self._metrics[key][2]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def prometheus_text(metrics: InMemoryMetrics) -> str:
+    """
+    Format the metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    described = set()
+    for metric in metrics.collect():
+        if metric.name not in described:
+            described.add(metric.name)
+            lines.append(f"# HELP {metric.name} {_escape(metric.description, help_text=True)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+
+        if metric.type != "histogram":
+            lines.append(f"{metric.name}{_format_labels(metric.labels)} {_format_value(metric.value)}")
+            continue
+
+        cumulative = 0
+        for bound, count in zip(metric.value.bounds + (math.inf,), metric.value.counts):
+            cumulative += count
+            labels = dict(metric.labels, le=_format_value(bound))
+            lines.append(f"{metric.name}_bucket{_format_labels(labels)} {cumulative}")
+        lines.append(f"{metric.name}_sum{_format_labels(metric.labels)} {_format_value(metric.value.sum)}")
+        lines.append(f"{metric.name}_count{_format_labels(metric.labels)} {metric.value.count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(text: str, help_text: bool = False) -> str:
+    text = text.replace("\\", "\\\\").replace("\n", "\\n")
+
+    return text if help_text else text.replace('"', '\\"')
+
+
+class PrometheusEndpoint:
+    """
+    Serve metrics in the Prometheus text exposition format over HTTP at `/metrics`.
+    """
+
+    def __init__(self, metrics: InMemoryMetrics, host: str = "127.0.0.1", port: int = 9100):
+        """
+        Parameters
+        ----------
+        metrics : InMemoryMetrics
+            The metrics to serve.
+        host : str
+            The interface to listen on, defaults to the local host only.
+        port : int
+            The port to listen on, 0 to select a free port.
+        """
+        self._metrics = metrics
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        self._thread = threading.Thread(name="PrometheusEndpoint", target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def _handler(self):
+        metrics = self._metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = prometheus_text(metrics).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return Handler
@@ -1,16 +1,22 @@
 import logging
+import multiprocessing
 import threading
-from enum import Enum
-from queue import Queue, Empty, Full
-from threading import Thread
-from typing import Iterable, Optional, Union, Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from collections import deque
+from queue import Full
+from threading import Thread, Lock, Condition
+from typing import Iterable, Optional, Union, Callable, List, Set, Hashable, Tuple
 
-from time import sleep
+from time import perf_counter, monotonic
 
 from cltl.combot.event.bdi import IntentionEvent
 from cltl.combot.infra.event.api import EventBus, Event, TopicError
-from cltl.combot.infra.resource.api import ResourceManager, LockTimeoutError
+from cltl.combot.infra.event.dispatch import RejectionStrategy
+from cltl.combot.infra.event.topics import TopicMatcher
+from cltl.combot.infra.metrics import LatencyRecorder, MetricsSink
 from cltl.combot.infra.time_util import timestamp_now
+from cltl.combot.infra.resource.api import ResourceManager, LockTimeoutError
 from cltl.combot.infra.util import ThreadsafeBoolean
 
 logger = logging.getLogger(__name__)
@@ -19,11 +25,18 @@ logger = logging.getLogger(__name__)
 _DEPENDENCY_TIMEOUT = 10
 
 
-class RejectionStrategy(Enum):
-    OVERWRITE = 0
-    DROP = 1
-    BLOCK = 2
-    EXCEPTION = 3
+@dataclass(frozen=True)
+class PriorityLane:
+    """
+    Topics of a :class:`TopicWorker` whose events are processed before events on other topics.
+
+    Events on the topics of a lane are put on a separate buffer with its own size and rejection
+    strategy, such that e.g. events on the intention topic are not delayed or rejected by a backlog
+    of data events. Topics may be patterns, see :mod:`cltl.combot.infra.event.topics`.
+    """
+    topics: Union[str, Iterable[str]]
+    buffer_size: int = 1
+    rejection_strategy: RejectionStrategy = RejectionStrategy.OVERWRITE
 
 
 class TopicWorker(Thread):
@@ -44,6 +57,21 @@ class TopicWorker(Thread):
     For the case when a maximum size for the processing queue is specified and
     events are received faster than they can be processed, a rejection strategy
     can be provided.
+
+    If `max_batch_size` is larger than one, the topic worker processes events in batches
+    by calling :meth:`process_batch` with all events available in the queue, up to
+    `max_batch_size` events. With `max_batch_latency_ms` the worker waits up to the given
+    time after the first event of a batch for more events to arrive. The `buffer_size`
+    should be at least `max_batch_size` for batches to fill up.
+
+    With `max_age_ms` or `deadline` events expire, based on the timestamp in their metadata.
+    Expired events are skipped when taken from the buffer, and removed from a full buffer
+    before the rejection strategy is applied, such that stale events are shed first.
+
+    With `priority_lanes` events on the topics of a lane are buffered separately and processed
+    before events of lanes listed later and before events on all other topics, which use the
+    `buffer_size` and `rejection_strategy` of the worker. Within a lane events are processed in
+    the order they arrived.
     """
 
     def __init__(self, topics: Union[str, Iterable[str]], event_bus: EventBus,
@@ -52,7 +80,12 @@ class TopicWorker(Thread):
                  resource_manager: ResourceManager = None,
                  requires: Iterable[str] = (), provides: Iterable[str] = (),
                  intentions: Iterable[str] = (), intention_topic: str = None,
-                 processor: Callable[[Optional[Event]], None] = None):
+                 processor: Callable[[Optional[Event]], None] = None,
+                 max_batch_size: int = 1, max_batch_latency_ms: float = 0,
+                 batch_processor: Callable[[List[Event]], None] = None,
+                 metrics: MetricsSink = None,
+                 max_age_ms: float = None, deadline: Callable[[Event], Optional[int]] = None,
+                 priority_lanes: Iterable[PriorityLane] = ()):
         """
         Parameters
         ----------
@@ -61,10 +94,10 @@ class TopicWorker(Thread):
         event_bus : EventBus
             The Event bus of the application.
         interval : float
-            Wait interval between processing consecutive events.
+            Minimum interval in seconds between processing consecutive events.
         scheduled : float
-            If set, the processor is invoked after the specified amount of
-            seconds even if there is no event scheduled.
+            If set, the processor is invoked if no event arrived within the
+            specified amount of seconds.
         name : str
             Name of the topic worker.
         buffer_size : int
@@ -85,176 +118,203 @@ class TopicWorker(Thread):
             The topic name on which the `TopicWorker` will listen to `IntentionEvent`s
         processor :  Callable[[Optional[Event]], None]
             Function to call for each event. Alternatively override the `process` method.
+        max_batch_size : int
+            Maximum number of events processed in a single batch, batching is enabled if larger than one.
+        max_batch_latency_ms : float
+            Maximum time in milliseconds to wait for more events after the first event of a batch.
+        batch_processor : Callable[[List[Event]], None]
+            Function to call for each batch of events. Alternatively override the `process_batch` method.
+        metrics : MetricsSink
+            If set, metrics of the worker are recorded in the sink, labeled with the name of the worker.
+        max_age_ms : float
+            If set, events older than the given time in milliseconds are not processed.
+        deadline : Callable[[Event], Optional[int]]
+            Function returning the timestamp in milliseconds after which an event is not processed,
+            or None if the event does not expire.
+        priority_lanes : Iterable[PriorityLane]
+            Lanes for topics with priority, in order of decreasing priority.
         """
         super(TopicWorker, self).__init__(name=name if name else self.__class__.__name__)
         self._event_bus = event_bus
         self._topics = set(topics) if not isinstance(topics, str) else {topics}
         self._interval = interval
         self._scheduled = scheduled
-        self._buffer = Queue(maxsize=buffer_size) if buffer_size else Queue(maxsize=1)
+        self._buffer = _create_buffer(priority_lanes, buffer_size, rejection_strategy, self.name,
+                                      max_age_ms, deadline)
         self._no_buffer = buffer_size == 0
         self._strategy = rejection_strategy
         self._resource_manager = resource_manager
         self._requires = requires
         self._provides = provides
 
-        if isinstance(intentions, str):
-            if ',' in intentions:
-                raise ValueError("Intentions should be a list, was " + intentions)
-            intentions = [intentions]
-
         self._intention_topic = intention_topic
-        self._inactive_intentions = set(intention[1:] for intention in intentions if intention.startswith("!"))
-        self._active_intentions = set(intention for intention in intentions if not intention.startswith("!"))
-        self._intention_lock = threading.Lock()
-        self._active = ThreadsafeBoolean(not self._active_intentions)
+        self._intentions = _IntentionFilter(self.name, self._topics, intentions, intention_topic)
 
-        self._started = threading.Event()
+        self._pacing = _TokenBucket(interval) if interval else None
+
+        # Thread uses the _started attribute internally
+        self._subscribed = threading.Event()
         self._running = False
-        self._stop_event = None
+        self._stopping = threading.Event()
+        self._stop_event = threading.Event()
 
         self._processor = processor
 
-    def start(self):
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_batch_latency = max_batch_latency_ms / 1000
+        self._batch_processor = batch_processor
+        self._batch_sizes = LatencyRecorder()
+        self._batch_latency = LatencyRecorder()
+
+        self._metrics = _WorkerMetrics(metrics, self.name, rejection_strategy, [self._buffer]) if metrics else None
+
+    def start(self) -> threading.Event:
+        """
+        Start the worker thread.
+
+        Returns
+        -------
+        threading.Event
+            Event that is set once the required resources are available and the worker subscribed to its topics.
+        """
         logger.info("Starting topic worker %s for topics %s, intentions (active: %s, inactive: %s)",
-                    self.name, self._topics, self._active_intentions, self._inactive_intentions)
+                    self.name, self._topics, self._intentions.active_intentions, self._intentions.inactive_intentions)
 
         super(TopicWorker, self).start()
 
-        return self._started
+        return self._subscribed
 
     def stop(self):
         for topic in self._topics:
             try:
-                self._event_bus.unsubscribe(topic, self.__accept_event)
+                self._event_bus.unsubscribe(topic, self._accept_event)
             except:
                 logger.exception("Failed to unsubscribe " + self.name + " from " + topic)
 
         self._running = False
-        self._stop_event = threading.Event()
+        self._stopping.set()
+        self._buffer.close()
         logger.info("Stopping topic worker %s", self.name)
 
     def await_stop(self):
-        if not self._stop_event:
+        if not self._stopping.is_set():
             raise ValueError("Worker " + self.name + " is not stopped")
 
         self._stop_event.wait(_DEPENDENCY_TIMEOUT)
 
     def clear(self):
-        with self._buffer.mutex:
-            self._buffer.queue.clear()
+        self._buffer.clear()
 
     def run(self):
-        self.__resolve_dependencies()
-        self._running = True
+        try:
+            self.__run()
+        finally:
+            self._stop_event.set()
+
+    def __run(self):
+        _resolve_dependencies(self.name, self._resource_manager, self._requires, self._provides)
+        self._running = not self._stopping.is_set()
 
         for topic in self._topics:
-            self._event_bus.subscribe(topic, self.__accept_event)
+            self._event_bus.subscribe(topic, self._accept_event)
         if self._intention_topic:
-            self._event_bus.subscribe(self._intention_topic, self.__accept_event)
+            self._event_bus.subscribe(self._intention_topic, self._accept_event)
 
-        self._started.set()
+        self._subscribed.set()
 
         logger.info("Started topic worker %s", self.name)
 
         while self._running:
-            self.__process_event()
-            if self._interval:
-                sleep(self._interval)
+            if self._pacing:
+                delay = self._pacing.delay()
+                if delay > 0:
+                    self._stopping.wait(delay)
+                    continue
+
+            if self._max_batch_size > 1:
+                processed = self.__process_batch()
+            else:
+                processed = self.__process_event()
+
+            if processed and self._pacing:
+                self._pacing.take()
 
-        if self._stop_event:
-            self._stop_event.set()
         logger.info("Stopped topic worker %s", self.name)
 
-    def __process_event(self):
+    def __process_event(self) -> bool:
         try:
-            block = self._interval == 0
-            timeout = self._scheduled if self._scheduled else 1  # Never block forever
-            event = self._buffer.get(block=block, timeout=timeout)
+            entry = self._buffer.take(self._scheduled)
+            if entry is None:
+                if self._running and self._scheduled and self._intentions.active:
+                    self.process(None)
+                    return True
+                return False
 
+            enqueued, event = entry
             logger.debug("Processing event %s for %s", event.id, self.name)
-            start = timestamp_now()
+            start = perf_counter()
             self.process(event)
-            logger.debug("Processed event %s in %s ms for %s", event.id, timestamp_now() - start, self.name)
+            end = perf_counter()
+            logger.debug("Processed event %s in %s ms for %s", event.id, (end - start) * 1000, self.name)
+
+            if self._metrics:
+                self._metrics.record((enqueued,), start, end)
 
             if self._no_buffer:
-                try:
-                    dropped = self._buffer.get(block=False)
+                dropped = self._buffer.discard()
+                if dropped:
                     logger.debug("Dropped event %s while event processing for %s (no buffer)", dropped.id, self.name)
-                except Empty:
-                    pass
-        except Empty:
-            if self._scheduled and self._active:
-                self.process(None)
         except:
             logger.exception("Error during thread execution (%s)", self.name)
 
-    def __accept_event(self, event):
-        start = timestamp_now()
+        return True
 
-        accept = self._check_intention(event)
-        if not accept:
-            return
+    def __process_batch(self) -> bool:
+        try:
+            entry = self._buffer.take(self._scheduled)
+            if entry is None:
+                if self._running and self._scheduled and self._intentions.active:
+                    self.process_batch([])
+                    return True
+                return False
 
-        handled = False
-        while not handled:
-            try:
-                self._buffer.put(event, block=self._strategy == RejectionStrategy.BLOCK)
-                handled = True
-                logger.debug("Queued event %s for %s (%s ms)", event.id, self.name, timestamp_now() - start)
-            except Full as e:
-                if self._strategy == RejectionStrategy.EXCEPTION:
-                    raise e
-
-                if self._strategy == RejectionStrategy.OVERWRITE:
-                    try:
-                        dropped = self._buffer.get(block=False)
-                        logger.debug("Overwrote event %s with %s for %s (%s ms)", dropped.id, event.id, self.name,
-                                     timestamp_now() - start)
-                    except Empty:
-                        pass
-                elif self._strategy == RejectionStrategy.DROP:
-                    handled = True
-                    logger.debug("Dropped event %s for %s (%s ms)", event.id, self.name, timestamp_now() - start)
-                else:
-                    raise ValueError("Unknown strategy: " + str(self._strategy))
+            entries = [entry]
+            start = perf_counter()
+            deadline = start + self._max_batch_latency
+            while len(entries) < self._max_batch_size:
+                entry = self._buffer.take(max(0.0, deadline - perf_counter()))
+                if entry is None:
+                    break
+                entries.append(entry)
 
-    def _check_intention(self, event: Event[IntentionEvent]) -> bool:
-        if not self._active_intentions and not self._inactive_intentions:
-            return True
+            events = [event for _, event in entries]
+            logger.debug("Processing batch of %s events for %s", len(events), self.name)
+            processing_start = perf_counter()
+            self.process_batch(events)
+            end = perf_counter()
+            duration = (end - start) * 1000
+            logger.debug("Processed batch of %s events in %s ms for %s", len(events), duration, self.name)
 
-        if event.metadata.topic != self._intention_topic:
-            return self._active.value
+            self._batch_sizes.record(len(events))
+            self._batch_latency.record(duration)
+            if self._metrics:
+                self._metrics.record([enqueued for enqueued, _ in entries], processing_start, end)
 
-        if hasattr(event.payload, 'intentions'):
-            intentions = {intention.label for intention in event.payload.intentions}
-            with self._intention_lock:
-                if intentions & self._inactive_intentions:
-                    self._active.value = False
-                elif not self._active_intentions:
-                    self._active.value = True
-                else:
-                    self._active.value = bool(intentions & self._active_intentions)
+            if self._no_buffer:
+                dropped = self._buffer.discard()
+                if dropped:
+                    logger.debug("Dropped event %s while event processing for %s (no buffer)", dropped.id, self.name)
+        except:
+            logger.exception("Error during thread execution (%s)", self.name)
 
-            logger.info("%s topic worker %s for intentions %s", "Activated" if self._active else "Deactivated",
-                        self.name, intentions)
+        return True
 
-        return self._intention_topic in self._topics
+    def _accept_event(self, event):
+        if self._intentions.accept(event):
+            self._buffer.put(event)
 
-    def __resolve_dependencies(self):
-        if self._resource_manager:
-            for required in self._requires:
-                try:
-                    self._resource_manager.get_read_lock(required, timeout=_DEPENDENCY_TIMEOUT)
-                except LockTimeoutError as e:
-                    raise TopicError(self.name + " failed to obtain required topic: " + required)
-
-            for provided in self._provides:
-                try:
-                    self._resource_manager.provide_resource(provided)
-                except ValueError:
-                    # Ignore error if resource is already provided
-                    pass
+    def _check_intention(self, event: Event[IntentionEvent]) -> bool:
+        return self._intentions.accept(event)
 
     #TODO add a method to process events outside active intentions (e.g. scenario events)
     def process(self, event: Optional[Event]) -> None:
@@ -272,6 +332,725 @@ class TopicWorker(Thread):
         if self._processor:
             self._processor(event)
 
+    def process_batch(self, events: List[Event]) -> None:
+        """
+        Process a batch of incoming events if `max_batch_size` is larger than one.
+
+        Override this method or provide a batch processing function to the constructor. By default
+        the events are passed to :meth:`process` one by one.
+
+        Parameters
+        ----------
+        events : List[Event]
+            The next events in the order they were received, empty if no event was available and
+            the topic worker is configured to be called in a scheduled manner.
+        """
+        if self._batch_processor:
+            self._batch_processor(events)
+        elif not events:
+            self.process(None)
+        else:
+            for event in events:
+                self.process(event)
+
+    @property
+    def batch_sizes(self) -> LatencyRecorder:
+        """
+        Returns
+        -------
+        LatencyRecorder
+            The number of events in the processed batches.
+        """
+        return self._batch_sizes
+
+    @property
+    def batch_latency(self) -> LatencyRecorder:
+        """
+        Returns
+        -------
+        LatencyRecorder
+            Time in milliseconds from taking the first event of a batch from the queue until the batch was processed.
+        """
+        return self._batch_latency
+
+    @property
+    def overwritten_events(self) -> int:
+        """
+        Returns
+        -------
+        int
+            The number of events replaced by newer events with `RejectionStrategy.OVERWRITE`.
+        """
+        return self._buffer.overwritten
+
+    @property
+    def dropped_events(self) -> int:
+        """
+        Returns
+        -------
+        int
+            The number of events dropped with `RejectionStrategy.DROP` or because the worker has no buffer.
+        """
+        return self._buffer.dropped
+
+    @property
+    def expired_events(self) -> int:
+        """
+        Returns
+        -------
+        int
+            The number of events that were not processed because they expired.
+        """
+        return self._buffer.expired
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Returns
+        -------
+        int
+            The number of events waiting to be processed.
+        """
+        return len(self._buffer)
+
+    @property
+    def event_bus(self) -> EventBus:
+        return self._event_bus
+
+
+class TopicWorkerPool:
+    """
+    Process events on a topic from the event bus with multiple worker threads.
+
+    The pool subscribes once to the specified topics and processes the received events in
+    parallel on `workers` threads, or in `workers` processes if `processes` is set.
+
+    Without a `key` function, events are put on a single shared queue from which each worker
+    takes the next event, i.e. events are not necessarily processed in order. With a `key`
+    function, events are assigned to a queue per worker based on their key, such that events
+    with the same key are processed sequentially in the order they were received, while
+    events with different keys can be processed in parallel.
+
+    Intentions, required and provided resources, and the rejection strategy, applied per
+    queue, are handled as for the :class:`TopicWorker`.
+    """
+
+    def __init__(self, topics: Union[str, Iterable[str]], event_bus: EventBus, workers: int = 2,
+                 key: Callable[[Event], Hashable] = None, name: str = None, buffer_size: int = 1,
+                 rejection_strategy: RejectionStrategy = RejectionStrategy.OVERWRITE,
+                 resource_manager: ResourceManager = None,
+                 requires: Iterable[str] = (), provides: Iterable[str] = (),
+                 intentions: Iterable[str] = (), intention_topic: str = None,
+                 processor: Callable[[Event], None] = None, processes: bool = False,
+                 metrics: MetricsSink = None,
+                 max_age_ms: float = None, deadline: Callable[[Event], Optional[int]] = None,
+                 priority_lanes: Iterable[PriorityLane] = ()):
+        """
+        Parameters
+        ----------
+        topics : Union[str, Iterable[str]]
+            One or more topics the pool is listening to.
+        event_bus : EventBus
+            The Event bus of the application.
+        workers : int
+            Number of events processed in parallel.
+        key : Callable[[Event], Hashable]
+            Function returning the ordering key of an event, e.g. the scenario id. Events with the
+            same key are processed sequentially.
+        name : str
+            Name of the pool, worker threads are named after the pool.
+        buffer_size : int
+            Size of the queue shared by the workers, or of the queue per worker if `key` is set.
+        rejection_strategy : RejectionStrategy
+            Strategy to use when a queue is full.
+        resource_manager : ResourceManager
+            The resource manager of the application.
+        requires : Iterable[str]
+            Resources required by the pool.
+        provides : Iterable[str]
+            Resources provided by the pool.
+        intentions : Iterable[str]
+            Intention identifiers for which the pool will be active, see :class:`TopicWorker`.
+        intention_topic : str
+            The topic name on which the pool will listen to `IntentionEvent`s
+        processor : Callable[[Event], None]
+            Function to call for each event. Alternatively override the `process` method.
+        processes : bool
+            Invoke the `processor` in a pool of worker processes instead of the worker threads.
+            The `processor` must then be picklable, e.g. a module level function, and is invoked
+            with a copy of the event.
+        metrics : MetricsSink
+            If set, metrics of the pool are recorded in the sink, labeled with the name of the pool.
+        max_age_ms : float
+            If set, events older than the given time in milliseconds are not processed, see :class:`TopicWorker`.
+        deadline : Callable[[Event], Optional[int]]
+            Function returning the timestamp in milliseconds after which an event is not processed,
+            or None if the event does not expire.
+        priority_lanes : Iterable[PriorityLane]
+            Lanes for topics with priority, in order of decreasing priority.
+        """
+        self.name = name if name else self.__class__.__name__
+        self._event_bus = event_bus
+        self._topics = set(topics) if not isinstance(topics, str) else {topics}
+        self._workers = max(1, workers)
+        self._key = key
+        priority_lanes = tuple(priority_lanes)
+        self._buffers = [_create_buffer(priority_lanes, buffer_size, rejection_strategy, f"{self.name}-{idx}",
+                                        max_age_ms, deadline)
+                         for idx in range(self._workers if key else 1)]
+        self._strategy = rejection_strategy
+        self._resource_manager = resource_manager
+        self._requires = requires
+        self._provides = provides
+        self._intention_topic = intention_topic
+        self._intentions = _IntentionFilter(self.name, self._topics, intentions, intention_topic)
+        self._processor = processor
+        self._processes = processes
+        self._metrics = _WorkerMetrics(metrics, self.name, rejection_strategy, self._buffers) if metrics else None
+
+        self._executor = None
+        self._threads = []
+        self._started = threading.Event()
+        self._running = False
+        self._stop_event = None
+
+    def start(self) -> threading.Event:
+        logger.info("Starting topic worker pool %s with %s workers for topics %s", self.name, self._workers, self._topics)
+
+        if self._processes:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+
+        self._running = True
+        self._threads = [Thread(name=f"{self.name}-{idx}", target=self._run,
+                                args=(self._buffers[idx % len(self._buffers)],))
+                         for idx in range(self._workers)]
+        for thread in self._threads:
+            thread.start()
+
+        Thread(name=self.name + "-start", target=self._subscribe).start()
+
+        return self._started
+
+    def stop(self):
+        for topic in self._topics | ({self._intention_topic} if self._intention_topic else set()):
+            try:
+                self._event_bus.unsubscribe(topic, self._accept_event)
+            except:
+                logger.exception("Failed to unsubscribe " + self.name + " from " + topic)
+
+        self._running = False
+        self._stop_event = threading.Event()
+        for buffer in self._buffers:
+            buffer.close()
+        Thread(name=self.name + "-stop", target=self._await_workers).start()
+        logger.info("Stopping topic worker pool %s", self.name)
+
+    def await_stop(self):
+        if not self._stop_event:
+            raise ValueError("Worker pool " + self.name + " is not stopped")
+
+        self._stop_event.wait(_DEPENDENCY_TIMEOUT)
+
+    def clear(self):
+        for buffer in self._buffers:
+            buffer.clear()
+
+    def _subscribe(self):
+        try:
+            _resolve_dependencies(self.name, self._resource_manager, self._requires, self._provides)
+        except:
+            logger.exception("Failed to start topic worker pool %s", self.name)
+            self._running = False
+            return
+
+        for topic in self._topics:
+            self._event_bus.subscribe(topic, self._accept_event)
+        if self._intention_topic and self._intention_topic not in self._topics:
+            self._event_bus.subscribe(self._intention_topic, self._accept_event)
+
+        self._started.set()
+        logger.info("Started topic worker pool %s", self.name)
+
+    def _await_workers(self):
+        for thread in self._threads:
+            thread.join()
+        if self._executor:
+            self._executor.shutdown()
+        self._stop_event.set()
+        logger.info("Stopped topic worker pool %s", self.name)
+
+    def _accept_event(self, event: Event):
+        if not self._intentions.accept(event):
+            return
+
+        if self._key:
+            buffer = self._buffers[hash(self._key(event)) % len(self._buffers)]
+        else:
+            buffer = self._buffers[0]
+
+        buffer.put(event)
+
+    def _run(self, buffer: "_EventBuffer"):
+        while self._running:
+            try:
+                entry = buffer.take()
+                if entry is None:
+                    continue
+
+                enqueued, event = entry
+                logger.debug("Processing event %s for %s", event.id, self.name)
+                start = perf_counter()
+                self.process(event)
+                end = perf_counter()
+                logger.debug("Processed event %s in %s ms for %s", event.id, (end - start) * 1000, self.name)
+
+                if self._metrics:
+                    self._metrics.record((enqueued,), start, end)
+            except:
+                logger.exception("Error during thread execution (%s)", self.name)
+
+    def process(self, event: Event) -> None:
+        """
+        Process incoming events.
+
+        Override this method or provide a processing function to the constructor. The method is
+        called concurrently from the worker threads.
+
+        Parameters
+        ----------
+        event : Event
+            The next event.
+        """
+        if self._executor:
+            self._executor.submit(self._processor, event).result()
+        elif self._processor:
+            self._processor(event)
+
+    @property
+    def overwritten_events(self) -> int:
+        return sum(buffer.overwritten for buffer in self._buffers)
+
+    @property
+    def dropped_events(self) -> int:
+        return sum(buffer.dropped for buffer in self._buffers)
+
+    @property
+    def expired_events(self) -> int:
+        return sum(buffer.expired for buffer in self._buffers)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers)
+
     @property
     def event_bus(self) -> EventBus:
         return self._event_bus
+
+
+class _IntentionFilter:
+    """
+    Activate and deactivate a worker based on `IntentionEvent`s on the intention topic.
+    """
+    def __init__(self, name: str, topics: Set[str], intentions: Iterable[str], intention_topic: Optional[str]):
+        if isinstance(intentions, str):
+            if ',' in intentions:
+                raise ValueError("Intentions should be a list, was " + intentions)
+            intentions = [intentions]
+
+        self._name = name
+        self._topics = topics
+        self._intention_topic = intention_topic
+        self.inactive_intentions = set(intention[1:] for intention in intentions if intention.startswith("!"))
+        self.active_intentions = set(intention for intention in intentions if not intention.startswith("!"))
+        self._intention_lock = threading.Lock()
+        self._active = ThreadsafeBoolean(not self.active_intentions)
+
+    @property
+    def active(self) -> bool:
+        return self._active.value
+
+    def accept(self, event: Event[IntentionEvent]) -> bool:
+        if not self.active_intentions and not self.inactive_intentions:
+            return True
+
+        if event.metadata.topic != self._intention_topic:
+            return self._active.value
+
+        if hasattr(event.payload, 'intentions'):
+            intentions = {intention.label for intention in event.payload.intentions}
+            with self._intention_lock:
+                if intentions & self.inactive_intentions:
+                    self._active.value = False
+                elif not self.active_intentions:
+                    self._active.value = True
+                else:
+                    self._active.value = bool(intentions & self.active_intentions)
+
+            logger.info("%s topic worker %s for intentions %s", "Activated" if self._active else "Deactivated",
+                        self._name, intentions)
+
+        return self._intention_topic in self._topics
+
+
+class _EventBuffer:
+    """
+    Bounded FIFO buffer of events that applies a :class:`RejectionStrategy` when full.
+
+    Events are kept in a ring buffer, such that with `RejectionStrategy.OVERWRITE` the oldest
+    event is replaced in constant time, which for a size of one makes the buffer a single-slot
+    mailbox that always holds the latest event. Rejected events are counted instead of being
+    signalled by exceptions, except for `RejectionStrategy.EXCEPTION`.
+
+    If events expire, the expiry timestamp is computed once on enqueue. Expired events are
+    skipped on dequeue and removed when the buffer is full, before the rejection strategy
+    is applied. Blocked publishers wake up when the next event in the buffer expires.
+    """
+    def __init__(self, size: int, strategy: RejectionStrategy, name: str,
+                 max_age_ms: float = None, deadline: Callable[[Event], Optional[int]] = None,
+                 lock: Lock = None, not_empty: Condition = None):
+        self._size = max(1, size)
+        self._strategy = strategy
+        self._name = name
+        self._max_age = max_age_ms
+        self._deadline = deadline
+        self._expires = max_age_ms is not None or deadline is not None
+
+        # (enqueue time, expiry timestamp, event)
+        self._events = deque(maxlen=self._size)
+        # Lanes of a _PriorityBuffer share the lock and the not empty condition
+        self._lock = lock if lock else Lock()
+        self._not_empty = not_empty if not_empty else Condition(self._lock)
+        self._not_full = Condition(self._lock)
+        self._closed = False
+
+        self.overwritten = 0
+        self.dropped = 0
+        self.expired = 0
+
+    def put(self, event: Event):
+        expiry = None
+        if self._expires:
+            expiry = self._expiry(event)
+            if expiry is not None and expiry < timestamp_now():
+                with self._lock:
+                    self.expired += 1
+                logger.debug("Expired event %s for %s", event.id, self._name)
+                return
+
+        with self._lock:
+            if len(self._events) == self._size and self._expires:
+                self._remove_expired()
+
+            if len(self._events) < self._size:
+                self._events.append((perf_counter(), expiry, event))
+            elif self._strategy == RejectionStrategy.OVERWRITE:
+                _, _, dropped = self._events[0]
+                # The deque discards the oldest event
+                self._events.append((perf_counter(), expiry, event))
+                self.overwritten += 1
+                logger.debug("Overwrote event %s with %s for %s", dropped.id, event.id, self._name)
+            elif self._strategy == RejectionStrategy.DROP:
+                self.dropped += 1
+                logger.debug("Dropped event %s for %s", event.id, self._name)
+                return
+            elif self._strategy == RejectionStrategy.BLOCK:
+                while len(self._events) == self._size and not self._closed:
+                    self._not_full.wait(self._next_expiry() if self._expires else None)
+                    if self._expires:
+                        self._remove_expired()
+                if self._closed:
+                    self.dropped += 1
+                    return
+                self._events.append((perf_counter(), expiry, event))
+            elif self._strategy == RejectionStrategy.EXCEPTION:
+                raise Full("Buffer of " + self._name + " is full")
+            else:
+                raise ValueError("Unknown strategy: " + str(self._strategy))
+
+            self._not_empty.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """
+        Take the next event, waiting until an event is available, the timeout expired or the buffer
+        was closed.
+
+        Returns
+        -------
+        Optional[Event]
+            The next event or None if no event is available.
+        """
+        entry = self.take(timeout)
+
+        return entry[1] if entry else None
+
+    def take(self, timeout: Optional[float] = None) -> Optional[Tuple[float, Event]]:
+        """
+        Like :meth:`get`, but also returns the :func:`time.perf_counter` value when the event was enqueued.
+        """
+        with self._lock:
+            if timeout == 0:
+                self._available()
+            else:
+                self._not_empty.wait_for(self._available, timeout)
+
+            return self._pop()
+
+    def discard(self) -> Optional[Event]:
+        """
+        Drop the next event without waiting.
+
+        Returns
+        -------
+        Optional[Event]
+            The dropped event or None if the buffer was empty.
+        """
+        with self._lock:
+            if not self._events:
+                return None
+
+            self.dropped += 1
+            self._not_full.notify()
+
+            return self._events.popleft()[2]
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._not_full.notify_all()
+
+    def close(self):
+        """
+        Wake up all waiting threads, blocked publishers drop their events.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def __len__(self):
+        return len(self._events)
+
+    def _expiry(self, event: Event) -> Optional[int]:
+        expiry = self._deadline(event) if self._deadline else None
+        if self._max_age is not None:
+            max_age_expiry = event.metadata.timestamp + self._max_age
+            expiry = max_age_expiry if expiry is None else min(expiry, max_age_expiry)
+
+        return expiry
+
+    def _pop(self) -> Optional[Tuple[float, Event]]:
+        if self._expires:
+            self._skip_expired()
+        if not self._events:
+            return None
+
+        self._not_full.notify()
+        enqueued, _, event = self._events.popleft()
+
+        return enqueued, event
+
+    def _available(self) -> bool:
+        if self._expires:
+            self._skip_expired()
+
+        return bool(self._events) or self._closed
+
+    def _skip_expired(self):
+        now = timestamp_now()
+        while self._events and self._events[0][1] is not None and self._events[0][1] < now:
+            _, _, event = self._events.popleft()
+            self.expired += 1
+            self._not_full.notify()
+            logger.debug("Expired event %s for %s", event.id, self._name)
+
+    def _remove_expired(self):
+        now = timestamp_now()
+        events = [entry for entry in self._events if entry[1] is None or entry[1] >= now]
+        if len(events) < len(self._events):
+            self.expired += len(self._events) - len(events)
+            self._events.clear()
+            self._events.extend(events)
+
+    def _next_expiry(self) -> Optional[float]:
+        """
+        Returns
+        -------
+        Optional[float]
+            The time in seconds until the next event in the buffer expires, None if no event expires.
+        """
+        expiries = [entry[1] for entry in self._events if entry[1] is not None]
+        if not expiries:
+            return None
+
+        return max(0.0, (min(expiries) - timestamp_now()) / 1000)
+
+
+class _PriorityBuffer:
+    """
+    Buffer with a lane per :class:`PriorityLane` and a default lane for all other topics.
+
+    Each lane is an :class:`_EventBuffer` with its own size and rejection strategy, lanes share a lock
+    such that a consumer waits for events on all lanes at once. Events are taken from the lane with the
+    highest priority that has events available.
+    """
+    def __init__(self, lanes: Iterable["PriorityLane"], size: int, strategy: RejectionStrategy, name: str,
+                 max_age_ms: float = None, deadline: Callable[[Event], Optional[int]] = None):
+        self._lock = Lock()
+        self._not_empty = Condition(self._lock)
+        lanes = list(lanes)
+        self._lanes = [_EventBuffer(lane.buffer_size, lane.rejection_strategy, f"{name}-{idx}",
+                                    max_age_ms, deadline, self._lock, self._not_empty)
+                       for idx, lane in enumerate(lanes)]
+        self._lanes.append(_EventBuffer(size, strategy, name, max_age_ms, deadline, self._lock, self._not_empty))
+        self._matcher = TopicMatcher((topic, idx) for idx, lane in enumerate(lanes)
+                                     for topic in _as_set(lane.topics))
+
+    def put(self, event: Event):
+        lanes = self._matcher.match(event.metadata.topic)
+        self._lanes[min(lanes) if lanes else -1].put(event)
+
+    def take(self, timeout: Optional[float] = None) -> Optional[Tuple[float, Event]]:
+        with self._lock:
+            if timeout == 0:
+                self._available()
+            else:
+                self._not_empty.wait_for(self._available, timeout)
+
+            for lane in self._lanes:
+                entry = lane._pop()
+                if entry:
+                    return entry
+
+            return None
+
+    def discard(self) -> Optional[Event]:
+        # Without buffer only events on other topics are dropped, events in priority lanes are kept
+        return self._lanes[-1].discard()
+
+    def clear(self):
+        for lane in self._lanes:
+            lane.clear()
+
+    def close(self):
+        for lane in self._lanes:
+            lane.close()
+
+    def _available(self) -> bool:
+        return any(lane._available() for lane in self._lanes)
+
+    @property
+    def overwritten(self) -> int:
+        return sum(lane.overwritten for lane in self._lanes)
+
+    @property
+    def dropped(self) -> int:
+        return sum(lane.dropped for lane in self._lanes)
+
+    @property
+    def expired(self) -> int:
+        return sum(lane.expired for lane in self._lanes)
+
+    def __len__(self):
+        return sum(len(lane) for lane in self._lanes)
+
+
+def _create_buffer(lanes: Iterable["PriorityLane"], size: int, strategy: RejectionStrategy, name: str,
+                   max_age_ms: float = None, deadline: Callable[[Event], Optional[int]] = None):
+    lanes = list(lanes)
+    if lanes:
+        return _PriorityBuffer(lanes, size, strategy, name, max_age_ms, deadline)
+
+    return _EventBuffer(size, strategy, name, max_age_ms, deadline)
+
+
+def _as_set(topics: Union[str, Iterable[str]]) -> Set[str]:
+    return set(topics) if not isinstance(topics, str) else {topics}
+
+
+class _WorkerMetrics:
+    """
+    Metrics of a :class:`TopicWorker` or :class:`TopicWorkerPool`.
+
+    Queue depth and rejected events are read from the buffers on collection, only wait and processing
+    times and the number of processed events are recorded while processing.
+    The throughput in events per second is derived from the processed events counter, e.g. with
+    `rate(cltl_topic_worker_processed_events_total[1m])` in Prometheus.
+    """
+    def __init__(self, sink: MetricsSink, name: str, strategy: RejectionStrategy, buffers: List[_EventBuffer]):
+        labels = {"worker": name}
+        sink.gauge("cltl_topic_worker_queue_depth", "Number of events waiting in the buffer of the worker",
+                   labels, lambda: sum(len(buffer) for buffer in buffers))
+        sink.counter_function("cltl_topic_worker_rejected_events_total",
+                              "Number of events rejected because the buffer of the worker was full",
+                              dict(labels, strategy=strategy.name, reason="overwritten"),
+                              lambda: sum(buffer.overwritten for buffer in buffers))
+        sink.counter_function("cltl_topic_worker_rejected_events_total",
+                              "Number of events rejected because the buffer of the worker was full",
+                              dict(labels, strategy=strategy.name, reason="dropped"),
+                              lambda: sum(buffer.dropped for buffer in buffers))
+        self._processed = sink.counter("cltl_topic_worker_processed_events_total",
+                                       "Number of events processed by the worker", labels)
+        self._wait = sink.histogram("cltl_topic_worker_wait_ms",
+                                    "Time in milliseconds from enqueuing an event until its processing started",
+                                    labels)
+        sink.counter_function("cltl_topic_worker_expired_events_total",
+                              "Number of events not processed by the worker because they expired",
+                              labels, lambda: sum(buffer.expired for buffer in buffers))
+        self._processing = sink.histogram("cltl_topic_worker_processing_ms",
+                                          "Time in milliseconds spent processing an event or batch of events", labels)
+
+    def record(self, enqueued: Iterable[float], start: float, end: float):
+        count = 0
+        for enqueued_at in enqueued:
+            self._wait.observe((start - enqueued_at) * 1000)
+            count += 1
+        self._processing.observe((end - start) * 1000)
+        self._processed.inc(count)
+
+
+class _TokenBucket:
+    """
+    Rate limit of one event per `interval` seconds, allowing bursts of up to `capacity` events.
+    """
+    def __init__(self, interval: float, capacity: int = 1):
+        self._interval = interval
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = monotonic()
+
+    def delay(self) -> float:
+        """
+        Returns
+        -------
+        float
+            The time in seconds until a token is available.
+        """
+        self._refill()
+        return max(0.0, (1 - self._tokens) * self._interval)
+
+    def take(self):
+        self._refill()
+        self._tokens -= 1
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) / self._interval)
+        self._updated = now
+
+
+def _resolve_dependencies(name: str, resource_manager: Optional[ResourceManager],
+                          requires: Iterable[str], provides: Iterable[str]):
+    if resource_manager:
+        for required in requires:
+            try:
+                resource_manager.get_read_lock(required, timeout=_DEPENDENCY_TIMEOUT)
+            except LockTimeoutError as e:
+                raise TopicError(name + " failed to obtain required topic: " + required)
+
+        for provided in provides:
+            try:
+                resource_manager.provide_resource(provided)
+            except ValueError:
+                # Ignore error if resource is already provided
+                pass
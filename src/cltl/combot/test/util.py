@@ -25,6 +25,9 @@ class TestConfiguration(Configuration):
     def get_enum(self, key, type, multi=False):
         return self.get(key)
 
+    def __contains__(self, key):
+        return key in self._dict
+
 
 def await_predicate(predicate: Callable[[Any], bool], msg: str = "predicate", repeat: int = 1000,
                     sleep_interval: float = 0.01) -> None:
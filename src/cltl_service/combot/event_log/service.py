@@ -2,7 +2,8 @@ import logging
 from typing import List
 
 from cltl.combot.infra.config import ConfigurationManager
-from cltl.combot.infra.event import EventBus, Event
+from cltl.combot.infra.event import EventBus, Event, TopicError
+from cltl.combot.infra.event.topics import WILDCARD_MANY
 from cltl.combot.infra.event_log import LogWriter
 
 logger = logging.getLogger(__name__)
@@ -34,12 +35,30 @@ class EventLogService:
 
     def start(self):
         self._log_writer.__enter__()
-        self._subscribed_topics = self._input_topics if self._input_topics else self._event_bus.topics
-        for topic in self._subscribed_topics:
-            self._event_bus.subscribe(topic, self._process)
+        if self._input_topics:
+            for topic in self._input_topics:
+                self._event_bus.subscribe(topic, self._process)
+            self._subscribed_topics = self._input_topics
+        else:
+            self._subscribed_topics = self._subscribe_all()
 
         logger.info("Subscribed event log to topics %s", self._subscribed_topics)
 
+    def _subscribe_all(self):
+        try:
+            # A pattern matching all topics also covers topics that are used after startup
+            self._event_bus.subscribe(WILDCARD_MANY, self._process)
+
+            return [WILDCARD_MANY]
+        except TopicError:
+            logger.warning("Event bus doesn't support topic patterns, only topics in use at startup are logged")
+
+        topics = list(self._event_bus.topics)
+        for topic in topics:
+            self._event_bus.subscribe(topic, self._process)
+
+        return topics
+
     def stop(self):
         if self._subscribed_topics is None:
             return
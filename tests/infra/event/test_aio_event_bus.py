@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import unittest
+
+from cltl.combot.infra.event.aio import AsyncioEventBus, EventBusBridge
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl.combot.test.util import await_predicate
+
+
+class AsyncioEventBusTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.event_bus = AsyncioEventBus()
+
+    async def test_publish(self):
+        actual_events = []
+
+        async def async_handler(event):
+            await asyncio.sleep(0)
+            actual_events.append(("async", event.payload))
+
+        self.event_bus.subscribe("topic", lambda event: actual_events.append(("sync", event.payload)))
+        self.event_bus.subscribe("topic", async_handler)
+
+        await self.event_bus.publish("topic", Event.for_payload(1))
+        await self.event_bus.publish_batch("topic", [Event.for_payload(2)])
+
+        self.assertEqual([("sync", 1), ("async", 1), ("sync", 2), ("async", 2)], actual_events)
+
+    async def test_topic_metadata(self):
+        actual_events = []
+        self.event_bus.subscribe("topic", actual_events.append)
+
+        await self.event_bus.publish("topic", Event.for_payload(1))
+
+        self.assertEqual("topic", actual_events[0].metadata.topic)
+
+    async def test_unsubscribe(self):
+        actual_events = []
+        self.event_bus.subscribe("topic", actual_events.append)
+        self.event_bus.unsubscribe("topic", actual_events.append)
+
+        await self.event_bus.publish("topic", Event.for_payload(1))
+
+        self.assertEqual([], actual_events)
+        self.assertEqual(["topic"], self.event_bus.topics)
+
+    async def test_unsubscribe_unknown_handler(self):
+        with self.assertRaises(ValueError):
+            self.event_bus.unsubscribe("topic", print)
+
+
+class EventBusBridgeTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.event_bus = SynchronousEventBus()
+        self.asyncio_event_bus = AsyncioEventBus()
+        self.bridge = EventBusBridge(self.event_bus, self.asyncio_event_bus, asyncio.get_running_loop())
+
+    def tearDown(self):
+        self.bridge.close()
+
+    async def test_forward_to_asyncio(self):
+        received = asyncio.Event()
+        actual_events = []
+
+        def handler(event):
+            actual_events.append(event)
+            received.set()
+
+        self.asyncio_event_bus.subscribe("topic", handler)
+        self.bridge.forward_to_asyncio("topic")
+
+        thread = threading.Thread(target=self.event_bus.publish, args=("topic", Event.for_payload(1)))
+        thread.start()
+        await asyncio.wait_for(received.wait(), 1)
+        thread.join()
+
+        self.assertEqual([1], [event.payload for event in actual_events])
+
+    async def test_forward_to_asyncio_waits_for_handlers(self):
+        release = asyncio.Event()
+        actual_events = []
+
+        async def handler(event):
+            await release.wait()
+            actual_events.append(event.payload)
+
+        self.asyncio_event_bus.subscribe("topic", handler)
+        self.bridge.forward_to_asyncio("topic")
+
+        thread = threading.Thread(target=lambda: [self.event_bus.publish("topic", Event.for_payload(i))
+                                                  for i in range(3)])
+        thread.start()
+        await asyncio.sleep(0.05)
+        self.assertTrue(thread.is_alive())
+
+        release.set()
+        await asyncio.get_running_loop().run_in_executor(None, thread.join, 1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([0, 1, 2], actual_events)
+
+    async def test_forward_to_asyncio_raises_handler_exception(self):
+        def handler(event):
+            raise ValueError("test")
+
+        self.asyncio_event_bus.subscribe("topic", handler)
+        self.bridge.forward_to_asyncio("topic")
+
+        with self.assertRaises(ValueError):
+            await asyncio.get_running_loop().run_in_executor(None, self.event_bus.publish, "topic",
+                                                             Event.for_payload(1))
+
+    async def test_forward_from_asyncio(self):
+        actual_events = []
+        self.event_bus.subscribe("topic", actual_events.append)
+        self.bridge.forward_from_asyncio("topic")
+
+        await self.asyncio_event_bus.publish("topic", Event.for_payload(1))
+
+        self.assertEqual([1], [event.payload for event in actual_events])
+
+    async def test_forward_in_both_directions(self):
+        self.bridge.forward_from_asyncio("topic")
+
+        with self.assertRaises(ValueError):
+            self.bridge.forward_to_asyncio("topic")
@@ -0,0 +1,188 @@
+import threading
+import unittest
+from queue import Full
+
+from cltl.combot.infra.event.api import Event, batch_handler
+from cltl.combot.infra.event.memory import AsyncEventBus
+from cltl.combot.infra.topic_worker import RejectionStrategy
+from cltl.combot.test.util import await_predicate
+
+
+class AsyncEventBusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.event_bus = AsyncEventBus(max_workers=4)
+
+    def tearDown(self):
+        self.event_bus.stop()
+
+    def test_subscribe(self):
+        actual_events = []
+        handler = lambda ev: actual_events.append(ev)
+
+        event = Event.for_payload("test payload")
+
+        self.event_bus.subscribe("testTopic", handler)
+        self.event_bus.publish("testTopic", event)
+
+        await_predicate(lambda: len(actual_events) > 0, "event received")
+        self.assertEqual(actual_events, [event])
+        self.assertEqual("testTopic", actual_events[0].metadata.topic)
+
+    def test_ordering_per_topic(self):
+        actual_events = []
+        handler = lambda ev: actual_events.append(ev.payload)
+
+        self.event_bus.subscribe("testTopic", handler)
+        for i in range(500):
+            self.event_bus.publish("testTopic", Event.for_payload(i))
+
+        await_predicate(lambda: len(actual_events) == 500, "events received")
+        self.assertEqual(list(range(500)), actual_events)
+
+    def test_batch_handler(self):
+        started = threading.Event()
+        release = threading.Event()
+        actual_batches = []
+
+        def handler(events):
+            started.set()
+            release.wait(1)
+            actual_batches.append([ev.payload for ev in events])
+
+        self.event_bus.subscribe("testTopic", batch_handler(handler))
+        self.event_bus.publish("testTopic", Event.for_payload(0))
+        started.wait(1)
+        self.event_bus.publish_batch("testTopic", [Event.for_payload(i) for i in range(1, 4)])
+        release.set()
+
+        await_predicate(lambda: len(actual_batches) == 2, "events received")
+        self.assertEqual([[0], [1, 2, 3]], actual_batches)
+
+    def test_publish_does_not_block_on_slow_handler(self):
+        release = threading.Event()
+        actual_events = []
+
+        def slow_handler(ev):
+            release.wait(1)
+            actual_events.append(ev)
+
+        self.event_bus.subscribe("testTopic", slow_handler)
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+
+        self.assertEqual(0, len(actual_events))
+        release.set()
+        await_predicate(lambda: len(actual_events) == 2, "events received")
+
+    def test_topics_are_independent(self):
+        release = threading.Event()
+        actual_events = []
+
+        self.event_bus.subscribe("slowTopic", lambda ev: release.wait(1))
+        self.event_bus.subscribe("testTopic", lambda ev: actual_events.append(ev))
+
+        self.event_bus.publish("slowTopic", Event.for_payload(1))
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+
+        await_predicate(lambda: len(actual_events) == 1, "event received")
+        release.set()
+
+    def test_failing_handler_does_not_affect_other_handlers(self):
+        failing_events = []
+        actual_events = []
+
+        def failing_handler(ev):
+            if ev.payload == 1:
+                raise ValueError("Failed")
+            failing_events.append(ev.payload)
+
+        self.event_bus.subscribe("testTopic", failing_handler)
+        self.event_bus.subscribe("testTopic", lambda ev: actual_events.append(ev.payload))
+        self.event_bus.publish_batch("testTopic", [Event.for_payload(i) for i in range(10)])
+
+        await_predicate(lambda: len(actual_events) == 10, "events received")
+        self.assertEqual(list(range(10)), actual_events)
+        await_predicate(lambda: len(failing_events) == 9, "events received")
+        self.assertEqual([0] + list(range(2, 10)), failing_events)
+
+    def test_publish_after_stop(self):
+        actual_events = []
+        self.event_bus.configure_topic("testTopic", 2, RejectionStrategy.BLOCK)
+        self.event_bus.subscribe("testTopic", lambda ev: actual_events.append(ev))
+        self.event_bus.stop()
+
+        publisher = threading.Thread(target=lambda: [self.event_bus.publish("testTopic", Event.for_payload(i))
+                                                     for i in range(5)])
+        publisher.start()
+        publisher.join(1)
+
+        self.assertFalse(publisher.is_alive())
+        self.assertEqual([], actual_events)
+
+    def test_stop_releases_blocked_publisher(self):
+        self.event_bus.configure_topic("testTopic", 1, RejectionStrategy.BLOCK)
+
+        started = threading.Event()
+        release = threading.Event()
+        actual_events = []
+
+        def handler(ev):
+            started.set()
+            release.wait(1)
+            actual_events.append(ev.payload)
+
+        self.event_bus.subscribe("testTopic", handler)
+        self.event_bus.publish("testTopic", Event.for_payload(0))
+        started.wait(1)
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+
+        publisher = threading.Thread(target=self.event_bus.publish, args=("testTopic", Event.for_payload(2)))
+        publisher.start()
+        publisher.join(0.05)
+        self.assertTrue(publisher.is_alive())
+
+        self.event_bus.stop(wait=False)
+        publisher.join(1)
+        self.assertFalse(publisher.is_alive())
+
+        release.set()
+        await_predicate(lambda: len(actual_events) == 2, "events received")
+        self.assertEqual([0, 1], actual_events)
+
+    def test_rejection_strategy_drop(self):
+        self.assert_rejection_strategy(RejectionStrategy.DROP, [0, 1])
+
+    def test_rejection_strategy_overwrite(self):
+        self.assert_rejection_strategy(RejectionStrategy.OVERWRITE, [0, 3])
+
+    def test_rejection_strategy_exception(self):
+        with self.assertRaises(Full):
+            self.assert_rejection_strategy(RejectionStrategy.EXCEPTION, [0, 1])
+
+    def assert_rejection_strategy(self, strategy, expected):
+        self.event_bus.configure_topic("testTopic", 1, strategy)
+
+        started = threading.Event()
+        release = threading.Event()
+        actual_events = []
+
+        def handler(ev):
+            started.set()
+            release.wait(1)
+            actual_events.append(ev.payload)
+
+        self.event_bus.subscribe("testTopic", handler)
+        self.event_bus.publish("testTopic", Event.for_payload(0))
+        started.wait(1)
+        try:
+            for i in range(1, 4):
+                self.event_bus.publish("testTopic", Event.for_payload(i))
+        finally:
+            release.set()
+
+        await_predicate(lambda: len(actual_events) == len(expected), "events received")
+        self.assertEqual(expected, actual_events)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import dataclasses
+import json
+import pickle
+import unittest
+
+from cltl.combot.infra.event.api import Event, EventMetadata, MonotonicIdGenerator, set_id_generator, uuid_id
+from cltl.combot.infra.event.serialization import object_vars
+from cltl.combot.infra.time_util import timestamp_now
+
+
+class EventTestCase(unittest.TestCase):
+    def tearDown(self):
+        set_id_generator(uuid_id)
+
+    def test_event_is_frozen(self):
+        event = Event.for_payload("test payload")
+
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            event.payload = "other payload"
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            event.metadata.topic = "testTopic"
+
+    def test_event_has_no_dict(self):
+        event = Event.for_payload("test payload")
+
+        self.assertFalse(hasattr(event, "__dict__"))
+        self.assertFalse(hasattr(event.metadata, "__dict__"))
+
+    def test_timestamp(self):
+        start = timestamp_now()
+        event = Event.for_payload("test payload")
+
+        self.assertGreaterEqual(event.metadata.timestamp, start)
+        self.assertLessEqual(event.metadata.timestamp, timestamp_now())
+
+    def test_pickle(self):
+        event = Event("1", "test payload", EventMetadata(1, 2, "testTopic"))
+
+        unpickled = pickle.loads(pickle.dumps(event))
+
+        self.assertEqual(event, unpickled)
+        self.assertEqual(event.payload, unpickled.payload)
+        self.assertEqual(event.metadata, unpickled.metadata)
+
+    def test_json(self):
+        event = Event("1", "test payload", EventMetadata(1, 2, "testTopic"))
+
+        serialized = json.loads(json.dumps(event, default=object_vars))
+
+        self.assertEqual({"id": "1", "payload": "test payload",
+                          "metadata": {"timestamp": 1, "offset": 2, "topic": "testTopic"}}, serialized)
+
+    def test_monotonic_ids(self):
+        generator = MonotonicIdGenerator()
+        ids = [generator() for _ in range(1000)]
+
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(ids, sorted(ids))
+
+    def test_set_id_generator(self):
+        set_id_generator(lambda: "test_id")
+
+        self.assertEqual("test_id", Event.for_payload("test payload").id)
+
+
+if __name__ == '__main__':
+    unittest.main()
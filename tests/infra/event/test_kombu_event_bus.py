@@ -1,18 +1,32 @@
 from types import SimpleNamespace
 
+import numpy as np
+
+from kombu import Exchange, Producer
+from kombu.compression import get_encoder
+from kombu.message import Message
 from kombu.serialization import register
+from kombu.transport.virtual import Channel as VirtualChannel
 import json
 
 from unittest import mock
 
+import gc
 import logging
 import sys
+import tempfile
+import threading
+import time
 import unittest
+from queue import Full
 
 from cltl.combot.infra.config import ConfigurationManager
-from cltl.combot.infra.event.api import Event, EventMetadata
-from cltl.combot.infra.event.kombu import KombuEventBus
-from cltl.combot.test.util import await_predicate
+from cltl.combot.infra.event.api import Event, EventMetadata, TopicError
+from cltl.combot.infra.event.kombu import KombuEventBus, register_serializers, _Acknowledger, _available_codec, \
+    _Outbox, _OutboundMessage
+from cltl.combot.infra.event.serialization import object_vars, msgpack
+from cltl.combot.infra.topic_worker import RejectionStrategy
+from cltl.combot.test.util import await_predicate, TestConfiguration
 
 logger = logging.getLogger()
 logger.level = logging.DEBUG
@@ -21,7 +35,7 @@ logger.addHandler(stream_handler)
 
 
 register('cltl-json',
-         lambda x: json.dumps(x, default=vars),
+         lambda x: json.dumps(x, default=object_vars),
          lambda x: json.loads(x, object_hook=lambda d: SimpleNamespace(**d)),
          content_type='application/json',
          content_encoding='utf-8')
@@ -35,13 +49,13 @@ class KombuEventBusTestCase(unittest.TestCase):
         return str(KombuEventBusTestCase.counter)
 
     def setUp(self):
-        config_manager = mock.create_autospec(ConfigurationManager)
-        config_manager.get_config.return_value = {
+        self.config_manager = config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.return_value = TestConfiguration({
             "server": "memory:///",
             "exchange": "cltl.combot",
             "type": "direct",
             "compression": "bzip2",
-        }
+        })
 
         self.event_bus = KombuEventBus('cltl-json', config_manager)
         self.topic = "test topic - " + self.get_id()
@@ -49,6 +63,7 @@ class KombuEventBusTestCase(unittest.TestCase):
     def tearDown(self) -> None:
         for topic in self.event_bus.topics:
             self.event_bus.unsubscribe(topic)
+        self.event_bus.stop()
 
     def test_publish(self):
         event = Event.for_payload("test payload - " + self.get_id())
@@ -140,6 +155,703 @@ class KombuEventBusTestCase(unittest.TestCase):
         self.assertEqual(len(actual_events), 1)
         self.assertEqual(actual_events[0], event)
 
+    def test_publish_batch(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        events = [Event.for_payload("test payload - " + self.get_id()) for _ in range(3)]
+
+        self.event_bus.subscribe(self.topic, handler)
+        self.event_bus.publish_batch(self.topic, events)
+
+        await_predicate(lambda: len(actual_events) > 2, "events received")
+
+        self.assertEqual(events, actual_events)
+
+    def test_exchange_declared_once(self):
+        with mock.patch.object(Exchange, "declare", autospec=True) as declare:
+            for _ in range(3):
+                self.event_bus.publish(self.topic, Event.for_payload("test payload - " + self.get_id()))
+
+        self.assertEqual(1, declare.call_count)
+
+    def test_publishers_released_with_thread(self):
+        publishers = len(self.event_bus._publishers)
+
+        threads = [threading.Thread(target=self.event_bus.publish,
+                                    args=(self.topic, Event.for_payload("test payload - " + self.get_id())))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        gc.collect()
+
+        self.assertEqual(publishers, len(self.event_bus._publishers))
+
+    def test_publish_latency(self):
+        for _ in range(3):
+            self.event_bus.publish(self.topic, Event.for_payload("test payload - " + self.get_id()))
+
+        self.assertEqual(3, self.event_bus.publish_latency.count)
+        self.assertEqual({50, 99}, set(self.event_bus.publish_latency.percentiles((50, 99)).keys()))
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack_serializer(self):
+        register_serializers()
+        self.event_bus = KombuEventBus('cltl-msgpack', self.config_manager)
+
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        event = Event.for_payload({"image": np.ones((2, 2), dtype=np.uint8)})
+
+        self.event_bus.subscribe(self.topic, handler)
+        self.event_bus.publish(self.topic, event)
+
+        await_predicate(lambda: len(actual_events) > 0, "event received")
+
+        self.assertEqual(event, actual_events[0])
+        np.testing.assert_array_equal(event.payload["image"], actual_events[0].payload.image)
+
+    def test_subscribe_pattern_requires_topic_exchange(self):
+        if self.event_bus.exchange.type == "topic":
+            self.skipTest("Exchange supports patterns")
+
+        with self.assertRaises(TopicError):
+            self.event_bus.subscribe("test.*", lambda ev: None)
+
+
+class SharedConsumerKombuEventBusTestCase(KombuEventBusTestCase):
+    def setUp(self):
+        self.config_manager = config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.return_value = TestConfiguration({
+            "server": "memory:///",
+            "exchange": "cltl.combot",
+            "type": "direct",
+            "compression": "bzip2",
+            "shared_consumer": True,
+            "prefetch_count": 10,
+        })
+
+        self.event_bus = KombuEventBus('cltl-json', config_manager)
+        self.topic = "test topic - " + self.get_id()
+
+    def test_single_consumer_thread(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        topics = [self.topic + f" - {i}" for i in range(5)]
+        for topic in topics:
+            self.event_bus.subscribe(topic, handler)
+
+        consumer_threads = [t for t in threading.enumerate() if t.name.startswith("EventBusConsumer")]
+        self.assertEqual(1, len(consumer_threads))
+
+        for topic in topics:
+            self.event_bus.publish(topic, Event.for_payload(topic))
+
+        await_predicate(lambda: len(actual_events) == len(topics), "events received")
+        self.assertEqual(set(topics), {ev.payload for ev in actual_events})
+        self.assertEqual(set(topics), {ev.metadata.topic for ev in actual_events})
+
+    def test_unsubscribe_one_of_multiple_topics(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        topic_one = self.topic + " - One"
+        topic_two = self.topic + " - Two"
+        self.event_bus.subscribe(topic_one, handler)
+        self.event_bus.subscribe(topic_two, handler)
+
+        self.event_bus.unsubscribe(topic_one)
+        self.event_bus.publish(topic_one, Event.for_payload("one"))
+        self.event_bus.publish(topic_two, Event.for_payload("two"))
+
+        await_predicate(lambda: len(actual_events) > 0, "event received")
+        try:
+            await_predicate(lambda: len(actual_events) > 1, "event received", repeat=10)
+        except:
+            pass
+
+        self.assertEqual(["two"], [ev.payload for ev in actual_events])
+
+
+class TopicExchangeKombuEventBusTestCase(KombuEventBusTestCase):
+    def setUp(self):
+        self.config_manager = config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.return_value = TestConfiguration(self.config())
+
+        self.event_bus = KombuEventBus('cltl-json', config_manager)
+        self.topic = "test topic - " + self.get_id()
+
+    def config(self):
+        return {
+            "server": "memory:///",
+            "exchange": "cltl.combot.topic",
+            "type": "topic",
+        }
+
+    def test_subscribe_pattern(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        prefix = "test.pattern" + self.get_id()
+        self.event_bus.subscribe(prefix + ".*", handler)
+        self.addCleanup(self.event_bus.unsubscribe, prefix + ".*")
+
+        self.event_bus.publish(prefix + ".one", Event.for_payload("one"))
+        self.event_bus.publish(prefix + ".one.two", Event.for_payload("one.two"))
+        self.event_bus.publish("other." + prefix, Event.for_payload("other"))
+        self.event_bus.publish(prefix + ".two", Event.for_payload("two"))
+
+        await_predicate(lambda: len(actual_events) > 1, "events received")
+        try:
+            await_predicate(lambda: len(actual_events) > 2, "event received", repeat=10)
+        except:
+            pass
+
+        self.assertEqual(["one", "two"], [ev.payload for ev in actual_events])
+        self.assertEqual([prefix + ".one", prefix + ".two"], [ev.metadata.topic for ev in actual_events])
+        self.assertNotIn(prefix + ".*", self.event_bus.topics)
+
+    def test_subscribe_pattern_and_topic(self):
+        pattern_events = []
+        topic_events = []
+
+        prefix = "test.pattern" + self.get_id()
+        self.event_bus.subscribe(prefix + ".#", lambda ev: pattern_events.append(ev))
+        self.addCleanup(self.event_bus.unsubscribe, prefix + ".#")
+        self.event_bus.subscribe(prefix + ".one", lambda ev: topic_events.append(ev))
+
+        self.event_bus.publish(prefix + ".one", Event.for_payload("one"))
+        self.event_bus.publish(prefix + ".two", Event.for_payload("two"))
+
+        await_predicate(lambda: len(pattern_events) > 1 and topic_events, "events received")
+
+        self.assertEqual(["one", "two"], [ev.payload for ev in pattern_events])
+        self.assertEqual(["one"], [ev.payload for ev in topic_events])
+
+
+class SharedConsumerTopicExchangeKombuEventBusTestCase(TopicExchangeKombuEventBusTestCase):
+    def config(self):
+        return dict(super().config(), shared_consumer=True)
+
+
+class HandlerWorkersTopicExchangeKombuEventBusTestCase(TopicExchangeKombuEventBusTestCase):
+    def config(self):
+        return dict(super().config(), handler_workers=2)
+
+
+class AcknowledgementKombuEventBusTestCase(KombuEventBusTestCase):
+    def setUp(self):
+        self.config_manager = config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.return_value = TestConfiguration({
+            "server": "memory:///",
+            "exchange": "cltl.combot",
+            "type": "direct",
+            "compression": "bzip2",
+            "prefetch_count": 4,
+            "ack_batch_size": 3,
+            "ack_interval": 0.05,
+            "no_ack_topics": ["no ack topic"],
+        })
+
+        self.event_bus = KombuEventBus('cltl-json', config_manager)
+        self.topic = "test topic - " + self.get_id()
+
+    def test_batched_acknowledgement_exceeding_prefetch(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        self.event_bus.subscribe(self.topic, handler)
+        self.event_bus.publish_batch(self.topic, [Event.for_payload(i) for i in range(20)])
+
+        await_predicate(lambda: len(actual_events) == 20, "events received")
+        self.assertEqual(list(range(20)), [ev.payload for ev in actual_events])
+
+    def test_incomplete_batch_acknowledged_after_interval(self):
+        received = []
+        acknowledged = []
+        ack = Message.ack
+
+        def record_ack(message, *args, **kwargs):
+            acknowledged.append(time.monotonic())
+            return ack(message, *args, **kwargs)
+
+        with mock.patch.object(Message, "ack", record_ack):
+            self.event_bus.subscribe(self.topic, lambda ev: received.append(time.monotonic()))
+            self.event_bus.publish(self.topic, Event.for_payload(1))
+
+            await_predicate(lambda: len(acknowledged) == 1, "event acknowledged")
+
+        self.assertLess(acknowledged[0] - received[0], 0.5)
+
+    def test_no_ack_topic(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        self.event_bus.subscribe("no ack topic", handler)
+        self.event_bus.publish_batch("no ack topic", [Event.for_payload(i) for i in range(20)])
+
+        await_predicate(lambda: len(actual_events) == 20, "events received")
+        self.assertEqual(list(range(20)), [ev.payload for ev in actual_events])
+
+    def test_ack_batch_size_exceeds_prefetch(self):
+        self.config_manager.get_config.return_value = TestConfiguration({
+            "server": "memory:///",
+            "exchange": "cltl.combot",
+            "type": "direct",
+            "compression": "bzip2",
+            "prefetch_count": 4,
+            "ack_batch_size": 5,
+        })
+
+        with self.assertRaises(ValueError):
+            KombuEventBus('cltl-json', self.config_manager)
+
+
+class HandlerWorkersKombuEventBusTestCase(KombuEventBusTestCase):
+    def setUp(self):
+        self.config_manager = config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.return_value = TestConfiguration({
+            "server": "memory:///",
+            "exchange": "cltl.combot",
+            "type": "direct",
+            "compression": "bzip2",
+            "shared_consumer": True,
+            "handler_workers": 2,
+            "handler_queue_size": 4,
+        })
+
+        self.event_bus = KombuEventBus('cltl-json', config_manager)
+        self.topic = "test topic - " + self.get_id()
+
+    def test_slow_handler_does_not_block_other_topics(self):
+        release = threading.Event()
+        slow_events = []
+        fast_events = []
+
+        def slow_handler(ev):
+            release.wait()
+            slow_events.append(ev)
+
+        def fast_handler(ev):
+            fast_events.append(ev)
+
+        self.event_bus.subscribe(self.topic + " - slow", slow_handler)
+        self.event_bus.subscribe(self.topic + " - fast", fast_handler)
+
+        self.event_bus.publish(self.topic + " - slow", Event.for_payload("slow"))
+        self.event_bus.publish_batch(self.topic + " - fast", [Event.for_payload(i) for i in range(10)])
+
+        await_predicate(lambda: len(fast_events) == 10, "fast events received")
+        self.assertEqual(0, len(slow_events))
+        self.assertEqual(list(range(10)), [ev.payload for ev in fast_events])
+
+        release.set()
+        await_predicate(lambda: len(slow_events) == 1, "slow event received")
+
+    def test_full_topic_queue_does_not_block_other_topics(self):
+        release = threading.Event()
+        slow_events = []
+        fast_events = []
+
+        def slow_handler(ev):
+            release.wait()
+            slow_events.append(ev)
+
+        def fast_handler(ev):
+            fast_events.append(ev)
+
+        self.event_bus.subscribe(self.topic + " - slow", slow_handler)
+        self.event_bus.subscribe(self.topic + " - fast", fast_handler)
+
+        # Exceeds the handler queue size of the slow topic
+        self.event_bus.publish_batch(self.topic + " - slow", [Event.for_payload(i) for i in range(10)])
+        self.event_bus.publish_batch(self.topic + " - fast", [Event.for_payload(i) for i in range(10)])
+
+        await_predicate(lambda: len(fast_events) == 10, "fast events received")
+        self.assertEqual(0, len(slow_events))
+        self.assertEqual(list(range(10)), [ev.payload for ev in fast_events])
+
+        release.set()
+        await_predicate(lambda: len(slow_events) == 10, "slow events received")
+        self.assertEqual(list(range(10)), [ev.payload for ev in slow_events])
+
+    def test_topic_order_preserved(self):
+        actual_events = []
+
+        def handler(ev):
+            time.sleep(0.001)
+            actual_events.append(ev)
+
+        self.event_bus.subscribe(self.topic, handler)
+        self.event_bus.publish_batch(self.topic, [Event.for_payload(i) for i in range(50)])
+
+        await_predicate(lambda: len(actual_events) == 50, "events received")
+        self.assertEqual(list(range(50)), [ev.payload for ev in actual_events])
+
+
+class CompressionKombuEventBusTestCase(unittest.TestCase):
+    def setUp(self):
+        configs = {
+            "cltl.event.kombu": TestConfiguration({
+                "server": "memory:///",
+                "exchange": "cltl.combot",
+                "type": "direct",
+                "compression": "zlib",
+                "compression_threshold": 1024,
+                "compression_topics": ["uncompressed topic", "always compressed topic"],
+            }),
+            "cltl.event.kombu:uncompressed topic": TestConfiguration({"compression": "none"}),
+            "cltl.event.kombu:always compressed topic": TestConfiguration({"compression": "bzip2",
+                                                                           "compression_threshold": 0}),
+        }
+        config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.side_effect = lambda name, callback=None: configs[name]
+
+        self.event_bus = KombuEventBus('cltl-json', config_manager)
+
+    def tearDown(self) -> None:
+        for topic in self.event_bus.topics:
+            self.event_bus.unsubscribe(topic)
+        self.event_bus.stop()
+
+    def test_compression_threshold(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        small = Event.for_payload("small")
+        large = Event.for_payload("large" * 1000)
+
+        self.event_bus.subscribe("compressed topic", handler)
+        self.event_bus.publish("compressed topic", small)
+        self.event_bus.publish("compressed topic", large)
+
+        await_predicate(lambda: len(actual_events) == 2, "events received")
+        self.assertEqual([small, large], actual_events)
+
+        stats = self.event_bus.compression_stats.stats()["compressed topic"]
+        self.assertEqual(2, stats.messages)
+        self.assertEqual(1, stats.compressed)
+        self.assertGreater(stats.bytes_saved, 4000)
+
+    def test_topic_compression(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        large = Event.for_payload("large" * 1000)
+
+        self.event_bus.subscribe("uncompressed topic", handler)
+        self.event_bus.subscribe("always compressed topic", handler)
+        self.event_bus.publish("uncompressed topic", large)
+        self.event_bus.publish("always compressed topic", Event.for_payload("small"))
+
+        await_predicate(lambda: len(actual_events) == 2, "events received")
+
+        stats = self.event_bus.compression_stats.stats()
+        self.assertEqual(0, stats["uncompressed topic"].compressed)
+        self.assertEqual(0, stats["uncompressed topic"].bytes_saved)
+        self.assertEqual(1, stats["always compressed topic"].compressed)
+
+    def test_auto_codec(self):
+        self.assertIn(_available_codec(), ("lz4", "zstd", "zlib"))
+        get_encoder(_available_codec())
+
+    def test_auto_compression(self):
+        config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.return_value = TestConfiguration({
+            "server": "memory:///",
+            "exchange": "cltl.combot",
+            "type": "direct",
+            "compression": "auto",
+        })
+        event_bus = KombuEventBus('cltl-json', config_manager)
+        self.assertEqual("zlib", event_bus._compression.codec)
+        event_bus.stop()
+
+        config_manager.get_config.return_value = TestConfiguration({
+            "server": "memory:///",
+            "exchange": "cltl.combot",
+            "type": "direct",
+            "compression": "auto",
+            "compression_codecs": ["unknown codec", "bzip2"],
+        })
+        event_bus = KombuEventBus('cltl-json', config_manager)
+        self.assertEqual("bzip2", event_bus._compression.codec)
+        event_bus.stop()
+
+    def test_auto_codec_from_configured_codecs(self):
+        self.assertEqual("zlib", _available_codec())
+        self.assertEqual("bzip2", _available_codec(["bzip2", "zlib"]))
+        self.assertEqual("zlib", _available_codec(["unknown codec"]))
+
+
+class OutboxKombuEventBusTestCase(KombuEventBusTestCase):
+    def setUp(self):
+        self.config_manager = config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.return_value = TestConfiguration(self.config())
+
+        self.event_bus = KombuEventBus('cltl-json', config_manager)
+        self.topic = "test topic - " + self.get_id()
+
+        self.broker_down = threading.Event()
+        publish = Producer.publish
+
+        def stand_in_publish(producer, *args, **kwargs):
+            if self.broker_down.is_set():
+                raise ConnectionRefusedError("Broker is down")
+            return publish(producer, *args, **kwargs)
+
+        patcher = mock.patch.object(Producer, "publish", stand_in_publish)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def config(self):
+        return {
+            "server": "memory:///",
+            "exchange": "cltl.combot",
+            "type": "direct",
+            "compression": "bzip2",
+            "outbox_size": 5,
+        }
+
+    def test_exchange_declared_once(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        self.event_bus.subscribe(self.topic, handler)
+
+        with mock.patch.object(Exchange, "declare", autospec=True) as declare:
+            for _ in range(3):
+                self.event_bus.publish(self.topic, Event.for_payload("test payload - " + self.get_id()))
+            await_predicate(lambda: len(actual_events) == 3, "events received")
+
+        self.assertEqual(1, declare.call_count)
+
+    def test_publish_while_broker_unavailable(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        self.event_bus.subscribe(self.topic, handler)
+
+        self.broker_down.set()
+        for i in range(3):
+            self.event_bus.publish(self.topic, Event.for_payload(i))
+        self.assertLess(self.event_bus.publish_latency.percentiles((100,))[100], 100)
+
+        time.sleep(0.2)
+        self.assertEqual(0, len(actual_events))
+
+        self.broker_down.clear()
+        await_predicate(lambda: len(actual_events) == 3, "events received")
+        self.assertEqual([0, 1, 2], [ev.payload for ev in actual_events])
+        self.assertEqual(0, self.event_bus.outbox_dropped)
+
+    def test_outbox_full(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        self.event_bus.subscribe(self.topic, handler)
+
+        self.broker_down.set()
+        for i in range(20):
+            self.event_bus.publish(self.topic, Event.for_payload(i))
+
+        self.assertIn(self.event_bus.outbox_dropped, (14, 15))
+
+        self.broker_down.clear()
+        await_predicate(lambda: len(actual_events) == 20 - self.event_bus.outbox_dropped, "events received")
+        payloads = [ev.payload for ev in actual_events]
+        self.assertEqual(list(range(5)), payloads[:5])
+        self.assertEqual(sorted(payloads), payloads)
+
+
+class SpillOutboxKombuEventBusTestCase(OutboxKombuEventBusTestCase):
+    def config(self):
+        self.spill_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spill_dir.cleanup)
+
+        return dict(super().config(), outbox_spill_dir=self.spill_dir.name)
+
+    def test_outbox_full(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        self.event_bus.subscribe(self.topic, handler)
+
+        self.broker_down.set()
+        for i in range(20):
+            self.event_bus.publish(self.topic, Event.for_payload(i))
+
+        self.assertEqual(0, self.event_bus.outbox_dropped)
+
+        self.broker_down.clear()
+        await_predicate(lambda: len(actual_events) == 20, "events received")
+        self.assertEqual(list(range(20)), [ev.payload for ev in actual_events])
+
+
+class OutboxTestCase(unittest.TestCase):
+    def message(self, body):
+        return _OutboundMessage("topic", body, "application/data", "binary", {})
+
+    def test_overwrite(self):
+        outbox = _Outbox(2, RejectionStrategy.OVERWRITE)
+        for i in range(4):
+            outbox.put(self.message(bytes([i])))
+
+        self.assertEqual(2, outbox.dropped)
+        self.assertEqual([b"\x02", b"\x03"], [outbox.get(0).body for _ in range(2)])
+        self.assertIsNone(outbox.get(0))
+
+    def test_exception(self):
+        outbox = _Outbox(1, RejectionStrategy.EXCEPTION)
+        outbox.put(self.message(b"1"))
+
+        with self.assertRaises(Full):
+            outbox.put(self.message(b"2"))
+
+    def test_spill_preserves_order(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            outbox = _Outbox(2, RejectionStrategy.DROP, spill_dir)
+            for i in range(5):
+                outbox.put(self.message(bytes([i])))
+            first = outbox.get(0)
+            outbox.put(self.message(bytes([5])))
+
+            self.assertEqual(5, len(outbox))
+            self.assertEqual([bytes([i]) for i in range(6)], [first.body] + [outbox.get(0).body for _ in range(5)])
+            self.assertEqual(0, len(outbox))
+            outbox.close()
+
+
+class SharedMemoryKombuEventBusTestCase(unittest.TestCase):
+    def setUp(self):
+        config_manager = mock.create_autospec(ConfigurationManager)
+        config_manager.get_config.return_value = TestConfiguration({
+            "server": "memory:///",
+            "exchange": "cltl.combot",
+            "type": "direct",
+            "shared_memory_size": 1024 * 1024,
+            "shared_memory_threshold": 1024,
+        })
+        register_serializers()
+
+        self.event_bus = KombuEventBus('cltl-json', config_manager)
+
+    def tearDown(self) -> None:
+        for topic in self.event_bus.topics:
+            self.event_bus.unsubscribe(topic)
+        self.event_bus.stop()
+
+    def test_large_array_in_shared_memory(self):
+        actual_events = []
+
+        def handler(ev):
+            actual_events.append(ev)
+
+        image = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+
+        self.event_bus.subscribe("image topic", handler)
+        self.event_bus.publish("image topic", Event.for_payload({"image": image}))
+
+        await_predicate(lambda: len(actual_events) == 1, "event received")
+        np.testing.assert_array_equal(image, actual_events[0].payload.image)
+        self.assertLess(self.event_bus.compression_stats.stats()["image topic"].bytes_in, 1024)
+
+
+class AcknowledgerTestCase(unittest.TestCase):
+    def test_single_acknowledgements(self):
+        acknowledger = _Acknowledger()
+        message = mock.MagicMock()
+
+        acknowledger.ack(message)
+
+        message.ack.assert_called_once_with()
+
+    def test_batch_acknowledged_with_multiple(self):
+        acknowledger = _Acknowledger(batch_size=3, interval=60)
+        messages = [mock.MagicMock() for _ in range(3)]
+
+        for message in messages[:2]:
+            acknowledger.ack(message)
+        acknowledger.on_iteration()
+        for message in messages[:2]:
+            message.ack.assert_not_called()
+
+        acknowledger.ack(messages[2])
+
+        messages[0].ack.assert_not_called()
+        messages[1].ack.assert_not_called()
+        messages[2].ack.assert_called_once_with(multiple=True)
+
+    def test_batch_acknowledged_after_interval(self):
+        acknowledger = _Acknowledger(batch_size=3, interval=0.01)
+        message = mock.MagicMock()
+
+        acknowledger.ack(message)
+        time.sleep(0.02)
+        acknowledger.on_iteration()
+
+        message.ack.assert_called_once_with(multiple=True)
+
+    def test_batch_on_virtual_channel_acknowledged_individually(self):
+        acknowledger = _Acknowledger(batch_size=2)
+        messages = [mock.MagicMock(channel=mock.create_autospec(VirtualChannel, instance=True)) for _ in range(2)]
+
+        for message in messages:
+            acknowledger.ack(message)
+
+        for message in messages:
+            message.ack.assert_called_once_with()
+
+    def test_batch_with_held_messages_acknowledged_individually(self):
+        acknowledger = _Acknowledger(batch_size=2)
+        messages = [mock.MagicMock() for _ in range(2)]
+
+        acknowledger.held = 1
+        for message in messages:
+            acknowledger.ack(message)
+
+        for message in messages:
+            message.ack.assert_called_once_with()
+
+    def test_reset_discards_pending(self):
+        acknowledger = _Acknowledger(batch_size=2)
+        message = mock.MagicMock()
+
+        acknowledger.ack(message)
+        acknowledger.reset()
+        acknowledger.flush()
+
+        message.ack.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,193 @@
+import os
+import unittest
+
+import numpy as np
+
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.multiprocess import MultiprocessEventBus
+from cltl.combot.infra.topic_worker import TopicWorker
+from cltl.combot.test.util import await_predicate
+
+
+def _echo(event_bus, in_topic, out_topic):
+    def handler(event):
+        event_bus.publish(out_topic, Event.for_payload((event.payload, os.getpid())))
+
+    event_bus.subscribe(in_topic, handler)
+
+    return []
+
+
+def _echo_worker(event_bus, in_topic, out_topic):
+    def process(event):
+        event_bus.publish(out_topic, Event.for_payload((event.payload, os.getpid())))
+
+    return [TopicWorker(in_topic, event_bus, buffer_size=16, processor=process)]
+
+
+def _array_sum(event_bus):
+    def handler(event):
+        event_bus.publish("sum", Event.for_payload(int(event.payload.sum())))
+
+    event_bus.subscribe("array", handler)
+
+    return []
+
+
+def _publish_arrays(event_bus, count, size):
+    def handler(event):
+        for _ in range(count):
+            event_bus.publish("in", Event.for_payload(np.ones(size, dtype=np.uint8)))
+
+    event_bus.subscribe("trigger", handler)
+
+    return []
+
+
+def _subscribe_on_event(event_bus):
+    def late_handler(event):
+        event_bus.publish("out", Event.for_payload(event.payload))
+
+    def handler(event):
+        event_bus.subscribe("late", late_handler)
+        event_bus.publish("subscribed", Event.for_payload(None))
+
+    event_bus.subscribe("subscribe", handler)
+
+    return []
+
+
+def _fail(event_bus):
+    raise ValueError("Failed to create components")
+
+
+class MultiprocessEventBusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.event_bus = MultiprocessEventBus()
+
+    def tearDown(self):
+        self.event_bus.stop()
+
+    def test_publish_to_worker_process(self):
+        actual_events = []
+
+        self.event_bus.subscribe("out", actual_events.append)
+        self.event_bus.host(_echo, "in", "out")
+
+        for i in range(10):
+            self.event_bus.publish("in", Event.for_payload(i))
+
+        await_predicate(lambda: len(actual_events) == 10, "events received")
+        self.assertEqual(list(range(10)), [ev.payload[0] for ev in actual_events])
+        self.assertNotEqual(os.getpid(), actual_events[0].payload[1])
+        self.assertEqual("out", actual_events[0].metadata.topic)
+
+    def test_topic_worker_in_worker_process(self):
+        actual_events = []
+
+        self.event_bus.subscribe("out", actual_events.append)
+        self.event_bus.host(_echo_worker, "in", "out")
+
+        self.event_bus.publish_batch("in", [Event.for_payload(i) for i in range(10)])
+
+        await_predicate(lambda: len(actual_events) == 10, "events received")
+        self.assertEqual(list(range(10)), [ev.payload[0] for ev in actual_events])
+
+    def test_route_between_worker_processes(self):
+        actual_events = []
+
+        self.event_bus.subscribe("out", actual_events.append)
+        self.event_bus.host(_echo, "in", "mid")
+        self.event_bus.host(_echo_worker, "mid", "out")
+
+        self.event_bus.publish("in", Event.for_payload("payload"))
+
+        await_predicate(lambda: len(actual_events) == 1, "event received")
+        (payload, first_pid), second_pid = actual_events[0].payload
+        self.assertEqual("payload", payload)
+        self.assertNotEqual(first_pid, second_pid)
+
+    def test_pattern_subscriptions(self):
+        actual_events = []
+
+        self.event_bus.subscribe("out.*", actual_events.append)
+        self.event_bus.host(_echo, "in.#", "out.worker")
+
+        self.event_bus.publish("in.one", Event.for_payload(1))
+        self.event_bus.publish("other", Event.for_payload(2))
+        self.event_bus.publish("in.one.two", Event.for_payload(3))
+
+        await_predicate(lambda: len(actual_events) == 2, "events received")
+        self.assertEqual([1, 3], [ev.payload[0] for ev in actual_events])
+        self.assertEqual("out.worker", actual_events[0].metadata.topic)
+
+    def test_unsubscribe(self):
+        actual_events = []
+
+        self.event_bus.subscribe("out", actual_events.append)
+        self.event_bus.host(_echo, "in", "out")
+
+        self.event_bus.publish("in", Event.for_payload(1))
+        await_predicate(lambda: len(actual_events) == 1, "event received")
+
+        self.event_bus.unsubscribe("out", actual_events.append)
+        self.event_bus.publish("in", Event.for_payload(2))
+        self.event_bus.publish("out", Event.for_payload(3))
+
+        try:
+            await_predicate(lambda: len(actual_events) > 1, "event received", repeat=20)
+        except:
+            pass
+
+        self.assertEqual(1, len(actual_events))
+
+    def test_round_trip_larger_than_pipe_buffer(self):
+        actual_events = []
+
+        self.event_bus.subscribe("out", actual_events.append)
+        self.event_bus.host(_echo, "in", "out")
+        self.event_bus.host(_publish_arrays, 20, 4 * 1024 * 1024)
+
+        self.event_bus.publish("trigger", Event.for_payload(None))
+
+        await_predicate(lambda: len(actual_events) == 20, "events received")
+        self.assertEqual(4 * 1024 * 1024, actual_events[0].payload[0].sum())
+
+    def test_subscribe_in_handler(self):
+        subscribed = []
+        actual_events = []
+
+        self.event_bus.subscribe("subscribed", subscribed.append)
+        self.event_bus.subscribe("out", actual_events.append)
+        self.event_bus.host(_subscribe_on_event)
+
+        self.event_bus.publish("subscribe", Event.for_payload(None))
+        await_predicate(lambda: len(subscribed) == 1, "subscribed")
+
+        self.event_bus.publish("late", Event.for_payload("late"))
+        await_predicate(lambda: len(actual_events) == 1, "event received")
+        self.assertEqual("late", actual_events[0].payload)
+
+    def test_failed_factory(self):
+        with self.assertRaises(RuntimeError):
+            self.event_bus.host(_fail)
+
+
+class SharedMemoryMultiprocessEventBusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.event_bus = MultiprocessEventBus(shared_memory_size=1024 * 1024, shared_memory_threshold=1024)
+
+    def tearDown(self):
+        self.event_bus.stop()
+
+    def test_array_payload(self):
+        actual_events = []
+
+        self.event_bus.subscribe("sum", actual_events.append)
+        self.event_bus.host(_array_sum)
+
+        array = np.ones((100, 100), dtype=np.int64)
+        self.event_bus.publish("array", Event.for_payload(array))
+
+        await_predicate(lambda: len(actual_events) == 1, "event received")
+        self.assertEqual(10000, actual_events[0].payload)
@@ -0,0 +1,119 @@
+import unittest
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import numpy as np
+from emissor.representation.scenario import TextSignal, Modality
+
+from cltl.combot.event.emissor import TextSignalEvent
+from cltl.combot.infra.event.api import Event, EventMetadata
+from cltl.combot.infra.event.serialization import msgpack, msgpack_dumps, msgpack_loads, serializers, \
+    get_serializer, pickle_dumps, pickle_loads, typed_json_dumps, typed_json_loads
+
+
+@dataclass
+class TestDataclass:
+    value: int
+
+
+class SerializerRegistryTestCase(unittest.TestCase):
+    def test_unknown_serializer(self):
+        with self.assertRaises(ValueError):
+            get_serializer("unknown")
+
+    def test_roundtrip(self):
+        event = Event("1", {"text": "test payload", "image": np.arange(6).reshape((2, 3)), "enum": Modality.TEXT},
+                      EventMetadata(1, 2, "testTopic"))
+
+        for serializer in serializers():
+            with self.subTest(serializer.name):
+                actual = serializer.loads(serializer.dumps(event))
+
+                self.assertEqual("1", actual.id)
+                self.assertEqual("testTopic", actual.metadata.topic)
+                payload = actual.payload if isinstance(actual.payload, dict) else vars(actual.payload)
+                self.assertEqual("test payload", payload["text"])
+                np.testing.assert_array_equal(event.payload["image"], payload["image"])
+
+
+class TypedSerializationTestCase(unittest.TestCase):
+    def test_emissor_event(self):
+        signal = TextSignal.for_scenario("scenario_id", 1, 2, "file", "Hello")
+        event = Event("1", TextSignalEvent.for_speaker(signal), EventMetadata(1, 2, "testTopic"))
+
+        for name in ["json-typed", "msgpack-typed"]:
+            if name == "msgpack-typed" and msgpack is None:
+                continue
+            with self.subTest(name):
+                serializer = get_serializer(name)
+                actual = serializer.loads(serializer.dumps(event))
+
+                self.assertIsInstance(actual, Event)
+                self.assertIsInstance(actual.metadata, EventMetadata)
+                self.assertEqual(event.metadata, actual.metadata)
+                self.assertIsInstance(actual.payload, TextSignalEvent)
+                self.assertIsInstance(actual.payload.signal, TextSignal)
+                self.assertEqual(Modality.TEXT, actual.payload.modality)
+                self.assertEqual(event.payload, actual.payload)
+
+    def test_plain_objects(self):
+        actual = typed_json_loads(typed_json_dumps({"dict": {"key": "value"}, "object": SimpleNamespace(key=1)}))
+
+        self.assertEqual({"dict": {"key": "value"}, "object": {"key": 1}}, actual)
+
+    def test_disallowed_type(self):
+        with self.assertRaises(ValueError):
+            typed_json_loads(typed_json_dumps(TestDataclass(1)))
+        with self.assertRaises(ValueError):
+            typed_json_loads('{"__type": "os:system", "value": 1}')
+
+
+class PickleSerializationTestCase(unittest.TestCase):
+    def test_out_of_band_buffers(self):
+        array = np.arange(24, dtype=np.float32).reshape((2, 3, 4))
+
+        actual = pickle_loads(pickle_dumps({"image": array, "other": np.ones(3)}))
+
+        np.testing.assert_array_equal(array, actual["image"])
+        np.testing.assert_array_equal(np.ones(3), actual["other"])
+        self.assertFalse(actual["image"].flags.owndata)
+
+
+@unittest.skipIf(msgpack is None, "msgpack is not installed")
+class MsgpackSerializationTestCase(unittest.TestCase):
+    def test_event(self):
+        event = Event("1", {"text": "test payload"}, EventMetadata(1, 2, "testTopic"))
+
+        actual = msgpack_loads(msgpack_dumps(event))
+
+        self.assertIsInstance(actual, SimpleNamespace)
+        self.assertEqual("1", actual.id)
+        self.assertEqual("test payload", actual.payload.text)
+        self.assertEqual("testTopic", actual.metadata.topic)
+
+    def test_ndarray(self):
+        array = np.arange(24, dtype=np.float32).reshape((2, 3, 4))
+
+        data = msgpack_dumps({"image": array})
+        actual = msgpack_loads(data).image
+
+        np.testing.assert_array_equal(array, actual)
+        self.assertEqual(array.dtype, actual.dtype)
+        # Decoded without copying the data
+        self.assertFalse(actual.flags.owndata)
+
+    def test_non_contiguous_ndarray(self):
+        array = np.arange(24, dtype=np.int16).reshape((4, 6))[:, ::2]
+
+        actual = msgpack_loads(msgpack_dumps({"image": array})).image
+
+        np.testing.assert_array_equal(array, actual)
+
+    def test_non_string_keys(self):
+        actual = msgpack_loads(msgpack_dumps({1: "one"}))
+
+        self.assertEqual({1: "one"}, actual)
+
+
+if __name__ == '__main__':
+    unittest.main()
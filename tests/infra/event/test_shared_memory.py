@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+import numpy as np
+
+from cltl.combot.infra.event.api import Event, EventMetadata
+from cltl.combot.infra.event.serialization import serializers
+from cltl.combot.infra.event.shared_memory import SharedArrayStore, SharedArrayExpiredError, share_arrays, resolve
+
+
+def _resolve_sum(handle, result):
+    result.put(int(resolve(handle).sum()))
+
+
+class SharedArrayStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.store = SharedArrayStore(size=4096, threshold=64, retention=0)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_roundtrip(self):
+        array = np.arange(100, dtype=np.float32).reshape((10, 10))
+
+        handle = self.store.put(array)
+
+        np.testing.assert_array_equal(array, resolve(handle))
+        self.assertEqual(array.dtype, resolve(handle).dtype)
+
+    def test_non_contiguous_array(self):
+        array = np.arange(100).reshape((10, 10))[:, ::2]
+
+        np.testing.assert_array_equal(array, resolve(self.store.put(array)))
+
+    def test_too_large(self):
+        self.assertIsNone(self.store.put(np.zeros(4096, dtype=np.uint8)))
+
+    def test_expired_after_overwrite(self):
+        handles = [self.store.put(np.full(1000, i, dtype=np.uint8)) for i in range(5)]
+
+        with self.assertRaises(SharedArrayExpiredError):
+            resolve(handles[0])
+        np.testing.assert_array_equal(np.full(1000, 4, dtype=np.uint8), resolve(handles[4]))
+
+    def test_wrap_around(self):
+        for i in range(20):
+            array = np.full(300 + 100 * (i % 7), i, dtype=np.uint8)
+            np.testing.assert_array_equal(array, resolve(self.store.put(array)))
+
+    def test_retention(self):
+        store = SharedArrayStore(size=4096, threshold=64, retention=0.2)
+        try:
+            handles = [store.put(np.full(1000, i, dtype=np.uint8)) for i in range(4)]
+
+            self.assertIsNone(handles[3])
+            time.sleep(0.2)
+            self.assertIsNotNone(store.put(np.zeros(1000, dtype=np.uint8)))
+        finally:
+            store.close()
+
+    def test_resolve_in_other_process(self):
+        handle = self.store.put(np.ones(100, dtype=np.int64))
+
+        result = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_resolve_sum, args=(handle, result))
+        process.start()
+        process.join()
+
+        self.assertEqual(100, result.get(timeout=1))
+
+
+class SharedArraySerializationTestCase(unittest.TestCase):
+    def test_serializers(self):
+        image = np.arange(1000, dtype=np.int64)
+        event = Event("1", {"image": image, "small": np.arange(2)}, EventMetadata(1, 2, "testTopic"))
+
+        with SharedArrayStore(size=1024 * 1024, threshold=1000) as store:
+            for serializer in serializers():
+                with self.subTest(serializer.name):
+                    with share_arrays(store):
+                        data = serializer.dumps(event)
+                    actual = serializer.loads(data)
+
+                    self.assertLess(len(data), image.nbytes)
+                    payload = actual.payload if isinstance(actual.payload, dict) else vars(actual.payload)
+                    np.testing.assert_array_equal(image, payload["image"])
+                    np.testing.assert_array_equal(np.arange(2), payload["small"])
+
+    def test_no_sharing_outside_context(self):
+        image = np.arange(1000, dtype=np.int64)
+
+        with SharedArrayStore(size=1024 * 1024, threshold=1000):
+            for serializer in serializers():
+                with self.subTest(serializer.name):
+                    self.assertGreater(len(serializer.dumps({"image": image})), image.nbytes)
+
+
+class UnavailableSharedMemoryTestCase(unittest.TestCase):
+    def test_import_without_shared_memory(self):
+        # Simulate Python < 3.8, where multiprocessing.shared_memory is not available
+        script = "\n".join([
+            "import sys",
+            "sys.modules['multiprocessing.shared_memory'] = None",
+            "import numpy as np",
+            "from cltl.combot.infra.event import shared_memory",
+            "from cltl.combot.infra.event.serialization import get_serializer",
+            "import cltl.combot.infra.event.kombu",
+            "import cltl.combot.infra.event_log",
+            "serializer = get_serializer('json')",
+            "assert serializer.loads(serializer.dumps(np.ones(8))).sum() == 8",
+            "try:",
+            "    shared_memory.SharedArrayStore(1024)",
+            "except RuntimeError:",
+            "    pass",
+            "else:",
+            "    raise AssertionError('SharedArrayStore created')",
+        ])
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+        result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True)
+
+        self.assertEqual(0, result.returncode, result.stderr)
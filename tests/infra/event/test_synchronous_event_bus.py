@@ -1,6 +1,6 @@
 import unittest
 
-from cltl.combot.infra.event.api import Event, EventMetadata
+from cltl.combot.infra.event.api import Event, EventMetadata, batch_handler
 from cltl.combot.infra.event.memory import SynchronousEventBus
 
 
@@ -41,6 +41,18 @@ class SynchronousEventBusTestCase(unittest.TestCase):
         self.assertEqual(actual_events[0], event)
         self.assertEqual(actual_events[1], event)
 
+    def test_multiple_subscribers_share_event(self):
+        actual_events = []
+        handler_one = lambda ev: actual_events.append(ev)
+        handler_two = lambda ev: actual_events.append(ev)
+
+        self.event_bus.subscribe("testTopic", handler_one)
+        self.event_bus.subscribe("testTopic", handler_two)
+        self.event_bus.publish("testTopic", Event.for_payload("test payload"))
+
+        self.assertIs(actual_events[0], actual_events[1])
+        self.assertEqual("testTopic", actual_events[0].metadata.topic)
+
     def test_multiple_topics(self):
         actual_events = []
         handler_one = lambda ev: actual_events.append(ev)
@@ -73,6 +85,121 @@ class SynchronousEventBusTestCase(unittest.TestCase):
         self.assertEqual(len(actual_events), 1)
         self.assertEqual(actual_events[0], event)
 
+    def test_unsubscribe_during_publish(self):
+        actual_events = []
+        handler_two = lambda ev: actual_events.append(ev)
+
+        def handler_one(ev):
+            if not actual_events:
+                self.event_bus.unsubscribe("testTopic", handler_two)
+            actual_events.append(ev)
+
+        event = Event.for_payload("test payload")
+
+        self.event_bus.subscribe("testTopic", handler_one)
+        self.event_bus.subscribe("testTopic", handler_two)
+        self.event_bus.publish("testTopic", event)
+        self.event_bus.publish("testTopic", event)
+
+        self.assertEqual(len(actual_events), 3)
+
+    def test_unsubscribe_unknown_handler(self):
+        self.event_bus.subscribe("testTopic", lambda ev: None)
+
+        with self.assertRaises(ValueError):
+            self.event_bus.unsubscribe("testTopic", lambda ev: None)
+
+    def test_publish_batch(self):
+        actual_events = []
+        handler = lambda ev: actual_events.append(ev)
+
+        events = [Event.for_payload(i) for i in range(3)]
+
+        self.event_bus.subscribe("testTopic", handler)
+        self.event_bus.publish_batch("testTopic", events)
+
+        self.assertEqual(actual_events, events)
+        self.assertTrue(all(ev.metadata.topic == "testTopic" for ev in actual_events))
+
+    def test_batch_handler(self):
+        actual_batches = []
+        handler = batch_handler(lambda events: actual_batches.append(events))
+
+        events = [Event.for_payload(i) for i in range(3)]
+
+        self.event_bus.subscribe("testTopic", handler)
+        self.event_bus.publish_batch("testTopic", events)
+        self.event_bus.publish("testTopic", events[0])
+
+        self.assertEqual(actual_batches, [events, events[:1]])
+
+        self.event_bus.unsubscribe("testTopic", handler)
+        self.event_bus.publish("testTopic", events[0])
+
+        self.assertEqual(2, len(actual_batches))
+
 
 if __name__ == '__main__':
     unittest.main()
+
+    def test_subscribe_pattern(self):
+        actual_events = []
+        handler = lambda ev: actual_events.append(ev)
+
+        self.event_bus.subscribe("cltl.*", handler)
+        self.event_bus.publish("cltl.one", Event.for_payload(1))
+        self.event_bus.publish("other.one", Event.for_payload(2))
+        self.event_bus.publish("cltl.two", Event.for_payload(3))
+        self.event_bus.publish("cltl.two.three", Event.for_payload(4))
+
+        self.assertEqual([1, 3], [ev.payload for ev in actual_events])
+        self.assertEqual(["cltl.one", "cltl.two"], [ev.metadata.topic for ev in actual_events])
+        self.assertNotIn("cltl.*", self.event_bus.topics)
+
+    def test_subscribe_pattern_for_later_topics(self):
+        actual_events = []
+
+        self.event_bus.subscribe("#", lambda ev: actual_events.append(ev))
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        self.event_bus.publish_batch("otherTopic", [Event.for_payload(2), Event.for_payload(3)])
+
+        self.assertEqual([1, 2, 3], [ev.payload for ev in actual_events])
+
+    def test_pattern_handlers_after_topic_handlers(self):
+        actual_handlers = []
+
+        self.event_bus.subscribe("#", lambda ev: actual_handlers.append("all"))
+        self.event_bus.subscribe("testTopic", lambda ev: actual_handlers.append("topic"))
+        self.event_bus.publish("testTopic", Event.for_payload("test payload"))
+
+        self.assertEqual(["topic", "all"], actual_handlers)
+
+    def test_pattern_batch_handler(self):
+        actual_batches = []
+        handler = batch_handler(lambda events: actual_batches.append(events))
+
+        events = [Event.for_payload(i) for i in range(3)]
+
+        self.event_bus.subscribe("test.#", handler)
+        self.event_bus.publish_batch("test.topic", events)
+        self.event_bus.publish("test", events[0])
+
+        self.assertEqual([events, events[:1]], actual_batches)
+
+    def test_unsubscribe_pattern(self):
+        actual_events = []
+        handler_one = lambda ev: actual_events.append(1)
+        handler_two = lambda ev: actual_events.append(2)
+
+        self.event_bus.subscribe("test.*", handler_one)
+        self.event_bus.subscribe("test.*", handler_two)
+        self.event_bus.publish("test.topic", Event.for_payload("test payload"))
+        self.event_bus.unsubscribe("test.*", handler_one)
+        self.event_bus.publish("test.topic", Event.for_payload("test payload"))
+        self.event_bus.unsubscribe("test.*")
+        self.event_bus.publish("test.topic", Event.for_payload("test payload"))
+
+        self.assertEqual([1, 2, 2], actual_events)
+
+        with self.assertRaises(ValueError):
+            self.event_bus.unsubscribe("test.*", handler_one)
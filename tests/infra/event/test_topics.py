@@ -0,0 +1,62 @@
+import unittest
+
+from cltl.combot.infra.event.topics import TopicMatcher, is_pattern
+
+
+class TopicsTestCase(unittest.TestCase):
+    def test_is_pattern(self):
+        self.assertTrue(is_pattern("#"))
+        self.assertTrue(is_pattern("cltl.*"))
+        self.assertTrue(is_pattern("cltl.#.in"))
+        self.assertFalse(is_pattern("cltl.topic"))
+        self.assertFalse(is_pattern("cltl.topic*"))
+
+    def test_match_exact(self):
+        matcher = TopicMatcher([("cltl.topic", 1)])
+
+        self.assertEqual((1,), matcher.match("cltl.topic"))
+        self.assertEqual((), matcher.match("cltl.topic.in"))
+        self.assertEqual((), matcher.match("cltl"))
+
+    def test_match_single_word(self):
+        matcher = TopicMatcher([("cltl.*", 1), ("*.in", 2)])
+
+        self.assertEqual((1,), matcher.match("cltl.topic"))
+        self.assertEqual((1, 2), matcher.match("cltl.in"))
+        self.assertEqual((), matcher.match("cltl.topic.in"))
+        self.assertEqual((), matcher.match("cltl"))
+
+    def test_match_multiple_words(self):
+        matcher = TopicMatcher([("cltl.#", 1), ("#.in", 2), ("cltl.#.in", 3)])
+
+        self.assertEqual((1,), matcher.match("cltl"))
+        self.assertEqual((1,), matcher.match("cltl.topic"))
+        self.assertEqual((1, 2, 3), matcher.match("cltl.in"))
+        self.assertEqual((1, 2, 3), matcher.match("cltl.topic.text.in"))
+        self.assertEqual((2,), matcher.match("in"))
+        self.assertEqual((), matcher.match("other.topic"))
+
+    def test_match_all(self):
+        matcher = TopicMatcher([("#", 1)])
+
+        self.assertEqual((1,), matcher.match("cltl"))
+        self.assertEqual((1,), matcher.match("cltl.topic.in"))
+        self.assertEqual((1,), matcher.match("test topic"))
+
+    def test_match_once_per_pattern(self):
+        matcher = TopicMatcher([("#.#", 1), ("#.*.#", 2)])
+
+        self.assertEqual((1, 2), matcher.match("a.b.c"))
+
+    def test_match_order_of_patterns(self):
+        matcher = TopicMatcher([("#", 1), ("cltl.topic", 2), ("cltl.*", 3), ("#", 4)])
+
+        self.assertEqual((1, 2, 3, 4), matcher.match("cltl.topic"))
+        # Cached result
+        self.assertEqual((1, 2, 3, 4), matcher.match("cltl.topic"))
+
+    def test_empty(self):
+        matcher = TopicMatcher()
+
+        self.assertEqual(0, len(matcher))
+        self.assertEqual((), matcher.match("cltl.topic"))
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+
+from cltl.combot.infra.aio_topic_worker import AsyncTopicWorker
+from cltl.combot.infra.event.aio import AsyncioEventBus
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.topic_worker import RejectionStrategy
+
+
+class AsyncTopicWorkerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.event_bus = AsyncioEventBus()
+
+    async def test_process(self):
+        processed = []
+
+        async def process(event):
+            processed.append(event.payload)
+
+        worker = AsyncTopicWorker("topic", self.event_bus, buffer_size=10, processor=process)
+        await worker.start()
+
+        for i in range(5):
+            await self.event_bus.publish("topic", Event.for_payload(i))
+        await worker.join()
+        await worker.stop()
+
+        self.assertEqual(list(range(5)), processed)
+
+    async def test_concurrency(self):
+        running = 0
+        max_running = 0
+
+        async def process(event):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        worker = AsyncTopicWorker("topic", self.event_bus, buffer_size=10, max_concurrency=3, processor=process)
+        await worker.start()
+
+        for i in range(10):
+            await self.event_bus.publish("topic", Event.for_payload(i))
+        await worker.join()
+        await worker.stop()
+
+        self.assertEqual(3, max_running)
+
+    async def test_overwrite(self):
+        processed = []
+        release = asyncio.Event()
+
+        async def process(event):
+            await release.wait()
+            processed.append(event.payload)
+
+        worker = AsyncTopicWorker("topic", self.event_bus, buffer_size=1, processor=process)
+        await worker.start()
+
+        await self.event_bus.publish("topic", Event.for_payload(0))
+        await asyncio.sleep(0)
+        for i in range(1, 4):
+            await self.event_bus.publish("topic", Event.for_payload(i))
+        release.set()
+        await worker.join()
+        await worker.stop()
+
+        self.assertEqual([0, 3], processed)
+
+    async def test_block(self):
+        processed = []
+
+        async def process(event):
+            await asyncio.sleep(0.01)
+            processed.append(event.payload)
+
+        worker = AsyncTopicWorker("topic", self.event_bus, buffer_size=1,
+                                  rejection_strategy=RejectionStrategy.BLOCK, processor=process)
+        await worker.start()
+
+        for i in range(5):
+            await self.event_bus.publish("topic", Event.for_payload(i))
+        await worker.join()
+        await worker.stop()
+
+        self.assertEqual(list(range(5)), processed)
+
+    async def test_exception(self):
+        release = asyncio.Event()
+
+        async def process(event):
+            await release.wait()
+
+        worker = AsyncTopicWorker("topic", self.event_bus, buffer_size=1,
+                                  rejection_strategy=RejectionStrategy.EXCEPTION, processor=process)
+        await worker.start()
+
+        await self.event_bus.publish("topic", Event.for_payload(0))
+        await asyncio.sleep(0)
+        await self.event_bus.publish("topic", Event.for_payload(1))
+        with self.assertRaises(asyncio.QueueFull):
+            await self.event_bus.publish("topic", Event.for_payload(2))
+
+        release.set()
+        await worker.stop()
+
+    async def test_stop_unsubscribes(self):
+        worker = AsyncTopicWorker("topic", self.event_bus, processor=lambda event: None)
+        await worker.start()
+        await worker.stop()
+
+        await self.event_bus.publish("topic", Event.for_payload(0))
+        self.assertTrue(worker._buffer.empty())
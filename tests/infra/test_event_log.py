@@ -0,0 +1,68 @@
+import glob
+import json
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.serialization import get_serializer, object_vars, msgpack
+from cltl.combot.infra.event_log import LogWriter
+
+
+class LogWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.log_dir.cleanup()
+
+    def test_json(self):
+        with LogWriter(self.log_dir.name, "json") as writer:
+            writer.put(Event("1", "test payload"))
+
+        log_file, = glob.glob(os.path.join(self.log_dir.name, "*.json"))
+        with open(log_file) as f:
+            content = f.read()
+
+        self.assertEqual("1", json.loads(content.replace(",\n]", "\n]"))[0]["id"])
+
+    def test_default_function(self):
+        with LogWriter(self.log_dir.name, object_vars) as writer:
+            writer.put(Event("1", "test payload"))
+
+        log_file, = glob.glob(os.path.join(self.log_dir.name, "*.json"))
+        with open(log_file) as f:
+            content = f.read()
+
+        self.assertEqual("1", json.loads(content.replace(",\n]", "\n]"))[0]["id"])
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_binary(self):
+        with LogWriter(self.log_dir.name, "msgpack") as writer:
+            writer.put(Event("1", np.zeros((2, 2))))
+            writer.put(Event("2", "test payload"))
+
+        log_file, = glob.glob(os.path.join(self.log_dir.name, "*.msgpack"))
+        with open(log_file, 'rb') as f:
+            content = f.read()
+
+        events = []
+        offset = 0
+        while offset < len(content):
+            length, = struct.unpack_from("!I", content, offset)
+            offset += 4
+            events.append(get_serializer("msgpack").loads(content[offset:offset + length]))
+            offset += length
+
+        self.assertEqual(["1", "2"], [event.id for event in events])
+
+    def test_unknown_serializer(self):
+        with self.assertRaises(ValueError):
+            LogWriter(self.log_dir.name, "unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import urllib.error
+import urllib.request
+
+from cltl.combot.infra.metrics import LatencyRecorder, CompressionRecorder, CompressionStats, Histogram, \
+    InMemoryMetrics, prometheus_text, PrometheusEndpoint
+
+
+class LatencyRecorderTest(unittest.TestCase):
+    def test_percentiles(self):
+        recorder = LatencyRecorder()
+        for value in range(1, 101):
+            recorder.record(value)
+
+        self.assertEqual(100, recorder.count)
+        self.assertEqual({50: 50, 90: 90, 99: 99}, recorder.percentiles((50, 90, 99)))
+
+    def test_percentiles_over_recent_samples(self):
+        recorder = LatencyRecorder(size=10)
+        for value in range(100):
+            recorder.record(value)
+
+        self.assertEqual(100, recorder.count)
+        self.assertEqual({100: 99, 10: 90}, recorder.percentiles((100, 10)))
+
+    def test_empty(self):
+        self.assertEqual({}, LatencyRecorder().percentiles())
+
+
+class CompressionRecorderTest(unittest.TestCase):
+    def test_record(self):
+        recorder = CompressionRecorder()
+        recorder.record("topic", 1000, 100, 0.5)
+        recorder.record("topic", 10)
+        recorder.record("other", 20)
+
+        stats = recorder.stats()
+
+        self.assertEqual(CompressionStats(2, 1, 1010, 110, 0.5), stats["topic"])
+        self.assertEqual(900, stats["topic"].bytes_saved)
+        self.assertEqual(CompressionStats(1, 0, 20, 20, 0.0), stats["other"])
+
+    def test_clear(self):
+        recorder = CompressionRecorder()
+        recorder.record("topic", 1000, 100, 0.5)
+        recorder.clear()
+
+        self.assertEqual({}, recorder.stats())
+
+
+class HistogramTest(unittest.TestCase):
+    def test_observe(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 20):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+
+        self.assertEqual((1, 10), snapshot.bounds)
+        self.assertEqual((2, 1, 1), snapshot.counts)
+        self.assertEqual(26.5, snapshot.sum)
+        self.assertEqual(4, snapshot.count)
+
+
+class InMemoryMetricsTest(unittest.TestCase):
+    def test_register(self):
+        metrics = InMemoryMetrics()
+        counter = metrics.counter("events_total", "Events", {"worker": "a"})
+        counter.inc()
+        counter.inc(2)
+        metrics.gauge("depth", "Depth", {"worker": "a"}, lambda: 5)
+
+        self.assertIs(counter, metrics.counter("events_total", "Events", {"worker": "a"}))
+        self.assertEqual(3, metrics.get("events_total", worker="a"))
+        self.assertEqual(5, metrics.get("depth", worker="a"))
+        self.assertIsNone(metrics.get("depth", worker="b"))
+
+        with self.assertRaises(ValueError):
+            metrics.histogram("events_total", "Events", {"worker": "a"})
+
+    def test_remove(self):
+        metrics = InMemoryMetrics()
+        metrics.counter("events_total", "Events", {"worker": "a"})
+        metrics.counter("events_total", "Events", {"worker": "b"})
+
+        metrics.remove({"worker": "a"})
+
+        self.assertEqual([{"worker": "b"}], [metric.labels for metric in metrics.collect()])
+
+    def test_prometheus_text(self):
+        metrics = InMemoryMetrics()
+        metrics.counter("events_total", "Processed events", {"worker": "a"}).inc(3)
+        metrics.histogram("wait_ms", "Wait time", {"worker": "a"}, buckets=(1, 10)).observe(5)
+
+        text = prometheus_text(metrics)
+
+        self.assertEqual("# HELP events_total Processed events\n"
+                         "# TYPE events_total counter\n"
+                         "events_total{worker=\"a\"} 3\n"
+                         "# HELP wait_ms Wait time\n"
+                         "# TYPE wait_ms histogram\n"
+                         "wait_ms_bucket{worker=\"a\",le=\"1\"} 0\n"
+                         "wait_ms_bucket{worker=\"a\",le=\"10\"} 1\n"
+                         "wait_ms_bucket{worker=\"a\",le=\"+Inf\"} 1\n"
+                         "wait_ms_sum{worker=\"a\"} 5.0\n"
+                         "wait_ms_count{worker=\"a\"} 1\n", text)
+
+
+class PrometheusEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = InMemoryMetrics()
+        self.endpoint = PrometheusEndpoint(self.metrics, port=0)
+        self.endpoint.start()
+
+    def tearDown(self):
+        self.endpoint.stop()
+
+    def test_metrics(self):
+        self.metrics.counter("events_total", "Processed events").inc()
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.endpoint.port}/metrics") as response:
+            self.assertEqual(200, response.status)
+            self.assertIn("events_total 1", response.read().decode("utf-8"))
+
+    def test_unknown_path(self):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(f"http://127.0.0.1:{self.endpoint.port}/other")
+
+        self.assertEqual(404, context.exception.code)
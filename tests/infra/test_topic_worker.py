@@ -1,13 +1,19 @@
 import logging
+import os
 import sys
+import tempfile
 import threading
 import time
 import unittest
+from queue import Full
 
 from cltl.combot.event.bdi import IntentionEvent, Intention
-from cltl.combot.infra.event.api import Event
+from cltl.combot.infra.event.api import Event, EventMetadata
 from cltl.combot.infra.event.memory import SynchronousEventBus
-from cltl.combot.infra.topic_worker import TopicWorker, RejectionStrategy
+from cltl.combot.infra.metrics import InMemoryMetrics
+from cltl.combot.infra.time_util import timestamp_now
+from cltl.combot.infra.topic_worker import TopicWorker, RejectionStrategy, TopicWorkerPool, PriorityLane
+from cltl.combot.test.util import await_predicate
 
 
 logger = logging.getLogger()
@@ -15,6 +21,12 @@ logger.setLevel(logging.DEBUG)
 logger.addHandler(logging.StreamHandler(sys.stderr))
 
 
+def _write_pid(event):
+    directory, name = event.payload
+    with open(os.path.join(directory, name), "w") as f:
+        f.write(str(os.getpid()))
+
+
 class TestProcessor:
     def __init__(self, start: threading.Event = None):
         self.events = []
@@ -165,6 +177,8 @@ class TestTopicWorker(unittest.TestCase):
         time.sleep(0.1)
         self.assertEqual(2, len(processor.events))
         self.assertEqual([1, 2], [e.payload for e in processor.events])
+        self.assertEqual(0, self.worker.overwritten_events)
+        self.assertEqual(1, self.worker.dropped_events)
 
     def test_rejection_strategy_overwrite(self):
         start = threading.Event()
@@ -192,3 +206,420 @@ class TestTopicWorker(unittest.TestCase):
         time.sleep(0.1)
         self.assertEqual(2, len(processor.events))
         self.assertEqual([1, 3], [e.payload for e in processor.events])
+        self.assertEqual(1, self.worker.overwritten_events)
+        self.assertEqual(0, self.worker.dropped_events)
+
+    def test_batch_processing(self):
+        start = threading.Event()
+        processing = threading.Event()
+        batches = []
+
+        def process_batch(events):
+            processing.set()
+            start.wait(1)
+            batches.append([e.payload for e in events])
+
+        self.worker = TopicWorker(['testTopic'], self.event_bus, buffer_size=10,
+                                  rejection_strategy=RejectionStrategy.BLOCK,
+                                  max_batch_size=4, batch_processor=process_batch)
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(0))
+        self.assertTrue(processing.wait(1))
+        for i in range(1, 7):
+            self.event_bus.publish("testTopic", Event.for_payload(i))
+        start.set()
+
+        await_predicate(lambda: sum(len(batch) for batch in batches) == 7, "events processed")
+        self.assertEqual([0], batches[0])
+        self.assertEqual([1, 2, 3, 4], batches[1])
+        self.assertEqual([5, 6], batches[2])
+        self.assertEqual(3, self.worker.batch_sizes.count)
+        self.assertEqual({100: 4}, self.worker.batch_sizes.percentiles((100,)))
+
+    def test_batch_processing_with_latency(self):
+        batches = []
+
+        self.worker = TopicWorker(['testTopic'], self.event_bus, buffer_size=10,
+                                  max_batch_size=3, max_batch_latency_ms=200,
+                                  batch_processor=lambda events: batches.append([e.payload for e in events]))
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        time.sleep(0.05)
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+
+        await_predicate(lambda: batches, "batch processed")
+        self.assertEqual([[1, 2]], batches)
+        self.assertGreaterEqual(self.worker.batch_latency.percentiles((100,))[100], 200)
+
+    def test_batch_processing_defaults_to_process(self):
+        self.worker = TopicWorker(['testTopic'], self.event_bus, buffer_size=10, max_batch_size=4,
+                                  processor=self.processor.process)
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+
+        await_predicate(lambda: len(self.processor.events) == 2, "events processed")
+        self.assertEqual([1, 2], [e.payload for e in self.processor.events])
+
+
+    def test_interval_pacing(self):
+        self.worker = TopicWorker(['testTopic'], self.event_bus, interval=0.05, buffer_size=10,
+                                  rejection_strategy=RejectionStrategy.BLOCK, processor=self.processor.process)
+        self.worker.start().wait()
+
+        start = time.monotonic()
+        for i in range(4):
+            self.event_bus.publish("testTopic", Event.for_payload(i))
+
+        await_predicate(lambda: len(self.processor.events) == 4, "events processed")
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual([0, 1, 2, 3], [e.payload for e in self.processor.events])
+
+    def test_scheduled_processing(self):
+        self.worker = TopicWorker(['testTopic'], self.event_bus, scheduled=0.01, processor=self.processor.process)
+        self.worker.start().wait()
+
+        await_predicate(lambda: len(self.processor.events) > 2, "scheduled invocations")
+        self.assertIsNone(self.processor.events[0])
+
+    def test_stop_idle_worker(self):
+        self.worker = TopicWorker(['testTopic'], self.event_bus, processor=self.processor.process)
+        self.worker.start().wait()
+
+        start = time.monotonic()
+        self.worker.stop()
+        self.worker.await_stop()
+        self.worker.join(0.5)
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertFalse(self.worker.is_alive())
+
+    def test_stop_paced_worker(self):
+        self.worker = TopicWorker(['testTopic'], self.event_bus, interval=5, processor=self.processor.process)
+        worker = self.worker
+
+        class Stopping(threading.Event):
+            def set(self):
+                super().set()
+                # Let the paced worker wake up and exit before stop() returns
+                worker.join(1)
+
+        self.worker._stopping = Stopping()
+        self.worker.start().wait()
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+
+        start = time.monotonic()
+        self.worker.stop()
+        self.worker.await_stop()
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual([1], [e.payload for e in self.processor.events])
+
+    def test_idle_workers_do_not_consume_cpu(self):
+        workers = [TopicWorker(['testTopic'], self.event_bus, interval=0.001, scheduled=None,
+                               processor=self.processor.process) for _ in range(20)]
+        workers += [TopicWorker(['testTopic'], self.event_bus, processor=self.processor.process) for _ in range(20)]
+        for worker in workers:
+            worker.start().wait()
+        self.worker = workers[0]
+
+        try:
+            start = time.process_time()
+            time.sleep(0.5)
+            cpu_time = time.process_time() - start
+        finally:
+            for worker in workers[1:]:
+                worker.stop()
+
+        self.assertLess(cpu_time, 0.05)
+
+    def test_rejection_strategy_exception(self):
+        start = threading.Event()
+        processor = TestProcessor(start)
+        self.worker = TopicWorker(['testTopic'], self.event_bus, processor=processor.process,
+                                  rejection_strategy=RejectionStrategy.EXCEPTION)
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        await_predicate(lambda: self.worker.queue_depth == 0, "event taken")
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+        with self.assertRaises(Full):
+            self.event_bus.publish("testTopic", Event.for_payload(3))
+
+        start.set()
+        await_predicate(lambda: len(processor.events) == 2, "events processed")
+
+    def test_stop_releases_blocked_publisher(self):
+        start = threading.Event()
+        processor = TestProcessor(start)
+        self.worker = TopicWorker(['testTopic'], self.event_bus, processor=processor.process,
+                                  rejection_strategy=RejectionStrategy.BLOCK)
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        await_predicate(lambda: self.worker.queue_depth == 0, "event taken")
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+        publisher = threading.Thread(target=self.event_bus.publish, args=("testTopic", Event.for_payload(3)))
+        publisher.start()
+        time.sleep(0.05)
+        self.assertTrue(publisher.is_alive())
+
+        self.worker.stop()
+        publisher.join(1)
+        start.set()
+
+        self.assertFalse(publisher.is_alive())
+        self.assertEqual(1, self.worker.dropped_events)
+
+    def test_expiry_on_enqueue(self):
+        self.worker = TopicWorker(['testTopic'], self.event_bus, processor=self.processor.process, max_age_ms=100)
+        self.worker.start().wait()
+
+        self.processor.processed.clear()
+        self.event_bus.publish("testTopic", Event("stale", 1, EventMetadata(timestamp_now() - 1000)))
+        self.assertFalse(self.processor.processed.wait(0.05))
+        self.assertEqual(1, self.worker.expired_events)
+
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+        self.assertTrue(self.processor.processed.wait(1))
+        self.assertEqual([2], [e.payload for e in self.processor.events])
+
+    def test_expiry_on_dequeue(self):
+        start = threading.Event()
+        processor = TestProcessor(start)
+        self.worker = TopicWorker(['testTopic'], self.event_bus, processor=processor.process, buffer_size=2,
+                                  rejection_strategy=RejectionStrategy.BLOCK, max_age_ms=50)
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+        time.sleep(0.1)
+        start.set()
+
+        await_predicate(lambda: self.worker.expired_events == 1, "event expired")
+        time.sleep(0.05)
+        self.assertEqual([1], [e.payload for e in processor.events])
+
+    def test_expiry_with_deadline(self):
+        self.worker = TopicWorker(['testTopic'], self.event_bus, processor=self.processor.process,
+                                  buffer_size=2, deadline=lambda event: event.payload)
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(timestamp_now() - 1))
+        deadline = timestamp_now() + 10000
+        self.event_bus.publish("testTopic", Event.for_payload(deadline))
+
+        await_predicate(lambda: len(self.processor.events) == 1, "event processed")
+        self.assertEqual([deadline], [e.payload for e in self.processor.events])
+        self.assertEqual(1, self.worker.expired_events)
+
+    def test_expiry_releases_blocked_publisher(self):
+        start = threading.Event()
+        processor = TestProcessor(start)
+        self.worker = TopicWorker(['testTopic'], self.event_bus, processor=processor.process,
+                                  rejection_strategy=RejectionStrategy.BLOCK, max_age_ms=50)
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        await_predicate(lambda: self.worker.queue_depth == 0, "event taken")
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+
+        publisher = threading.Thread(target=self.event_bus.publish, args=("testTopic", Event.for_payload(3)))
+        publisher.start()
+        publisher.join(1)
+
+        self.assertFalse(publisher.is_alive())
+        self.assertEqual(1, self.worker.expired_events)
+        start.set()
+
+    def test_priority_lanes(self):
+        start = threading.Event()
+        processor = TestProcessor(start)
+        self.worker = TopicWorker(['dataTopic', 'controlTopic'], self.event_bus, processor=processor.process,
+                                  buffer_size=2, rejection_strategy=RejectionStrategy.DROP,
+                                  priority_lanes=[PriorityLane('controlTopic', 2, RejectionStrategy.BLOCK)])
+        self.worker.start().wait()
+
+        self.event_bus.publish("dataTopic", Event.for_payload(1))
+        await_predicate(lambda: self.worker.queue_depth == 0, "event taken")
+        for payload in (2, 3, 4):
+            self.event_bus.publish("dataTopic", Event.for_payload(payload))
+        self.event_bus.publish("controlTopic", Event.for_payload("control"))
+        start.set()
+
+        await_predicate(lambda: len(processor.events) == 4, "events processed")
+        self.assertEqual([1, "control", 2, 3], [e.payload for e in processor.events])
+        self.assertEqual(1, self.worker.dropped_events)
+
+    def test_priority_lanes_without_buffer(self):
+        start = threading.Event()
+        processor = TestProcessor(start)
+        self.worker = TopicWorker(['dataTopic', 'controlTopic'], self.event_bus, processor=processor.process,
+                                  buffer_size=0, priority_lanes=[PriorityLane('controlTopic', 1)])
+        self.worker.start().wait()
+
+        self.event_bus.publish("dataTopic", Event.for_payload("d1"))
+        await_predicate(lambda: self.worker.queue_depth == 0, "event taken")
+        self.event_bus.publish("controlTopic", Event.for_payload("c1"))
+        self.event_bus.publish("dataTopic", Event.for_payload("d2"))
+        start.set()
+
+        await_predicate(lambda: len(processor.events) == 2, "events processed")
+        time.sleep(0.05)
+        self.assertEqual(["d1", "c1"], [e.payload for e in processor.events])
+        self.assertEqual(1, self.worker.dropped_events)
+
+    def test_metrics(self):
+        start = threading.Event()
+        processor = TestProcessor(start)
+        metrics = InMemoryMetrics()
+        self.worker = TopicWorker(['testTopic'], self.event_bus, name="metricsWorker", processor=processor.process,
+                                  rejection_strategy=RejectionStrategy.DROP, metrics=metrics)
+        self.worker.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(0))
+        await_predicate(lambda: metrics.get("cltl_topic_worker_queue_depth", worker="metricsWorker") == 0,
+                        "event taken")
+        for i in range(1, 3):
+            self.event_bus.publish("testTopic", Event.for_payload(i))
+        self.assertEqual(1, metrics.get("cltl_topic_worker_queue_depth", worker="metricsWorker"))
+
+        start.set()
+        await_predicate(lambda: len(processor.events) == 2, "events processed")
+        await_predicate(lambda: metrics.get("cltl_topic_worker_processed_events_total", worker="metricsWorker") == 2,
+                        "metrics recorded")
+
+        self.assertEqual(0, metrics.get("cltl_topic_worker_queue_depth", worker="metricsWorker"))
+        self.assertEqual(1, metrics.get("cltl_topic_worker_rejected_events_total",
+                                        worker="metricsWorker", strategy="DROP", reason="dropped"))
+        self.assertEqual(0, metrics.get("cltl_topic_worker_rejected_events_total",
+                                        worker="metricsWorker", strategy="DROP", reason="overwritten"))
+        self.assertEqual(2, metrics.get("cltl_topic_worker_wait_ms", worker="metricsWorker").count)
+        self.assertEqual(2, metrics.get("cltl_topic_worker_processing_ms", worker="metricsWorker").count)
+
+
+class TestTopicWorkerPool(unittest.TestCase):
+    def setUp(self) -> None:
+        self.event_bus = SynchronousEventBus()
+        self.pool = None
+
+    def tearDown(self) -> None:
+        if self.pool:
+            self.pool.stop()
+            self.pool.await_stop()
+
+    def test_parallel_processing(self):
+        barrier = threading.Barrier(3, timeout=1)
+        processed = []
+
+        def process(event):
+            barrier.wait()
+            processed.append(event.payload)
+
+        self.pool = TopicWorkerPool("testTopic", self.event_bus, workers=3, buffer_size=3,
+                                    rejection_strategy=RejectionStrategy.BLOCK, processor=process)
+        self.pool.start().wait()
+
+        for i in range(3):
+            self.event_bus.publish("testTopic", Event.for_payload(i))
+
+        await_predicate(lambda: len(processed) == 3, "events processed")
+        self.assertEqual({0, 1, 2}, set(processed))
+
+    def test_ordering_by_key(self):
+        processed = {"a": [], "b": []}
+        current = set()
+        overlap = []
+
+        def process(event):
+            key, idx = event.payload
+            if key in current:
+                overlap.append(event.payload)
+            current.add(key)
+            time.sleep(0.005)
+            processed[key].append(idx)
+            current.discard(key)
+
+        self.pool = TopicWorkerPool("testTopic", self.event_bus, workers=4, buffer_size=20,
+                                    rejection_strategy=RejectionStrategy.BLOCK,
+                                    key=lambda event: event.payload[0], processor=process)
+        self.pool.start().wait()
+
+        for i in range(10):
+            self.event_bus.publish("testTopic", Event.for_payload(("a", i)))
+            self.event_bus.publish("testTopic", Event.for_payload(("b", i)))
+
+        await_predicate(lambda: len(processed["a"]) + len(processed["b"]) == 20, "events processed")
+        self.assertEqual(list(range(10)), processed["a"])
+        self.assertEqual(list(range(10)), processed["b"])
+        self.assertEqual([], overlap)
+
+    def test_rejection_strategy_drop(self):
+        start = threading.Event()
+        processor = TestProcessor(start)
+
+        self.pool = TopicWorkerPool("testTopic", self.event_bus, workers=1, buffer_size=1,
+                                    rejection_strategy=RejectionStrategy.DROP, processor=processor.process)
+        self.pool.start().wait()
+
+        for i in range(3):
+            self.event_bus.publish("testTopic", Event.for_payload(i))
+            time.sleep(0.01)
+        start.set()
+
+        await_predicate(lambda: len(processor.events) == 2, "events processed")
+        time.sleep(0.05)
+        self.assertEqual([0, 1], [e.payload for e in processor.events])
+
+    def test_processing_with_active_intention(self):
+        processor = TestProcessor()
+
+        self.pool = TopicWorkerPool("testTopic", self.event_bus, buffer_size=4,
+                                    intentions=["testIntention"], intention_topic="intentionTopic",
+                                    processor=processor.process)
+        self.pool.start().wait()
+
+        self.event_bus.publish("testTopic", Event.for_payload(1))
+        self.event_bus.publish("intentionTopic", Event.for_payload(IntentionEvent([Intention("testIntention", None)])))
+        self.event_bus.publish("testTopic", Event.for_payload(2))
+
+        await_predicate(lambda: processor.events, "event processed")
+        time.sleep(0.05)
+        self.assertEqual([2], [e.payload for e in processor.events])
+
+    def test_processing_in_processes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.pool = TopicWorkerPool("testTopic", self.event_bus, workers=2, buffer_size=4,
+                                    rejection_strategy=RejectionStrategy.BLOCK,
+                                    processor=_write_pid, processes=True)
+        self.pool.start().wait()
+
+        for i in range(4):
+            self.event_bus.publish("testTopic", Event.for_payload((directory.name, str(i))))
+
+        await_predicate(lambda: len(os.listdir(directory.name)) == 4, "events processed")
+        pids = set()
+        for name in os.listdir(directory.name):
+            with open(os.path.join(directory.name, name)) as f:
+                pids.add(f.read())
+        self.assertNotIn(str(os.getpid()), pids)
+
+    def test_metrics(self):
+        metrics = InMemoryMetrics()
+        self.pool = TopicWorkerPool("testTopic", self.event_bus, workers=2, key=lambda event: event.payload,
+                                    name="metricsPool", buffer_size=4, rejection_strategy=RejectionStrategy.BLOCK,
+                                    metrics=metrics)
+        self.pool.start().wait()
+
+        for i in range(4):
+            self.event_bus.publish("testTopic", Event.for_payload(i))
+
+        await_predicate(lambda: metrics.get("cltl_topic_worker_processed_events_total", worker="metricsPool") == 4,
+                        "metrics recorded")
+        self.assertEqual(0, metrics.get("cltl_topic_worker_queue_depth", worker="metricsPool"))
+        self.assertEqual(4, metrics.get("cltl_topic_worker_wait_ms", worker="metricsPool").count)